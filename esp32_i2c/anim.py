@@ -0,0 +1,147 @@
+import struct
+import time
+
+from image import packed_max, read_packed, unpack_bits
+from ssd1306 import SSD1306
+
+# Binary animation layout (little endian), written by tools/anim_conv.py:
+#   header   "SSDA", version, flags, width (u16), hight (u16), frames (u16), frame_ms (u16)
+#   frames   one after another, each starting with its kind byte:
+#     key    (hight + 7) >> 3 page rows, each a u16 length and PackBits data
+#     delta  u16 span count, each span page (u8), column (u8), length (u8)
+#            and the bytes to XOR into the previous frame
+#
+# The first frame is always a key frame.
+
+ANIM_MAGIC = b"SSDA"
+ANIM_VERSION = 1
+ANIM_HEADER = "<4sBBHHHH"
+ANIM_HEADER_SIZE = struct.calcsize(ANIM_HEADER)
+ANIM_KEY = 0
+ANIM_DELTA = 1
+
+class Player:
+
+    # Plays an animation file at x0, y0: key frames are drawn row by row,
+    # delta frames only XOR their spans into the framebuffer, so only those
+    # spans are flushed.
+    #
+    #   player = Player(display, "/anims/boot.bin")
+    #   player.play(loops=2)
+    #   print(player.stats())
+
+    def __init__(self, display, anim_file, x0=0, y0=0):
+        self._display = display
+        self._x0 = x0
+        self._y0 = y0
+        self._fd = open(anim_file, "rb")
+        header = self._fd.read(ANIM_HEADER_SIZE)
+        magic, version, _, self.width, self.hight, self.frames, self.frame_ms = struct.unpack(ANIM_HEADER, header)
+        if magic != ANIM_MAGIC or version != ANIM_VERSION:
+            self._fd.close()
+            raise ValueError(f"{anim_file} is not an animation v{ANIM_VERSION} file")
+
+        self.pages = (self.hight + 7) >> 3
+        self._row = bytearray(self.width)
+        self._row_view = memoryview(self._row)
+        self._packed_view = memoryview(bytearray(packed_max(self.width)))
+        self._head = bytearray(3)
+        self._head_view = memoryview(self._head)
+        self._frame = 0
+        self.shown = 0
+        self.late = 0
+        self.data_bytes = 0
+        self.bus_bytes = 0
+        self.play_ms = 0
+
+    def close(self):
+        if self._fd:
+            self._fd.close()
+            self._fd = None
+
+    def rewind(self):
+        self._fd.seek(ANIM_HEADER_SIZE)
+        self._frame = 0
+
+    def _page_hight(self, page):
+        return min(8, self.hight - (page << 3))
+
+    def _read(self, buf):
+        if self._fd.readinto(buf) != len(buf):
+            raise ValueError(f"animation cut short in frame {self._frame}")
+
+    def _key(self, display):
+        for page in range(self.pages):
+            packed = read_packed(self._fd, self._head_view[:2], self._packed_view)
+            size = unpack_bits(packed, self._row)
+            display.drawSpan(self._row_view[:size], self._x0, self._y0 + (page << 3),
+                             self._page_hight(page), SSD1306.OPERATION_ALL)
+            self.data_bytes += size
+
+    def _delta(self, display):
+        self._read(self._head_view[:2])
+        for _ in range(self._head[0] | (self._head[1] << 8)):
+            self._read(self._head_view)
+            page, col, size = self._head
+            if page >= self.pages or col + size > self.width:
+                raise ValueError(f"delta span of {size} bytes at page {page}, column {col} is outside the {self.width}x{self.hight} frame")
+            span = self._row_view[:size]
+            self._read(span)
+            display.drawSpan(span, self._x0 + col, self._y0 + (page << 3),
+                             self._page_hight(page), SSD1306.OPERATION_XOR)
+            self.data_bytes += size
+
+    def step(self):
+        # draws the next frame, returns False past the last one
+        if self._frame >= self.frames:
+            return False
+
+        display = self._display
+        kind = self._fd.read(1)
+        if not kind:
+            raise ValueError(f"animation cut short in frame {self._frame}")
+        kind = kind[0]
+        with display.fb_lock:
+            if kind == ANIM_KEY:
+                self._key(display)
+            else:
+                self._delta(display)
+        display.endFrame()
+        self._frame += 1
+        self.shown += 1
+        return True
+
+    def play(self, loops=1, fps=None):
+        # paced playback, frames running late are still shown (deltas need
+        # every frame) and counted in self.late
+        display = self._display
+        frame_ms = 1000 // fps if fps else self.frame_ms
+        saved_fps = display.frameRate()
+        display.setFrameRate(1000 // max(1, frame_ms))
+        sent = display.bytes_sent
+        start = time.ticks_ms()
+        due = start
+        try:
+            for _ in range(loops):
+                self.rewind()
+                while self.step():
+                    due = time.ticks_add(due, frame_ms)
+                    wait = time.ticks_diff(due, time.ticks_ms())
+                    if wait > 0:
+                        time.sleep_ms(wait)
+                    else:
+                        self.late += 1
+        finally:
+            display.setFrameRate(saved_fps)
+        self.play_ms += time.ticks_diff(time.ticks_ms(), start)
+        self.bus_bytes += display.bytes_sent - sent
+
+    def stats(self):
+        shown = max(1, self.shown)
+        return {
+            "frames": self.shown,
+            "late": self.late,
+            "fps": self.shown * 1000 // max(1, self.play_ms),
+            "data_bytes_per_frame": self.data_bytes // shown,
+            "bus_bytes_per_frame": self.bus_bytes // shown,
+        }
@@ -0,0 +1,102 @@
+from array import array
+
+from ssd1306 import SSD1306
+from widgets import Widget
+
+class Chart(Widget):
+
+    # Rolling chart, newest sample at the right edge. Every pixel column
+    # covers per_column samples and shows their min..max span, joined to the
+    # last sample of the column before.
+    #
+    #   chart = scene.add(Chart(0, 16, 127, 63, 15, 30))
+    #   chart.push(temperature)
+    #
+    # Samples live in a preallocated array ring, so memory stays the same
+    # however long it runs. Once drawn, a completed column only scrolls the
+    # plot area one column left and draws the new one, the chart shouldn't
+    # overlap other widgets for that reason.
+
+    def __init__(self, x0, y0, x1, y1, vmin, vmax, per_column=1, typecode="f"):
+        super().__init__(x0, y0, x1, y1)
+        self._per_column = max(1, per_column)
+        # the full width plus the column being collected
+        self._samples = array(typecode, (0 for _ in range((x1 - x0 + 2) * self._per_column)))
+        self._head = 0
+        self._count = 0
+        self._fill = 0
+        self._min = 0
+        self._max = 0
+        self._last = None
+        self._display = None
+        self.rescale(vmin, vmax)
+
+    def rescale(self, vmin, vmax):
+        self._vmin = vmin
+        self._vmax = vmax
+        self._scale = (self.y1 - self.y0) / ((vmax - vmin) or 1)
+        self.damage()
+
+    def _to_y(self, value):
+        value = min(max(value, self._vmin), self._vmax)
+        return self.y1 - int((value - self._vmin) * self._scale + 0.5)
+
+    def _span(self, lo, hi, last):
+        if last is not None:
+            lo = min(lo, last)
+            hi = max(hi, last)
+        return self._to_y(hi), self._to_y(lo)
+
+    def push(self, value):
+        self._samples[self._head] = value
+        self._head = (self._head + 1) % len(self._samples)
+        if self._count < len(self._samples):
+            self._count += 1
+
+        if not self._fill or value < self._min:
+            self._min = value
+        if not self._fill or value > self._max:
+            self._max = value
+        self._fill += 1
+        if self._fill < self._per_column:
+            return
+
+        top, bottom = self._span(self._min, self._max, self._last)
+        self._last = value
+        self._fill = 0
+        if self._display:
+            self._display.shiftArea(self.x0, self.y0, self.x1, self.y1, -1)
+            self._display.drawLine(self.x1, top, self.x1, bottom, SSD1306.OPERATION_OR)
+
+    def clear(self):
+        self._count = 0
+        self._fill = 0
+        self._last = None
+        self.damage()
+
+    def render(self, display):
+        # full redraw from the ring, later columns are scrolled in by push()
+        self._display = display
+        size = len(self._samples)
+        per_column = self._per_column
+        columns = min(self.x1 - self.x0 + 1, (self._count - self._fill) // per_column)
+        idx = (self._head - self._fill - columns * per_column) % size
+
+        last = None
+        # the sample ending the column before the oldest one shown joins it up
+        if self._count - self._fill > columns * per_column:
+            last = self._samples[(idx - 1) % size]
+        x = self.x1 - columns + 1
+        for _ in range(columns):
+            lo = hi = self._samples[idx]
+            for _ in range(per_column):
+                value = self._samples[idx]
+                if value < lo:
+                    lo = value
+                if value > hi:
+                    hi = value
+                idx = (idx + 1) % size
+            top, bottom = self._span(lo, hi, last)
+            display.drawLine(x, top, x, bottom, SSD1306.OPERATION_OR)
+            last = value
+            x += 1
@@ -0,0 +1,104 @@
+import _thread
+import time
+
+class DisplayBus:
+
+    # Owns an I2C bus shared by several SSD1306 panels: transactions are
+    # serialised by one lock and a single thread flushes every panel.
+    #
+    #   bus = DisplayBus(I2C(1, scl=Pin(18), sda=Pin(19), freq=400000))
+    #   left = SSD1306(bus, 0x3C)
+    #   right = SSD1306(bus, 0x3D)
+    #   bus.setPriority(left, 1)
+    #   bus.setBudget(right, 256)
+    #
+    # Panels that are due are flushed in priority order, round robin among
+    # the same priority. A budget caps the data bytes one flush of a panel
+    # may send, the rest goes out in the next round, so a full redraw of one
+    # panel doesn't hold the other one back for a whole frame.
+
+    def __init__(self, i2c_bus):
+        self._i2c_bus = i2c_bus
+        self.lock = _thread.allocate_lock()
+        # released by any panel that has something to flush
+        self.wake = _thread.allocate_lock()
+        self._displays = []
+        self._priority = {}
+        self._budget = {}
+        self._next = 0
+        self.rounds = 0
+        self.busy_us = 0
+        self._started = False
+
+    # the I2C methods the driver uses, callers hold self.lock
+
+    def scan(self):
+        with self.lock:
+            return self._i2c_bus.scan()
+
+    def writeto(self, addr, buf):
+        return self._i2c_bus.writeto(addr, buf)
+
+    def writevto(self, addr, bufs):
+        return self._i2c_bus.writevto(addr, bufs)
+
+    def register(self, display):
+        self._displays.append(display)
+        self._priority[display] = 0
+        self._budget[display] = None
+        if not self._started:
+            self._started = True
+            _thread.start_new_thread(self._bus_update, ())
+
+    def setPriority(self, display, priority):
+        self._priority[display] = priority
+
+    def setBudget(self, display, budget):
+        self._budget[display] = budget
+
+    def _order(self):
+        # rotate the start, then a stable sort keeps round robin within a priority
+        count = len(self._displays)
+        self._next = (self._next + 1) % count
+        order = self._displays[self._next:] + self._displays[:self._next]
+        order.sort(key=lambda display: -self._priority[display])
+        return order
+
+    def _flush_round(self):
+        # flushes every panel that is due, returns ms until the next one is,
+        # or None when no panel has anything to flush
+        start = time.ticks_us()
+        flushed = False
+        for display in self._order():
+            if display._pending() and time.ticks_diff(display._next_flush, time.ticks_ms()) <= 0:
+                display._flush_now(self._budget[display])
+                flushed = True
+        if flushed:
+            self.rounds += 1
+            self.busy_us += time.ticks_diff(time.ticks_us(), start)
+
+        wait = None
+        now = time.ticks_ms()
+        for display in self._displays:
+            if display._pending():
+                due = max(0, time.ticks_diff(display._next_flush, now))
+                if wait is None or due < wait:
+                    wait = due
+        return wait
+
+    def _bus_update(self):
+        print(f"Run thread #{_thread.get_ident()} - _bus_update")
+        while True:
+            self.wake.acquire()
+            wait = self._flush_round()
+            while wait is not None:
+                if wait > 0:
+                    time.sleep_ms(wait)
+                wait = self._flush_round()
+
+    def stats(self):
+        return {
+            "rounds": self.rounds,
+            "busy_us": self.busy_us,
+            "displays": {display._addr: display.stats() for display in self._displays},
+        }
@@ -0,0 +1,117 @@
+import json
+import struct
+
+# Binary font layout (little endian), written by tools/font_conv.py:
+#   header   "SSDF", version, width, hight, bytes_per_line, count (u16), stride (u16)
+#   chars    count * u16 code points
+#   glyphs   count * stride bytes, rows top to bottom, bit 0 is the left pixel
+
+FONT_MAGIC = b"SSDF"
+FONT_VERSION = 1
+FONT_HEADER = "<4sBBBBHH"
+FONT_HEADER_SIZE = struct.calcsize(FONT_HEADER)
+
+def parse_hex_row(values):
+    # JSON fonts keep glyph bytes as "0x.." strings, some entries hold two of them
+    row = []
+    for val in values:
+        for token in val.split("x")[1:]:
+            row.append(int(token[:2], 16))
+    return row
+
+class Font:
+
+    CACHE_SIZE = 16
+
+    def _load_json(self, font_file):
+        with open(font_file, "r") as font_fd:
+            font = json.loads(font_fd.read())
+
+        self.width = font.get("width")
+        self.hight = font.get("hight")
+        self._bytes_per_line = (self.width + 7) >> 3
+        stride = self._bytes_per_line * self.hight
+
+        chars = font.get("chars")
+        self._chars = "".join(chars)
+        self._glyphs = bytearray(len(chars) * stride)
+        for idx, values in enumerate(chars.values()):
+            row = parse_hex_row(values)[:stride]
+            self._glyphs[idx * stride:idx * stride + len(row)] = bytes(row)
+        self._fd = None
+
+    def _load_bin(self, font_file):
+        self._fd = open(font_file, "rb")
+        header = self._fd.read(FONT_HEADER_SIZE)
+        magic, version, self.width, self.hight, self._bytes_per_line, count, stride = struct.unpack(FONT_HEADER, header)
+        if magic != FONT_MAGIC or version != FONT_VERSION:
+            self._fd.close()
+            raise ValueError(f"{font_file} is not a font v{FONT_VERSION} file")
+
+        table = struct.unpack(f"<{count}H", self._fd.read(count * 2))
+        self._chars = "".join(chr(code) for code in table)
+        self._glyphs_offset = FONT_HEADER_SIZE + count * 2
+        self._glyphs = None
+
+    def __init__(self, font_file, cache_size=CACHE_SIZE):
+        if font_file.endswith(".json"):
+            self._load_json(font_file)
+        else:
+            self._load_bin(font_file)
+
+        self.pages = (self.hight + 7) >> 3
+        self._stride = self._bytes_per_line * self.hight
+        self._raw = bytearray(self._stride)
+        self._cache_size = cache_size
+        self._cache = {}
+        self._lru = []
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        if self._fd:
+            self._fd.close()
+            self._fd = None
+
+    def _read_raw(self, idx):
+        if self._glyphs is not None:
+            start = idx * self._stride
+            self._raw[:] = self._glyphs[start:start + self._stride]
+        else:
+            self._fd.seek(self._glyphs_offset + idx * self._stride)
+            self._fd.readinto(self._raw)
+        return self._raw
+
+    def _to_pages(self, raw):
+        # row major glyph bits to SSD1306 page order, page after page, one byte per column
+        glyph = bytearray(self.pages * self.width)
+        row = 0
+        for y in range(self.hight):
+            bit = 1 << (y & 0x07)
+            page = (y >> 3) * self.width
+            for x in range(self.width):
+                if raw[row + (x >> 3)] & (1 << (x & 0x07)):
+                    glyph[page + x] |= bit
+            row += self._bytes_per_line
+        return glyph
+
+    def glyph(self, char):
+        glyph = self._cache.get(char)
+        if glyph is not None:
+            self.hits += 1
+            if self._lru[-1] != char:
+                self._lru.remove(char)
+                self._lru.append(char)
+            return glyph
+
+        idx = self._chars.find(char)
+        if idx < 0:
+            return None
+
+        self.misses += 1
+        glyph = self._to_pages(self._read_raw(idx))
+        if len(self._lru) >= self._cache_size:
+            del self._cache[self._lru.pop(0)]
+        self._cache[char] = glyph
+        self._lru.append(char)
+        return glyph
@@ -0,0 +1,129 @@
+import struct
+
+# Binary image layout (little endian), written by tools/img_conv.py:
+#   header   "SSDI", version, flags, width (u16), hight (u16), frames (u16)
+#   offsets  frames * u32 file offset of each frame
+#   frame    (hight + 7) >> 3 page rows of width column bytes, bit 0 is the top
+#            pixel, with IMAGE_RLE every row is a u16 length and PackBits data
+#
+# Frames are decoded one page row at a time into a buffer of width bytes,
+# whatever the image size.
+
+IMAGE_MAGIC = b"SSDI"
+IMAGE_VERSION = 1
+IMAGE_HEADER = "<4sBBHHH"
+IMAGE_HEADER_SIZE = struct.calcsize(IMAGE_HEADER)
+IMAGE_RLE = 0x01
+
+def packed_max(width):
+    # largest row pack_bits makes of width bytes, the one that is all literals
+    return width + ((width + 127) >> 7)
+
+def pack_bits(data):
+    # PackBits: n < 128 is followed by n + 1 literal bytes, n > 128 by one
+    # byte repeated 257 - n times
+    out = bytearray()
+    idx = 0
+    while idx < len(data):
+        run = 1
+        while idx + run < len(data) and run < 128 and data[idx + run] == data[idx]:
+            run += 1
+        if run > 1:
+            out.append(257 - run)
+            out.append(data[idx])
+            idx += run
+            continue
+
+        start = idx
+        idx += 1
+        while idx < len(data) and idx - start < 128:
+            if idx + 1 < len(data) and data[idx] == data[idx + 1]:
+                break
+            idx += 1
+        out.append(idx - start - 1)
+        out.extend(data[start:idx])
+
+    if len(out) > packed_max(len(data)):
+        # short runs between single literals cost more than they save,
+        # plain literals stay within packed_max
+        out = bytearray()
+        for start in range(0, len(data), 128):
+            chunk = data[start:start + 128]
+            out.append(len(chunk) - 1)
+            out.extend(chunk)
+    return out
+
+def read_packed(fd, head, packed):
+    # one u16 length prefixed PackBits row into the memoryview packed, head is
+    # a 2 byte buffer; returns the part of packed holding it
+    fd.readinto(head)
+    size = head[0] | (head[1] << 8)
+    if size > len(packed):
+        raise ValueError(f"PackBits row of {size} bytes, at most {len(packed)} expected")
+    packed = packed[:size]
+    fd.readinto(packed)
+    return packed
+
+def unpack_bits(src, dst):
+    # returns the number of bytes written to dst, a row longer than dst is cut
+    # to it, one running past the end of src is malformed
+    idx = 0
+    pos = 0
+    while idx < len(src) and pos < len(dst):
+        count = src[idx]
+        idx += 1
+        if count < 128:
+            count += 1
+            if idx + count > len(src):
+                raise ValueError(f"PackBits literal of {count} bytes with {len(src) - idx} left")
+            fit = min(count, len(dst) - pos)
+            dst[pos:pos + fit] = src[idx:idx + fit]
+            idx += count
+            pos += fit
+        elif count > 128:
+            if idx >= len(src):
+                raise ValueError("PackBits run without its byte")
+            count = min(257 - count, len(dst) - pos)
+            value = src[idx]
+            idx += 1
+            for offset in range(pos, pos + count):
+                dst[offset] = value
+            pos += count
+    return pos
+
+class Image:
+
+    def __init__(self, image_file):
+        self._fd = open(image_file, "rb")
+        header = self._fd.read(IMAGE_HEADER_SIZE)
+        magic, version, self._flags, self.width, self.hight, self.frames = struct.unpack(IMAGE_HEADER, header)
+        if magic != IMAGE_MAGIC or version != IMAGE_VERSION:
+            self._fd.close()
+            raise ValueError(f"{image_file} is not an image v{IMAGE_VERSION} file")
+
+        self._offsets = struct.unpack(f"<{self.frames}I", self._fd.read(self.frames * 4))
+        self.pages = (self.hight + 7) >> 3
+        self._row = bytearray(self.width)
+        self._row_view = memoryview(self._row)
+        if self._flags & IMAGE_RLE:
+            self._packed_view = memoryview(bytearray(packed_max(self.width)))
+            self._len = bytearray(2)
+
+    def close(self):
+        if self._fd:
+            self._fd.close()
+            self._fd = None
+
+    def _read_row(self):
+        if not self._flags & IMAGE_RLE:
+            self._fd.readinto(self._row)
+            return self._row_view
+
+        packed = read_packed(self._fd, self._len, self._packed_view)
+        return self._row_view[:unpack_bits(packed, self._row)]
+
+    def rows(self, frame=0):
+        # yields page, row: the row buffer is reused, it only holds until the next one
+        self._fd.seek(self._offsets[frame % self.frames])
+        for page in range(self.pages):
+            yield page, self._read_row()
@@ -1,5 +1,8 @@
 from machine import Pin, I2C
 from ssd1306 import SSD1306
+from font import Font
+from text import TextField
+from widgets import Scene, Label, ValueBox, BarGauge, Sparkline
 import machine
 import random
 import time
@@ -15,7 +18,7 @@ print(devices)
 
 
 display = SSD1306(i2c, devices[0])
-if not display.fontSet("/fonts/font_7x12.json"):
+if not display.fontSet("/fonts/font_7x12.bin"):
     print("Couldn't set font")
 
 count = 0
@@ -25,11 +28,25 @@ display.clear()
 display.putString('Hello from ESP!', 5, 10, SSD1306.OPERATION_XOR)
 
 
-if not display.fontSet("/fonts/font_lcd_13x21.json"):
-    print("Couldn't set font")
-else:
-    display.putString('12:25', 10, 30, SSD1306.OPERATION_XOR)
-time.sleep(5)
+clock = TextField(display, Font("/fonts/font_lcd_13x21.bin"), 10, 30, 5)
+for minute in range(25, 30):
+    clock.set(f"12:{minute}")
+    time.sleep(1)
+display.clear()
+
+small = Font("/fonts/font_7x12.bin")
+dashboard = Scene(display)
+dashboard.add(Label(0, 3, "Load", small))
+load = dashboard.add(ValueBox(40, 0, 90, 17, small, "{}%"))
+load_bar = dashboard.add(BarGauge(0, 22, 127, 31, 0, 100))
+load_line = dashboard.add(Sparkline(0, 36, 127, 63, 0, 100))
+for _ in range(100):
+    value = random.randint(0, 100)
+    load.set(value)
+    load_bar.set(value)
+    load_line.push(value)
+    dashboard.update()
+    time.sleep_ms(200)
 display.clear()
 while True:
 
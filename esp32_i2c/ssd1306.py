@@ -1,6 +1,8 @@
 import _thread
 import time
-import json
+
+from font import Font
+from image import Image
 
 def swap(a, b):
     temp = a
@@ -8,12 +10,213 @@ def swap(a, b):
     b = temp
     return a, b
 
+# raster operation kernels, picked once per primitive by SSD1306._byte_op/_fill_op
+
+def _byte_xor(fb, addr, data):
+    fb[addr] ^= data
+
+def _byte_or(fb, addr, data):
+    fb[addr] |= data
+
+def _byte_and(fb, addr, data):
+    fb[addr] &= data
+
+def _byte_not(fb, addr, data):
+    fb[addr] &= ~data
+
+def _byte_all(fb, addr, data):
+    fb[addr] = data
+
+def _byte_none(fb, addr, data):
+    pass
+
+# longer runs are combined as one big integer so the loop runs in C
+
+BULK_MIN = 8
+
+def _pattern(data, len):
+    return data * ((1 << (len << 3)) - 1) // 0xFF
+
+def _fill_xor(fb, addr, data, len):
+    if len < BULK_MIN:
+        for idx in range(addr, addr + len):
+            fb[idx] ^= data
+        return
+    end = addr + len
+    fb[addr:end] = (int.from_bytes(fb[addr:end], "big") ^ _pattern(data, len)).to_bytes(len, "big")
+
+def _fill_or(fb, addr, data, len):
+    if len < BULK_MIN:
+        for idx in range(addr, addr + len):
+            fb[idx] |= data
+        return
+    end = addr + len
+    fb[addr:end] = (int.from_bytes(fb[addr:end], "big") | _pattern(data, len)).to_bytes(len, "big")
+
+def _fill_and(fb, addr, data, len):
+    if len < BULK_MIN:
+        for idx in range(addr, addr + len):
+            fb[idx] &= data
+        return
+    end = addr + len
+    fb[addr:end] = (int.from_bytes(fb[addr:end], "big") & _pattern(data, len)).to_bytes(len, "big")
+
+def _fill_not(fb, addr, data, len):
+    if len < BULK_MIN:
+        for idx in range(addr, addr + len):
+            fb[idx] &= ~data
+        return
+    end = addr + len
+    fb[addr:end] = (int.from_bytes(fb[addr:end], "big") & ~_pattern(data, len)).to_bytes(len, "big")
+
+def _fill_all(fb, addr, data, len):
+    fb[addr:addr + len] = bytes((data,)) * len
+
+def _fill_none(fb, addr, data, len):
+    pass
+
+# row kernels for bitmaps: bits is the row packed into an integer (first column
+# most significant), mask the rows of the page it covers
+
+def _row_xor(fb, addr, bits, len, mask):
+    end = addr + len
+    fb[addr:end] = (int.from_bytes(fb[addr:end], "big") ^ bits).to_bytes(len, "big")
+
+def _row_or(fb, addr, bits, len, mask):
+    end = addr + len
+    fb[addr:end] = (int.from_bytes(fb[addr:end], "big") | bits).to_bytes(len, "big")
+
+def _row_and(fb, addr, bits, len, mask):
+    end = addr + len
+    keep = bits | _pattern(~mask & 0xFF, len)
+    fb[addr:end] = (int.from_bytes(fb[addr:end], "big") & keep).to_bytes(len, "big")
+
+def _row_not(fb, addr, bits, len, mask):
+    end = addr + len
+    fb[addr:end] = (int.from_bytes(fb[addr:end], "big") & ~bits).to_bytes(len, "big")
+
+def _row_all(fb, addr, bits, len, mask):
+    end = addr + len
+    keep = int.from_bytes(fb[addr:end], "big") & ~_pattern(mask, len)
+    fb[addr:end] = (keep | bits).to_bytes(len, "big")
+
+def _row_none(fb, addr, bits, len, mask):
+    pass
+
+_BYTE_OPS = (_byte_none, _byte_xor, _byte_or, _byte_and, _byte_not, _byte_all)
+_FILL_OPS = (_fill_none, _fill_xor, _fill_or, _fill_and, _fill_not, _fill_all)
+_ROW_OPS = (_row_none, _row_xor, _row_or, _row_and, _row_not, _row_all)
+
+# half heights of the column strips of a circle, h[dx] for dx in 0..r
+
+def _fill_heights(r, h):
+    xd = 3 - (r << 1)
+    x = 0
+    y = r
+    while x <= y:
+        if y > h[x]:
+            h[x] = y
+        if x > h[y]:
+            h[y] = x
+        if xd < 0:
+            xd += (x << 2) + 6
+        else:
+            xd += ((x - y) << 2) + 10
+            y -= 1
+        x += 1
+    return h
+
+def _outline_heights(r, h):
+    xd = 1 - (r << 1)
+    yd = 0
+    e = 0
+    x = r
+    y = 0
+    while x >= y:
+        if y > h[x]:
+            h[x] = y
+        if x > h[y]:
+            h[y] = x
+        y += 1
+        e += yd
+        yd += 2
+        if (e << 1) + xd > 0:
+            x -= 1
+            e += xd
+            xd += 2
+    return h
+
+class _Frame:
+
+    # One framebuffer with the data control byte reserved in front of it and
+    # the per page dirty column range of what changed since it was last sent,
+    # lo > hi means the page is clean. In double buffered mode the stale range
+    # is what later frames changed and the buffer still lacks, it is copied
+    # over from the newest frame once the buffer is drawn into again.
+
+    def __init__(self, size, pages, control):
+        self.tx_buf = bytearray(size + 1)
+        self.tx_buf[0] = control
+        self.tx_view = memoryview(self.tx_buf)
+        self.fb = self.tx_view[1:]
+        self.dirty_lo = bytearray(pages)
+        self.dirty_hi = bytearray(pages)
+        self.stale_lo = bytearray(b"\xff" * pages)
+        self.stale_hi = bytearray(pages)
+        self.clean()
+
+    def clean(self):
+        for page in range(len(self.dirty_lo)):
+            self.dirty_lo[page] = 0xFF
+            self.dirty_hi[page] = 0
+
+    def mark_all(self, width):
+        for page in range(len(self.dirty_lo)):
+            self.dirty_lo[page] = 0
+            self.dirty_hi[page] = width - 1
+
+    def is_dirty(self):
+        for page in range(len(self.dirty_lo)):
+            if self.dirty_lo[page] <= self.dirty_hi[page]:
+                return True
+        return False
+
+    def merge(self, other):
+        for page in range(len(self.dirty_lo)):
+            if other.dirty_lo[page] < self.dirty_lo[page]:
+                self.dirty_lo[page] = other.dirty_lo[page]
+            if other.dirty_hi[page] > self.dirty_hi[page]:
+                self.dirty_hi[page] = other.dirty_hi[page]
+
+    def outdate(self, other):
+        # other was drawn into, the spans it changed are stale here
+        for page in range(len(self.stale_lo)):
+            if other.dirty_lo[page] < self.stale_lo[page]:
+                self.stale_lo[page] = other.dirty_lo[page]
+            if other.dirty_hi[page] > self.stale_hi[page]:
+                self.stale_hi[page] = other.dirty_hi[page]
+
+    def catch_up(self, other, width):
+        # copies the stale spans from other, which holds the newest frame
+        for page in range(len(self.stale_lo)):
+            col0 = self.stale_lo[page]
+            col1 = self.stale_hi[page]
+            if col0 <= col1:
+                addr = page * width
+                self.fb[addr + col0:addr + col1 + 1] = other.fb[addr + col0:addr + col1 + 1]
+                self.stale_lo[page] = 0xFF
+                self.stale_hi[page] = 0
+
 class SSD1306:
 
     LCD_WIDTH = 128
     LCD_HEIGHT = 64
+    LCD_PAGES = LCD_HEIGHT >> 3
     FB_SIZE = int(LCD_WIDTH * LCD_HEIGHT / 8)
     DEFAULT_SPACE = 5
+    CHAR_SPACE = 1
+    DEFAULT_FPS = 25
+    RETRY_MAX_MS = 1000
 
     CMD_SET_CONTRAST = 0x81
     CMD_DISPLAY_ALLON_RESUME = 0xA4
@@ -32,6 +235,8 @@ class SSD1306:
     CMD_SET_HIGH_COLUMN = 0x10
     CMD_SET_START_LINE = 0x40
     CMD_MEMORY_MODE = 0x20
+    CMD_COLUMN_ADDR = 0x21
+    CMD_PAGE_ADDR = 0x22
     CMD_COM_SCAN_INC = 0xC0
     CMD_COM_SCAN_DEC = 0xC8
     CMD_SEG_REMAP = 0xA0
@@ -54,60 +259,353 @@ class SSD1306:
     OPERATION_AND = 3
     OPERATION_NOT = 4
     OPERATION_ALL = 5
-    
-    def _send_command(self, cmd):
-        cmd_buff = [self.CONTROL_COMMAND]
-        cmd_buff.append(cmd)
-              
-        self._i2c_bus.writeto(self._addr, bytes(cmd_buff))
-        
-    
-    def _send_data(self, data):
-        data_buff = [self.CONTROL_DATA]
-        data_buff.extend(data)
 
-        self._i2c_bus.writeto(self._addr, bytes(data_buff))
+    INIT_SEQUENCE = bytes((
+        CMD_DISPLAY_OFF,
+        CMD_SET_DISPLAY_CLOCKDIV, 0x80,
+        CMD_SET_MULTIPLEX, 0x3F,
+        CMD_SET_DISPLAY_OFFSET, 0x00,
+        CMD_SET_START_LINE | 0x00,
+        CMD_CHARGE_PUMP, CMD_CHARGE_PUMP_ON,
+        CMD_MEMORY_MODE, 0x00,
+        CMD_SEG_REMAP | 0x01,
+        CMD_COM_SCAN_DEC,
+        CMD_SET_COMPINS, 0x12,
+        CMD_SET_CONTRAST, 0x4F,
+        CMD_SET_PRECHARGE, 0xF1,
+        CMD_SET_VCOM_DETECT, 0x40,
+        CMD_DISPLAY_ALLON_RESUME,
+        CMD_NORMAL_DISPLAY,
+        CMD_DISPLAY_ON,
+    ))
+
+    def _send_command(self, cmd):
+        self._cmd_buf[1] = cmd
+        self._i2c_bus.writeto(self._addr, self._cmd_buf)
+
+    def _send_commands(self, cmds):
+        # whole command list in a single transaction behind one control byte
+        self._i2c_bus.writevto(self._addr, (self._cmd_prefix, cmds))
+
+    def _send_span(self, frame, addr, len):
+        # the byte in front of the span is borrowed for the control byte,
+        # so any part of the framebuffer goes out without a copy
+        saved = frame.tx_buf[addr]
+        frame.tx_buf[addr] = self.CONTROL_DATA
+        try:
+            self._i2c_bus.writeto(self._addr, frame.tx_view[addr:addr + len + 1])
+        finally:
+            frame.tx_buf[addr] = saved
+
+    def _set_window(self, col0, col1, page0, page1):
+        win = self._win_buf
+        win[2] = col0
+        win[3] = col1
+        win[5] = page0
+        win[6] = page1
+        self._i2c_bus.writeto(self._addr, win)
+
+    def _fb_mark(self, addr, len):
+        # widen the dirty column range of every page touched by [addr, addr + len)
+        end = addr + len - 1
+        for page in range(addr >> 7, (end >> 7) + 1):
+            col0 = addr - (page << 7) if page == addr >> 7 else 0
+            col1 = end - (page << 7) if page == end >> 7 else self.LCD_WIDTH - 1
+            if col0 < self._dirty_lo[page]:
+                self._dirty_lo[page] = col0
+            if col1 > self._dirty_hi[page]:
+                self._dirty_hi[page] = col1
+
+    def _fb_mark_all(self):
+        self._back.mark_all(self.LCD_WIDTH)
+
+    def _flush(self, frame, budget=None):
+        # budget caps the data bytes of one flush, pages left over stay dirty
+        sent = 0
+        full = budget is None or budget >= self.FB_SIZE
+        for page in range(self.LCD_PAGES):
+            if frame.dirty_lo[page] != 0 or frame.dirty_hi[page] != self.LCD_WIDTH - 1:
+                full = False
+                break
+
+        if full:
+            self._set_window(0, self.LCD_WIDTH - 1, 0, self.LCD_PAGES - 1)
+            self._i2c_bus.writeto(self._addr, frame.tx_buf)
+            sent = self.FB_SIZE
+            frame.clean()
+        else:
+            for page in range(self.LCD_PAGES):
+                col0 = frame.dirty_lo[page]
+                col1 = frame.dirty_hi[page]
+                if col0 > col1:
+                    continue
+                if budget is not None and sent and sent + col1 - col0 + 1 > budget:
+                    break
+                addr = page * self.LCD_WIDTH
+                self._set_window(col0, col1, page, page)
+                self._send_span(frame, addr + col0, col1 - col0 + 1)
+                frame.dirty_lo[page] = 0xFF
+                frame.dirty_hi[page] = 0
+                sent += col1 - col0 + 1
+
+        self.flush_bytes = sent
+        self.flush_saved = self.FB_SIZE - sent
+        self.total_saved += self.flush_saved
+        return sent
+
+    def _flush_single(self, budget=None):
+        with self.fb_lock:
+            if not self._need_update:
+                return 0
+            with self._bus_lock:
+                sent = self._flush(self._back, budget)
+            self._need_update = budget is not None and self._back.is_dirty()
+            return sent
+
+    def _flush_double(self, budget=None):
+        # only the swap is done under the locks, drawing goes on into the back
+        # buffer while the front one is on the bus
+        with self._swap_lock:
+            if self._frame_pending:
+                self._ready.merge(self._front)
+                self._ready, self._front = self._front, self._ready
+                self._ready.clean()
+                self._frame_pending = False
+            front = self._front
+        if not front.is_dirty():
+            return 0
+        with self._bus_lock:
+            return self._flush(front, budget)
+
+    def _wake_up(self):
+        # the flush thread sleeps on _wake, releasing it is the wakeup signal
+        if self._update_ticks is None:
+            self._update_ticks = time.ticks_ms()
+        try:
+            if self._wake.locked():
+                self._wake.release()
+        except RuntimeError:
+            pass
+
+    def _changed(self):
+        self._need_update = True
+        if not self._double_buffer:
+            self._wake_up()
+
+    def _send_pending(self):
+        # display offset changes go out after the data they reveal
+        line = self._start_pending
+        if line is not None:
+            self._start_pending = None
+            with self._bus_lock:
+                self._send_command(self.CMD_SET_START_LINE | line)
+
+    def _pending(self):
+        # GDDRAM must not be written while the panel scrolls, changes wait for scrollStop
+        if self._scrolling:
+            return False
+        if self._start_pending is not None:
+            return True
+        if self._double_buffer:
+            return self._frame_pending or self._front.is_dirty()
+        return self._need_update
+
+    def _flush_now(self, budget=None):
+        if self._scrolling:
+            return 0
+
+        queued = self._update_ticks
+        self._update_ticks = None
+        start = time.ticks_us()
+        try:
+            if self._double_buffer:
+                sent = self._flush_double(budget)
+            else:
+                sent = self._flush_single(budget)
+            self._send_pending()
+        except OSError as e:
+            # the frame stays dirty and goes out with the next flush
+            self.frames_dropped += 1
+            print(f"ERROR: display {self._addr} flush failed: {e}")
+            self._next_flush = time.ticks_add(time.ticks_ms(), self._retry_ms)
+            self._retry_ms = min(self._retry_ms << 1, self.RETRY_MAX_MS)
+            self._wake_up()
+            return 0
+
+        self._retry_ms = self._frame_ms
+        self._next_flush = time.ticks_add(time.ticks_ms(), self._frame_ms)
+        if not sent:
+            return 0
+
+        took = time.ticks_diff(time.ticks_us(), start)
+        self.flushes += 1
+        self.bytes_sent += sent
+        self.flush_us_total += took
+        if took > self.flush_us_max:
+            self.flush_us_max = took
+        if queued is not None:
+            latency = time.ticks_diff(time.ticks_ms(), queued)
+            self.latency_ms_total += latency
+            if latency > self.latency_ms_max:
+                self.latency_ms_max = latency
+        return sent
 
     def _fb_update(self):
         print(f"Run thread #{_thread.get_ident()} - _fb_update")
         while True:
-            if self._need_update:
-                with self.fb_lock:
-                    self._send_data(self._fb)
-                    self._need_update = False
-
-            time.sleep_ms(40)
+            # no wakeups at all while nothing changes, then at most one flush per frame
+            self._wake.acquire()
+            wait = time.ticks_diff(self._next_flush, time.ticks_ms())
+            if wait > 0:
+                time.sleep_ms(wait)
+            self._flush_now()
+
+    def _use_frame(self, frame):
+        self._back = frame
+        self._fb = frame.fb
+        self._dirty_lo = frame.dirty_lo
+        self._dirty_hi = frame.dirty_hi
+
+    def _byte_op(self, operation):
+        if 0 < operation < len(_BYTE_OPS):
+            return _BYTE_OPS[operation]
+        return _byte_none
+
+    def _fill_op(self, operation):
+        if 0 < operation < len(_FILL_OPS):
+            return _FILL_OPS[operation]
+        return _fill_none
+
+    def _row_op(self, operation):
+        if 0 < operation < len(_ROW_OPS):
+            return _ROW_OPS[operation]
+        return _row_none
+
+    def _fb_mark_rect(self, x0, y0, x1, y1):
+        x0 = self._check_x(x0)
+        x1 = self._check_x(x1)
+        y0 = self._check_y(y0)
+        y1 = self._check_y(y1)
+        for page in range(y0 >> 3, (y1 >> 3) + 1):
+            if x0 < self._dirty_lo[page]:
+                self._dirty_lo[page] = x0
+            if x1 > self._dirty_hi[page]:
+                self._dirty_hi[page] = x1
 
     def _fb_set_data(self, operation, addr, data, len):
-        for idx in range(len):
-            if operation == self.OPERATION_XOR:
-                self._fb[addr + idx] ^= data
-            elif operation == self.OPERATION_OR:
-                self._fb[addr + idx] |= data
-            elif operation == self.OPERATION_AND:
-                self._fb[addr + idx] &= data
-            elif operation == self.OPERATION_NOT:
-                self._fb[addr + idx] &= ~data
-            elif operation == self.OPERATION_ALL:
-                self._fb[addr + idx] = data
+        self._fb_mark(addr, len)
+        self._fill_op(operation)(self._fb, addr, data, len)
 
     def _fb_set_byte(self, operation, addr, data):
-        if operation == self.OPERATION_XOR:
-            self._fb[addr] ^= data
-        elif operation == self.OPERATION_OR:
-            self._fb[addr] |= data
-        elif operation == self.OPERATION_AND:
-            self._fb[addr] &= data
-        elif operation == self.OPERATION_NOT:
-            self._fb[addr] &= ~data
-        elif operation == self.OPERATION_ALL:
-            self._fb[addr] = data
+        page = addr >> 7
+        col = addr & 0x7F
+        if col < self._dirty_lo[page]:
+            self._dirty_lo[page] = col
+        if col > self._dirty_hi[page]:
+            self._dirty_hi[page] = col
+
+        self._byte_op(operation)(self._fb, addr, data)
+
+    def _fb_vspan(self, set_byte, x, y0, y1):
+        # one masked write per page byte covered by the strip y0..y1 of column x
+        fb = self._fb
+        addr = (y0 >> 3) * self.LCD_WIDTH + x
+        last = (y1 >> 3) * self.LCD_WIDTH + x
+        mask = 0xFF << (y0 & 0x07) & 0xFF
+        while addr < last:
+            set_byte(fb, addr, mask)
+            addr += self.LCD_WIDTH
+            mask = 0xFF
+        set_byte(fb, addr, mask & (0xFF >> (7 - (y1 & 0x07))))
+
+    def _fb_draw_vline(self, x, y0, y1, operation):
+        if y1 < y0:
+            y0, y1 = swap(y0, y1)
+        self._fb_mark_rect(x, y0, x, y1)
+        self._fb_vspan(self._byte_op(operation), x, y0, y1)
+
+    def _fb_draw_hline(self, x0, x1, y, operation):
+        if x1 < x0:
+            x0, x1 = swap(x0, x1)
+        self._fb_mark_rect(x0, y, x1, y)
+        self._fill_op(operation)(self._fb, (y >> 3) * self.LCD_WIDTH + x0, 1 << (y & 0x07), x1 - x0 + 1)
+
+    def _fb_blit(self, bitmap, x0, y0, w, h, operation):
+        # bitmap is in page order like _fb: (h + 7) >> 3 pages of w column bytes,
+        # rows that don't start on a page boundary are split across two pages
+        col0 = max(0, -x0)
+        col1 = min(w, self.LCD_WIDTH - x0)
+        if col0 >= col1 or y0 >= self.LCD_HEIGHT or y0 + h <= 0:
+            return
+
+        self._fb_mark_rect(x0 + col0, y0, x0 + col1 - 1, y0 + h - 1)
+        row_op = self._row_op(operation)
+        fb = self._fb
+        bitmap = memoryview(bitmap)
+        len = col1 - col0
+        shift = y0 & 0x07
+        page0 = y0 >> 3
+
+        for page in range((h + 7) >> 3):
+            dst_page = page0 + page
+            if dst_page + 1 < 0:
+                continue
+            if dst_page >= self.LCD_PAGES:
+                break
+
+            src = page * w + col0
+            mask = 0xFF if (page + 1) << 3 <= h else 0xFF >> (8 - (h & 0x07))
+            # shifting the whole row as one integer moves every column byte at once,
+            # the bits that cross into the neighbour byte are masked off
+            bits = int.from_bytes(bitmap[src:src + len], "big")
+            if mask != 0xFF:
+                bits &= _pattern(mask, len)
+            addr = dst_page * self.LCD_WIDTH + x0 + col0
+
+            lo_mask = (mask << shift) & 0xFF
+            if dst_page >= 0 and lo_mask:
+                row_op(fb, addr, (bits << shift) & _pattern(lo_mask, len), len, lo_mask)
+
+            hi_mask = mask >> (8 - shift)
+            if shift and hi_mask and dst_page + 1 < self.LCD_PAGES:
+                row_op(fb, addr + self.LCD_WIDTH, (bits >> (8 - shift)) & _pattern(hi_mask, len), len, hi_mask)
+
+    def _fb_shift_area(self, x0, y0, x1, y1, dx):
+        # moves the content of the rectangle dx columns (left when negative),
+        # each page row is shifted as one integer, uncovered columns are cleared
+        self._fb_mark_rect(x0, y0, x1, y1)
+        fb = self._fb
+        len = x1 - x0 + 1
+        shift = min(abs(dx), len) << 3
+
+        for page in range(y0 >> 3, (y1 >> 3) + 1):
+            mask = 0xFF
+            if page == y0 >> 3:
+                mask &= 0xFF << (y0 & 0x07) & 0xFF
+            if page == y1 >> 3:
+                mask &= 0xFF >> (7 - (y1 & 0x07))
+            addr = page * self.LCD_WIDTH + x0
+            end = addr + len
+            row = int.from_bytes(fb[addr:end], "big")
+            if dx < 0:
+                moved = (row << shift) & ((1 << (len << 3)) - 1)
+            else:
+                moved = row >> shift
+            if mask != 0xFF:
+                keep = _pattern(mask, len)
+                moved = (row & ~keep) | (moved & keep)
+            fb[addr:end] = moved.to_bytes(len, "big")
 
     def _fb_set_pixel(self, x, y, operation):
         addr = (y >> 3) * self.LCD_WIDTH + x
         self._fb_set_byte(operation, addr, 1 << int(y & 0x07))
 
-    def _fb_draw_line(self, x0, y0, x1, y1, operation):        
+    def _fb_draw_line(self, x0, y0, x1, y1, operation):
+        self._fb_mark_rect(min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        set_byte = self._byte_op(operation)
+        fb = self._fb
+        width = self.LCD_WIDTH
+
         dx = abs(x1 - x0)
         dy = abs(y1 - y0)
         step = dy > dx
@@ -126,9 +624,9 @@ class SSD1306:
 
         while (x0 <= x1):
             if(step):
-                self._fb_set_pixel(y0, x0, operation)
+                set_byte(fb, (x0 >> 3) * width + y0, 1 << (x0 & 0x07))
             else:
-                self._fb_set_pixel(x0, y0, operation)
+                set_byte(fb, (y0 >> 3) * width + x0, 1 << (y0 & 0x07))
             err -= dy
 
             if(err < 0):
@@ -144,18 +642,28 @@ class SSD1306:
         if y1 < y0:
             y0, y1 = swap(y0, y1)
 
-        pos_b = (y0 >> 3) * self.LCD_WIDTH + x0
-        dy = y1 - y0 + 1
-        dx = x1 - x0 + 1
-        fill_b = (0xFF << (y0 & 0x07) & 0xFF)
+        self._fb_mark_rect(x0, y0, x1, y1)
+        fill = self._fill_op(operation)
+        fb = self._fb
 
-        while dy > 0 and pos_b < self.FB_SIZE:
-            self._fb_set_data(operation, pos_b, fill_b, dx)
-            pos_b += self.LCD_WIDTH
-            dy -= 8 - (y0 & 0x07) if fill_b < 0xFF else 8
-            fill_b = 0xFF if dy >= 8 else 0xFF >> (8 - dy)
+        dx = x1 - x0 + 1
+        page0 = y0 >> 3
+        page1 = y1 >> 3
+        for page in range(page0, page1 + 1):
+            # rows of the page inside y0..y1
+            mask = 0xFF
+            if page == page0:
+                mask &= 0xFF << (y0 & 0x07) & 0xFF
+            if page == page1:
+                mask &= 0xFF >> (7 - (y1 & 0x07))
+            fill(fb, page * self.LCD_WIDTH + x0, mask, dx)
 
     def _fb_draw_arc(self, x0, y0, r, s, operation):
+        self._fb_mark_rect(x0 - r, y0 - r, x0 + r, y0 + r)
+        set_byte = self._byte_op(operation)
+        fb = self._fb
+        width = self.LCD_WIDTH
+
         xd = 1 - (r << 1)
         yd = 0
         e = 0
@@ -164,21 +672,21 @@ class SSD1306:
 
         while x >= y:
             if s & 0x01:
-                self._fb_set_pixel(x0+x, y0-y, operation)
+                set_byte(fb, ((y0-y) >> 3) * width + x0+x, 1 << ((y0-y) & 0x07))
             if s & 0x02:
-                self._fb_set_pixel(x0+y, y0-x, operation)
+                set_byte(fb, ((y0-x) >> 3) * width + x0+y, 1 << ((y0-x) & 0x07))
             if s & 0x04:
-                self._fb_set_pixel(x0-y, y0-x, operation)
+                set_byte(fb, ((y0-x) >> 3) * width + x0-y, 1 << ((y0-x) & 0x07))
             if s & 0x08:
-                self._fb_set_pixel(x0-x, y0-y, operation)
+                set_byte(fb, ((y0-y) >> 3) * width + x0-x, 1 << ((y0-y) & 0x07))
             if s & 0x10:
-                self._fb_set_pixel(x0-x, y0+y, operation)
+                set_byte(fb, ((y0+y) >> 3) * width + x0-x, 1 << ((y0+y) & 0x07))
             if s & 0x20:
-                self._fb_set_pixel(x0-y, y0+x, operation)
+                set_byte(fb, ((y0+x) >> 3) * width + x0-y, 1 << ((y0+x) & 0x07))
             if s & 0x40:
-                self._fb_set_pixel(x0+y, y0+x, operation)
+                set_byte(fb, ((y0+x) >> 3) * width + x0+y, 1 << ((y0+x) & 0x07))
             if s & 0x80:
-                self._fb_set_pixel(x0+x, y0+y, operation)
+                set_byte(fb, ((y0+y) >> 3) * width + x0+x, 1 << ((y0+y) & 0x07))
 
             y += 1
             e += yd
@@ -209,40 +717,17 @@ class SSD1306:
             return False
         return True
 
-    def _fb_put_char(self, char, x0, y0, operation):
-        char_array = bytes([int(val) for val in self._font.get(char)])
-        bytes_per_line = len(self._font.get(char)) / self._font_hight
-
-        byte_idx = 0
-        bit_idx = 0
-        x = x0;
+    def _fb_put_char(self, char, x0, y0, operation, font):
+        glyph = font.glyph(char)
+        if glyph is not None:
+            self._fb_blit(glyph, x0, y0, font.width, font.hight, operation)
 
-        for byte in char_array:
-            if byte_idx >= bytes_per_line:
-                byte_idx = 0
-                x = x0;
-                bit_idx = 0
-                y0 += 1
-            
-            for bit in range(8):
-                if byte & 0x01:
-                    self._fb_set_pixel(x, y0, operation)
-                byte >>= 1
-                x += 1
-                bit_idx += 1
-                if bit_idx >= self._font_width:
-                    break
+        return x0 + font.width
 
-            byte_idx += 1
-        
-        return x
-	
-    def __init__(self, i2c_bus, addr):
+    def __init__(self, i2c_bus, addr, double_buffer=False, fps=DEFAULT_FPS):
         self._i2c_bus = i2c_bus
         self._addr = addr
         self._need_update = True
-        self._font_width = 0
-        self._font_hight = 0
         self._font = None
         
         devices = self._i2c_bus.scan()
@@ -250,41 +735,254 @@ class SSD1306:
             print (f"ERROR: there is not device with address {self._addr} on the bus")
             return None
 
-        self._fb = bytearray(self.FB_SIZE)
+        # drawing goes to the back frame, in single buffered mode it is also the
+        # one sent by the flush thread
+        self._use_frame(_Frame(self.FB_SIZE, self.LCD_PAGES, self.CONTROL_DATA))
+        self._ready = None
+        self._front = self._back
+        self._double_buffer = False
+        self._frame_pending = False
+        self._cmd_buf = bytearray((self.CONTROL_COMMAND, 0))
+        self._cmd_prefix = bytes((self.CONTROL_COMMAND,))
+        self._win_buf = bytearray((self.CONTROL_COMMAND,
+                                   self.CMD_COLUMN_ADDR, 0, self.LCD_WIDTH - 1,
+                                   self.CMD_PAGE_ADDR, 0, self.LCD_PAGES - 1))
         self.fb_lock = _thread.allocate_lock()
-        
-        self._send_command(self.CMD_DISPLAY_OFF)
-        self._send_command(self.CMD_SET_DISPLAY_CLOCKDIV)
-        self._send_command(0x80)
-        self._send_command(self.CMD_SET_MULTIPLEX)
-        self._send_command(0x3F)
-        self._send_command(self.CMD_SET_DISPLAY_OFFSET)
-        self._send_command(0x00)
-        self._send_command(self.CMD_SET_START_LINE | 0x00)
-        self._send_command(self.CMD_CHARGE_PUMP)
-        self._send_command(self.CMD_CHARGE_PUMP_ON)
-        self._send_command(self.CMD_MEMORY_MODE)
-        self._send_command(0x00)
-        self._send_command(self.CMD_SEG_REMAP | 0x01)
-        self._send_command(self.CMD_COM_SCAN_DEC)
-        self._send_command(self.CMD_SET_COMPINS)
-        self._send_command(0x12)
-        self._send_command(self.CMD_SET_CONTRAST)
-        self._send_command(0x4F)
-        self._send_command(self.CMD_SET_PRECHARGE)
-        self._send_command(0xF1)
-        self._send_command(self.CMD_SET_VCOM_DETECT)
-        self._send_command(0x40)
-        self._send_command(self.CMD_DISPLAY_ALLON_RESUME)
-        self._send_command(self.CMD_NORMAL_DISPLAY)
-        self._send_command(self.CMD_DISPLAY_ON)
-
-        _thread.start_new_thread(self._fb_update, ())
+        self._swap_lock = _thread.allocate_lock()
+        # a DisplayBus shares its transaction lock and flush loop between panels
+        self._shared_bus = hasattr(i2c_bus, "register")
+        self._bus_lock = i2c_bus.lock if self._shared_bus else _thread.allocate_lock()
+        # left unlocked, so the first flush goes out right away
+        self._wake = i2c_bus.wake if self._shared_bus else _thread.allocate_lock()
+        self._update_ticks = None
+        self._next_flush = time.ticks_ms()
+        self._scrolling = False
+        self._start_line = 0
+        self._start_pending = None
+        self.setFrameRate(fps)
+
+        self._fb_mark_all()
+        self.flush_bytes = 0
+        self.flush_saved = 0
+        self.total_saved = 0
+        self.frames = 0
+        self.frames_coalesced = 0
+        self.frames_dropped = 0
+        self.flushes = 0
+        self.bytes_sent = 0
+        self.flush_us_total = 0
+        self.flush_us_max = 0
+        self.latency_ms_total = 0
+        self.latency_ms_max = 0
+
+        with self._bus_lock:
+            self._send_commands(self.INIT_SEQUENCE)
+        if double_buffer:
+            self.setDoubleBuffer(True)
+
+        if self._shared_bus:
+            i2c_bus.register(self)
+        else:
+            _thread.start_new_thread(self._fb_update, ())
+
+    def setFrameRate(self, fps):
+        self._frame_ms = 1000 // max(1, fps)
+        self._retry_ms = self._frame_ms
+
+    def frameRate(self):
+        return 1000 // self._frame_ms
+
+    def stats(self):
+        flushes = max(1, self.flushes)
+        return {
+            "flushes": self.flushes,
+            "bytes_sent": self.bytes_sent,
+            "bytes_saved": self.total_saved,
+            "flush_us_avg": self.flush_us_total // flushes,
+            "flush_us_max": self.flush_us_max,
+            "latency_ms_avg": self.latency_ms_total // flushes,
+            "latency_ms_max": self.latency_ms_max,
+            "frames": self.frames,
+            "frames_coalesced": self.frames_coalesced,
+            "frames_dropped": self.frames_dropped,
+        }
+
+    def setDoubleBuffer(self, enable):
+        with self.fb_lock:
+            with self._swap_lock:
+                if enable == self._double_buffer:
+                    return
+                if enable:
+                    # what is pending in the back frame moves to the front one
+                    front = _Frame(self.FB_SIZE, self.LCD_PAGES, self.CONTROL_DATA)
+                    front.fb[:] = self._back.fb
+                    front.merge(self._back)
+                    self._back.clean()
+                    self._front = front
+                    # all three hold the same frame to start with, endFrame only
+                    # copies what changed since
+                    self._ready = _Frame(self.FB_SIZE, self.LCD_PAGES, self.CONTROL_DATA)
+                    self._ready.fb[:] = self._back.fb
+                else:
+                    with self._bus_lock:
+                        self._back.merge(self._front)
+                        if self._frame_pending:
+                            self._back.merge(self._ready)
+                    self._front = self._back
+                    self._ready = None
+                    self._frame_pending = False
+                    self._need_update = True
+                self._double_buffer = enable
+            self._wake_up()
+
+    def beginFrame(self):
+        # drawing always goes to the back frame, a frame starts where the last one ended
+        return self
+
+    def endFrame(self):
+        with self.fb_lock:
+            if not self._double_buffer:
+                self._changed()
+                return
+
+            with self._swap_lock:
+                if self._frame_pending:
+                    self.frames_coalesced += 1
+                # the back frame becomes the ready one and keeps changes of a
+                # ready frame that never made it to the bus; the old ready one
+                # is drawn into next, after copying what it lacks of this frame
+                self._back.merge(self._ready)
+                ready = self._back
+                self._ready.outdate(ready)
+                self._front.outdate(ready)
+                self._use_frame(self._ready)
+                self._ready = ready
+                self._back.catch_up(ready, self.LCD_WIDTH)
+                self._back.clean()
+                self._frame_pending = True
+                self.frames += 1
+            self._wake_up()
+
+    def frame(self):
+        return self
+
+    def __enter__(self):
+        return self.beginFrame()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.endFrame()
+
+    def scrollHorizontal(self, right, start_page, end_page, interval=0):
+        # interval is the 3 bit frame interval code of the datasheet, 0 = 5 frames
+        cmds = bytes((
+            self.CMD_DEACTIVATE_SCROLL,
+            self.CMD_RIGHT_HORIZONTAL_SCROLL if right else self.CMD_LEFT_HORIZONTAL_SCROLL,
+            0x00, start_page & 0x07, interval & 0x07, end_page & 0x07, 0x00, 0xFF,
+            self.CMD_ACTIVATE_SCROLL,
+        ))
+        self._scrolling = True
+        with self._bus_lock:
+            self._send_commands(cmds)
+
+    def scrollDiagonal(self, right, start_page, end_page, offset, interval=0):
+        # vertical offset rows per scroll step, over the whole panel height
+        cmds = bytes((
+            self.CMD_DEACTIVATE_SCROLL,
+            self.CMD_SET_VERTICAL_SCROLL_AREA, 0x00, self.LCD_HEIGHT,
+            self.CMD_VERTICAL_AND_RIGHT_HORIZONTAL_SCROLL if right else self.CMD_VERTICAL_AND_LEFT_HORIZONTAL_SCROLL,
+            0x00, start_page & 0x07, interval & 0x07, end_page & 0x07, offset & 0x3F,
+            self.CMD_ACTIVATE_SCROLL,
+        ))
+        self._scrolling = True
+        with self._bus_lock:
+            self._send_commands(cmds)
+
+    def scrollStop(self):
+        with self._bus_lock:
+            self._send_command(self.CMD_DEACTIVATE_SCROLL)
+        # the scroll has moved GDDRAM content around, so it is rewritten from _fb
+        with self.fb_lock:
+            with self._swap_lock:
+                self._scrolling = False
+                self._back.mark_all(self.LCD_WIDTH)
+                self._front.mark_all(self.LCD_WIDTH)
+            self._changed()
+            self._wake_up()
+
+    def setStartLine(self, line):
+        # vertical display offset: panel row 0 shows framebuffer row `line`
+        with self.fb_lock:
+            self._start_line = line % self.LCD_HEIGHT
+            self._start_pending = self._start_line
+            self._wake_up()
+
+    def startLine(self):
+        return self._start_line
+
+    def toRamY(self, y):
+        return (y + self._start_line) % self.LCD_HEIGHT
+
+    def _fb_clear_rows(self, y0, y1):
+        # rows y0..y1 of the whole width, other rows of their pages are kept
+        self._fb_mark_rect(0, y0, self.LCD_WIDTH - 1, y1)
+        fb = self._fb
+        page0 = y0 >> 3
+        page1 = y1 >> 3
+        for page in range(page0, page1 + 1):
+            mask = 0xFF
+            if page == page0:
+                mask &= 0xFF << (y0 & 0x07) & 0xFF
+            if page == page1:
+                mask &= 0xFF >> (7 - (y1 & 0x07))
+            if mask == 0xFF:
+                _fill_all(fb, page * self.LCD_WIDTH, 0, self.LCD_WIDTH)
+            else:
+                _fill_not(fb, page * self.LCD_WIDTH, mask, self.LCD_WIDTH)
+
+    def _fb_ring_advance(self, rows):
+        # rows scrolled off the top come back at the bottom, cleared
+        top = self._start_line
+        end = top + rows - 1
+        if end < self.LCD_HEIGHT:
+            self._fb_clear_rows(top, end)
+        else:
+            self._fb_clear_rows(top, self.LCD_HEIGHT - 1)
+            self._fb_clear_rows(0, end - self.LCD_HEIGHT)
+        self._start_line = (top + rows) % self.LCD_HEIGHT
+        self._start_pending = self._start_line
+        return top
+
+    def ringScroll(self, rows):
+        # ring buffer scroll: only the rows that come into view are rewritten,
+        # returns their framebuffer y, where the caller draws the new content
+        rows = max(1, min(rows, self.LCD_HEIGHT))
+        with self.fb_lock:
+            y = self._fb_ring_advance(rows)
+            self._changed()
+        return y
+
+    def appendLine(self, strng, operation, font=None):
+        # log/ticker line at the bottom, scrolling the panel up by whole pages
+        font = font or self._font
+        if not font:
+            return
+
+        rows = ((font.hight + 7) >> 3) << 3
+        with self.fb_lock:
+            y = self._fb_ring_advance(rows)
+            # a line crossing the bottom of the framebuffer continues at its top
+            for y0 in (y, y - self.LCD_HEIGHT) if y + rows > self.LCD_HEIGHT else (y,):
+                x0 = 0
+                for char in strng:
+                    if x0 >= self.LCD_WIDTH:
+                        break
+                    x0 = self._fb_put_char(char, x0, y0, operation, font) + self.CHAR_SPACE
+            self._changed()
 
     def clear(self):
         with self.fb_lock:
             self._fb_set_data(self.OPERATION_ALL, 0, 0, self.FB_SIZE)
-            self._need_update = True
+            self._changed()
 
     def putPixel(self, x, y, operation):
         x = self._check_x(x)
@@ -292,7 +990,7 @@ class SSD1306:
 
         with self.fb_lock:
             self._fb_set_pixel(x, y, operation)
-            self._need_update = True
+            self._changed()
 
     def drawLine(self, x0, y0, x1, y1, operation):
         x0 = self._check_x(x0)
@@ -301,8 +999,13 @@ class SSD1306:
         y1 = self._check_y(y1)
 
         with self.fb_lock:
-            self._fb_draw_line(x0, y0, x1, y1, operation)
-            self._need_update = True
+            if y0 == y1:
+                self._fb_draw_hline(x0, x1, y0, operation)
+            elif x0 == x1:
+                self._fb_draw_vline(x0, y0, y1, operation)
+            else:
+                self._fb_draw_line(x0, y0, x1, y1, operation)
+            self._changed()
 
     def drawRectangle(self, x0, y0, x1, y1, operation):
         x0 = self._check_x(x0)
@@ -310,12 +1013,22 @@ class SSD1306:
         y0 = self._check_y(y0)
         y1 = self._check_y(y1)
 
+        if x1 < x0:
+            x0, x1 = swap(x0, x1)
+
+        if y1 < y0:
+            y0, y1 = swap(y0, y1)
+
+        # every edge pixel is touched once, so XOR keeps the corners
         with self.fb_lock:
-            self._fb_draw_line(x0, y0, x1, y0, operation)
-            self._fb_draw_line(x0, y0, x0, y1, operation)
-            self._fb_draw_line(x1, y0, x1, y1, operation)
-            self._fb_draw_line(x0, y1, x1, y1, operation)
-            self._need_update = True
+            self._fb_draw_hline(x0, x1, y0, operation)
+            if y1 > y0:
+                self._fb_draw_hline(x0, x1, y1, operation)
+            if y1 - y0 > 1:
+                self._fb_draw_vline(x0, y0 + 1, y1 - 1, operation)
+                if x1 > x0:
+                    self._fb_draw_vline(x1, y0 + 1, y1 - 1, operation)
+            self._changed()
 
     def fillRectangle(self, x0, y0, x1, y1, operation):
         x0 = self._check_x(x0)
@@ -326,7 +1039,28 @@ class SSD1306:
         with self.fb_lock:
             self._fb_fill_rectangle(x0, y0, x1, y1, operation)
 
-            self._need_update = True
+            self._changed()
+
+    def shiftArea(self, x0, y0, x1, y1, dx):
+        # software scroll of a part of the panel, dx columns to the right
+        # (left when negative), the columns scrolled in are blank
+        x0 = self._check_x(x0)
+        x1 = self._check_x(x1)
+        y0 = self._check_y(y0)
+        y1 = self._check_y(y1)
+
+        if x1 < x0:
+            x0, x1 = swap(x0, x1)
+
+        if y1 < y0:
+            y0, y1 = swap(y0, y1)
+
+        if not dx:
+            return
+
+        with self.fb_lock:
+            self._fb_shift_area(x0, y0, x1, y1, dx)
+            self._changed()
 
     def fillRoundRectangle(self, x0, y0, x1, y1, r, operation):
         x0 = self._check_x(x0)
@@ -342,28 +1076,19 @@ class SSD1306:
 
         if r < 0:
             r = 0
+        r = min(r, (x1 - x0) >> 1, (y1 - y0) >> 1)
 
-        xd = 3 - (r << 1)
-        x = 0
-        y = r
+        h = _fill_heights(r, bytearray(r + 1))
 
         with self.fb_lock:
+            self._fb_mark_rect(x0, y0, x1, y1)
             self._fb_fill_rectangle(x0 + r, y0, x1 - r, y1, operation)
+            set_byte = self._byte_op(operation)
 
-            while x <= y:
-                if y > 0:
-                    self._fb_draw_line(x1+x-r, y0-y+r, x1+x-r, y1+y-r, operation)
-                    self._fb_draw_line(x0-x+r, y0-y+r, x0-x+r, y1+y-r, operation)
-                if x > 0:
-                    self._fb_draw_line(x0-y+r, y0-x+r, x0-y+r, y1+x-r, operation)
-                    self._fb_draw_line(x1+y-r, y0-x+r, x1+y-r, y1+x-r, operation)
-                if xd < 0:
-                    xd += (x << 2) + 6
-                else:
-                    xd += ((x - y) << 2) + 10
-                    y -= 1
-                x += 1
-            self._need_update = True
+            for dx in range(1, r + 1):
+                self._fb_vspan(set_byte, x0 + r - dx, y0 + r - h[dx], y1 - r + h[dx])
+                self._fb_vspan(set_byte, x1 - r + dx, y0 + r - h[dx], y1 - r + h[dx])
+            self._changed()
 
     def drawArc(self, x0, y0, r, s, operation):
         x0 = self._check_x(x0)
@@ -374,7 +1099,7 @@ class SSD1306:
         
         with self.fb_lock:
             self._fb_draw_arc(x0, y0, r, s, operation)
-            self._need_update = True
+            self._changed()
 
     def drawRoundRectangle(self, x0, y0, x1, y1, r, operation):
         x0 = self._check_x(x0)
@@ -392,16 +1117,16 @@ class SSD1306:
             r = 0
 
         with self.fb_lock:
-            self._fb_draw_line(x0+r, y0, x1-r, y0, operation)
-            self._fb_draw_line(x0+r, y1, x1-r, y1, operation)
-            self._fb_draw_line(x0, y0+r, x0, y1-r, operation)
-            self._fb_draw_line(x1, y0+r, x1, y1-r, operation)
+            self._fb_draw_hline(x0+r, x1-r, y0, operation)
+            self._fb_draw_hline(x0+r, x1-r, y1, operation)
+            self._fb_draw_vline(x0, y0+r, y1-r, operation)
+            self._fb_draw_vline(x1, y0+r, y1-r, operation)
             self._fb_draw_arc(x0+r, y0+r, r, 0x0C, operation)
             self._fb_draw_arc(x1-r, y0+r, r, 0x03, operation)
             self._fb_draw_arc(x0+r, y1-r, r, 0x30, operation)
             self._fb_draw_arc(x1-r, y1-r, r, 0xC0, operation)
 
-            self._need_update = True
+            self._changed()
 
     def drawCircle(self, x0, y0, r, operation):
         x0 = self._check_x(x0)
@@ -418,17 +1143,22 @@ class SSD1306:
         e = 0
         x = r
         y = 0
-        
+
         with self.fb_lock:
+            self._fb_mark_rect(x0 - r, y0 - r, x0 + r, y0 + r)
+            set_byte = self._byte_op(operation)
+            fb = self._fb
+            width = self.LCD_WIDTH
+
             while x >= y:
-                self._fb_set_pixel(x0-x, y0+y, operation)
-                self._fb_set_pixel(x0-x, y0-y, operation)
-                self._fb_set_pixel(x0+x, y0+y, operation)
-                self._fb_set_pixel(x0+x, y0-y, operation)
-                self._fb_set_pixel(x0-y, y0+x, operation)
-                self._fb_set_pixel(x0-y, y0-x, operation)
-                self._fb_set_pixel(x0+y, y0+x, operation)
-                self._fb_set_pixel(x0+y, y0-x, operation)
+                set_byte(fb, ((y0+y) >> 3) * width + x0-x, 1 << ((y0+y) & 0x07))
+                set_byte(fb, ((y0-y) >> 3) * width + x0-x, 1 << ((y0-y) & 0x07))
+                set_byte(fb, ((y0+y) >> 3) * width + x0+x, 1 << ((y0+y) & 0x07))
+                set_byte(fb, ((y0-y) >> 3) * width + x0+x, 1 << ((y0-y) & 0x07))
+                set_byte(fb, ((y0+x) >> 3) * width + x0-y, 1 << ((y0+x) & 0x07))
+                set_byte(fb, ((y0-x) >> 3) * width + x0-y, 1 << ((y0-x) & 0x07))
+                set_byte(fb, ((y0+x) >> 3) * width + x0+y, 1 << ((y0+x) & 0x07))
+                set_byte(fb, ((y0-x) >> 3) * width + x0+y, 1 << ((y0-x) & 0x07))
 
                 y += 1
                 e += yd
@@ -438,7 +1168,7 @@ class SSD1306:
                     e += xd
                     xd += 2
 
-            self._need_update = True
+            self._changed()
 
     def fillCircle(self, x0, y0, r, operation):
         x0 = self._check_x(x0)
@@ -450,74 +1180,94 @@ class SSD1306:
         while not self._check_radius(x0, y0, r):
             r -= 1
         
-        xd = 3 - (r << 1)
-        x = 0
-        y = r
+        # columns cover both the fill and the outline of drawCircle
+        h = _outline_heights(r, _fill_heights(r, bytearray(r + 1)))
 
         with self.fb_lock:
-            while x <= y:
-                if y > 0:
-                    self._fb_draw_line(x0-x, y0-y, x0-x, y0+y, operation)
-                    self._fb_draw_line(x0+x, y0-y, x0+x, y0+y, operation)
-                if x > 0:
-                    self._fb_draw_line(x0-y, y0-x, x0-y, y0+x, operation)
-                    self._fb_draw_line(x0+y, y0-x, x0+y, y0+x, operation)
-                if xd < 0:
-                    xd += (x << 2) + 6
-                else:
-                    xd += ((x - y) << 2) + 10
-                    y -= 1
-                x += 1
+            self._fb_mark_rect(x0 - r, y0 - r, x0 + r, y0 + r)
+            set_byte = self._byte_op(operation)
 
-        self._need_update = True
-        self.drawCircle(x0, y0, r, operation)
+            self._fb_vspan(set_byte, x0, y0 - h[0], y0 + h[0])
+            for dx in range(1, r + 1):
+                self._fb_vspan(set_byte, x0 - dx, y0 - h[dx], y0 + h[dx])
+                self._fb_vspan(set_byte, x0 + dx, y0 - h[dx], y0 + h[dx])
+            self._changed()
 
-    def fontSet(self, font_file):
-        with open(font_file, "r") as font_fd:
-            font = json.loads(font_fd.read())
+    def drawBitmap(self, bitmap, x0, y0, w, h, operation):
+        if w <= 0 or h <= 0 or len(bitmap) < ((h + 7) >> 3) * w:
+            return
 
-        if not font:
+        with self.fb_lock:
+            self._fb_blit(bitmap, x0, y0, w, h, operation)
+            self._changed()
+
+    def drawSpan(self, span, x0, y0, h, operation):
+        # one page row of a bitmap, len(span) columns of up to 8 rows; no lock
+        # taken, for a caller holding fb_lock over a whole frame up to endFrame
+        self._fb_blit(span, x0, y0, len(span), h, operation)
+
+    def drawImage(self, image, x0, y0, operation, frame=0):
+        # image is an Image or the path of an image file, decoded page row by
+        # page row straight into the framebuffer
+        opened = not isinstance(image, Image)
+        if opened:
+            try:
+                image = Image(image)
+            except (OSError, ValueError) as e:
+                print(f"ERROR: couldn't load image {image}: {e}")
+                return
+
+        try:
+            with self.fb_lock:
+                for page, row in image.rows(frame):
+                    hight = min(8, image.hight - (page << 3))
+                    self._fb_blit(row, x0, y0 + (page << 3), len(row), hight, operation)
+                self._changed()
+        finally:
+            if opened:
+                image.close()
+
+    def fontSet(self, font_file):
+        try:
+            font = Font(font_file)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: couldn't load font {font_file}: {e}")
             return False
-        
-        self._font_width = font.get("width")
-        self._font_hight = font.get("hight")
-        self._font = font.get("chars")
 
-        if self._font_width and self._font_hight and self._font:
-            return True
-        return False
+        if self._font:
+            self._font.close()
 
-    def putChar(self, char, x0, y0, operation):
-        x0 = self._check_x(x0)
-        y0 = self._check_y(y0)
+        self._font = font
+        return bool(font.width and font.hight)
 
-        if x0 < 0 or y0 < 0:
-            return
-        
-        if not self._font_width or not self._font_hight or not self._font:
+    def measureString(self, strng, font=None):
+        font = font or self._font
+        if not font or not strng:
+            return 0, 0
+        return len(strng) * (font.width + self.CHAR_SPACE) - self.CHAR_SPACE, font.hight
+
+    def putChar(self, char, x0, y0, operation, font=None):
+        font = font or self._font
+        if not font:
             return
-        
+
         with self.fb_lock:
-            self._fb_put_char(char, x0, y0, operation)
+            self._fb_put_char(char, x0, y0, operation, font)
 
-            self._need_update = True
+            self._changed()
 
-    def putString(self, strng, x0, y0, operation):
-        x0 = self._check_x(x0)
-        y0 = self._check_y(y0)
-
-        if x0 < 0 or y0 < 0:
-            return
-        
-        if not self._font_width or not self._font_hight or not self._font:
+    def putString(self, strng, x0, y0, operation, font=None):
+        font = font or self._font
+        if not font:
             return
-        
+
+        # glyphs are clipped at the panel edges, the string stops past the right one
         with self.fb_lock:
             for char in strng:
-                if x0 + self._font_width >= self.LCD_WIDTH:
+                if x0 >= self.LCD_WIDTH:
                     break
 
-                x0 = self._fb_put_char(char, x0, y0, operation)
-                x0 += 1
+                x0 = self._fb_put_char(char, x0, y0, operation, font)
+                x0 += self.CHAR_SPACE
 
-            self._need_update = True
+            self._changed()
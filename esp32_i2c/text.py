@@ -0,0 +1,113 @@
+from ssd1306 import SSD1306
+
+ALIGN_LEFT = 0
+ALIGN_CENTER = 1
+ALIGN_RIGHT = 2
+
+def wrap(display, text, width, font=None):
+    # word wrap into lines no wider than width pixels, words that don't fit
+    # on a line of their own are broken
+    font = font or display._font
+    if not font:
+        return []
+
+    cols = max(1, (width + SSD1306.CHAR_SPACE) // (font.width + SSD1306.CHAR_SPACE))
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split(" "):
+            while len(word) > cols:
+                if line:
+                    lines.append(line)
+                    line = ""
+                lines.append(word[:cols])
+                word = word[cols:]
+
+            if not line:
+                line = word
+            elif len(line) + 1 + len(word) <= cols:
+                line += " " + word
+            else:
+                lines.append(line)
+                line = word
+        lines.append(line)
+    return lines
+
+def align_x(display, text, x0, x1, align, font=None):
+    width = display.measureString(text, font)[0]
+    if align == ALIGN_CENTER:
+        return x0 + ((x1 - x0 + 1 - width) >> 1)
+    if align == ALIGN_RIGHT:
+        return x1 + 1 - width
+    return x0
+
+def drawText(display, text, x0, y0, x1, y1, operation, align=ALIGN_LEFT, font=None, line_space=1):
+    # wrapped text inside the box, lines that don't fit below y1 are dropped
+    font = font or display._font
+    if not font:
+        return 0
+
+    lines = wrap(display, text, x1 - x0 + 1, font)
+    drawn = 0
+    for line in lines:
+        if y0 + font.hight - 1 > y1:
+            break
+        display.putString(line, align_x(display, line, x0, x1, align, font), y0, operation, font)
+        y0 += font.hight + line_space
+        drawn += 1
+    return drawn
+
+class TextField:
+
+    # A fixed number of character cells that remembers what it shows and on
+    # update only redraws the cells whose character changed.
+
+    def __init__(self, display, font, x0, y0, cells, align=ALIGN_LEFT):
+        self._display = display
+        self._font = font
+        self._x0 = x0
+        self._y0 = y0
+        self._cells = cells
+        self._align = align
+        self._shown = " " * cells
+        self.redrawn = 0
+
+    def _layout(self, text):
+        text = text[:self._cells]
+        pad = self._cells - len(text)
+        if self._align == ALIGN_RIGHT:
+            return " " * pad + text
+        if self._align == ALIGN_CENTER:
+            return " " * (pad >> 1) + text + " " * (pad - (pad >> 1))
+        return text + " " * pad
+
+    def _draw_cell(self, idx, char):
+        x = self._x0 + idx * (self._font.width + SSD1306.CHAR_SPACE)
+        if self._font.glyph(char) is not None:
+            # ALL paints the whole glyph cell, background included
+            self._display.putChar(char, x, self._y0, SSD1306.OPERATION_ALL, self._font)
+        else:
+            self._display.fillRectangle(x, self._y0, x + self._font.width - 1,
+                                        self._y0 + self._font.hight - 1, SSD1306.OPERATION_NOT)
+
+    def bounds(self):
+        width = self._cells * (self._font.width + SSD1306.CHAR_SPACE) - SSD1306.CHAR_SPACE
+        return self._x0, self._y0, self._x0 + width - 1, self._y0 + self._font.hight - 1
+
+    def set(self, text):
+        text = self._layout(text)
+        self.redrawn = 0
+        for idx in range(self._cells):
+            if text[idx] != self._shown[idx]:
+                self._draw_cell(idx, text[idx])
+                self.redrawn += 1
+        self._shown = text
+        return self.redrawn
+
+    def redraw(self):
+        for idx in range(self._cells):
+            self._draw_cell(idx, self._shown[idx])
+        self.redrawn = self._cells
+
+    def text(self):
+        return self._shown
@@ -0,0 +1,118 @@
+# Records a sequence of PBM/PNG frames as an animation for anim.Player:
+# key frames plus XOR delta frames holding only the changed column spans.
+#
+#   python3 tools/anim_conv.py [--fps N] [--key N] [--invert] out.bin frame0.png frame1.png ...
+#
+# --key forces a key frame every N frames (0, the default, only the first
+# one), a delta larger than its key frame is stored as a key frame anyway.
+
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from anim import ANIM_DELTA, ANIM_HEADER, ANIM_KEY, ANIM_MAGIC, ANIM_VERSION
+from image import pack_bits
+from img_conv import read_pbm, read_png, to_pages
+
+# unchanged bytes worth sending to save a span: each span costs 3 bytes in
+# the file and a window command on the bus
+SPAN_GAP = 6
+SPAN_MAX = 255
+
+
+def key_frame(frame, width):
+    data = bytes((ANIM_KEY,))
+    for page in range(0, len(frame), width):
+        row = pack_bits(frame[page:page + width])
+        data += struct.pack("<H", len(row)) + row
+    return data
+
+
+def delta_spans(prev, frame, width):
+    spans = []
+    for page in range(len(frame) // width):
+        base = page * width
+        col = 0
+        while col < width:
+            if prev[base + col] == frame[base + col]:
+                col += 1
+                continue
+            start = col
+            end = col + 1
+            col += 1
+            while col < width and col - start < SPAN_MAX:
+                if prev[base + col] != frame[base + col]:
+                    end = col + 1
+                elif col - end >= SPAN_GAP:
+                    break
+                col += 1
+            spans.append((page, start, bytes(prev[base + x] ^ frame[base + x] for x in range(start, end))))
+            col = end
+    return spans
+
+
+def delta_frame(prev, frame, width):
+    spans = delta_spans(prev, frame, width)
+    data = bytes((ANIM_DELTA,)) + struct.pack("<H", len(spans))
+    for page, col, xor in spans:
+        data += bytes((page, col, len(xor))) + xor
+    return data
+
+
+def convert(out_file, in_files, fps=10, key=0, invert=False):
+    frames = []
+    size = None
+    for path in in_files:
+        if path.lower().endswith(".png"):
+            width, hight, rows = read_png(path, 128)
+        else:
+            width, hight, rows = read_pbm(path)
+        if size and size != (width, hight):
+            raise ValueError(f"{path}: {width}x{hight} differs from the first frame {size[0]}x{size[1]}")
+        if width > 255:
+            raise ValueError(f"{path}: frames can't be wider than 255 pixels")
+        size = (width, hight)
+        if invert:
+            rows = [[1 - value for value in row] for row in rows]
+        frames.append(to_pages(width, hight, rows))
+
+    width, hight = size
+    body = b""
+    keys = 0
+    prev = None
+    for idx, frame in enumerate(frames):
+        data = key_frame(frame, width)
+        if prev is not None and not (key and idx % key == 0):
+            delta = delta_frame(prev, frame, width)
+            if len(delta) < len(data):
+                data = delta
+        keys += data[0] == ANIM_KEY
+        body += data
+        prev = frame
+
+    with open(out_file, "wb") as out:
+        out.write(struct.pack(ANIM_HEADER, ANIM_MAGIC, ANIM_VERSION, 0, width, hight, len(frames), 1000 // fps))
+        out.write(body)
+
+    raw = len(frames) * len(frames[0])
+    print(f"{len(frames)} frames {width}x{hight} -> {out_file}: {keys} key, {len(frames) - keys} delta, "
+          f"{raw} -> {os.path.getsize(out_file)} bytes")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {}
+    while args and args[0].startswith("--"):
+        option = args.pop(0)
+        if option in ("--fps", "--key"):
+            options[option[2:]] = int(args.pop(0))
+        elif option == "--invert":
+            options["invert"] = True
+        else:
+            args = []
+    if len(args) < 2:
+        print(f"usage: {sys.argv[0]} [--fps N] [--key N] [--invert] out.bin frame0.png frame1.png ...")
+        sys.exit(1)
+    convert(args[0], args[1:], **options)
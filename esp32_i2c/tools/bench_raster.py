@@ -0,0 +1,98 @@
+# Host side benchmark of the SSD1306 raster primitives.
+#
+#   python3 tools/bench_raster.py [reference_ssd1306.py]
+#
+# Times clear/fill/line/circle/rectangle/ring scroll of ../ssd1306.py and, when given, of a
+# reference copy of the driver (e.g. from `git show <rev>:esp32_i2c/ssd1306.py`).
+# The current driver draws to the emulated panel, which has to show exactly its
+# framebuffer after every case.
+
+import importlib.util
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import host
+
+host.install()
+
+from machine import I2C
+
+DRIVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ssd1306.py")
+REPEAT = 200
+
+
+class NullI2C:
+    def scan(self):
+        return [0x3C]
+
+    def writeto(self, addr, buf):
+        pass
+
+    def writevto(self, addr, bufs):
+        pass
+
+
+def load_driver(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.SSD1306
+
+
+def cases(cls):
+    # a reference driver from before ring scrolling existed skips that case
+    found = (
+        ("clear", lambda d, i: d.clear()),
+        ("fillRectangle XOR", lambda d, i: d.fillRectangle(0, i & 7, 127, 63, cls.OPERATION_XOR)),
+        ("fillRectangle OR", lambda d, i: d.fillRectangle(10, 3, 100, 50, cls.OPERATION_OR)),
+        ("fillRectangle short", lambda d, i: d.fillRectangle(0, i & 7, 10, (i & 7) + 2, cls.OPERATION_XOR)),
+        ("fillRectangle ALL", lambda d, i: d.fillRectangle(72, 38, 22, 4, cls.OPERATION_ALL if i & 1 else cls.OPERATION_NOT)),
+        ("drawLine", lambda d, i: d.drawLine(0, i & 63, 127, 63 - (i & 63), cls.OPERATION_XOR)),
+        ("drawCircle", lambda d, i: d.drawCircle(64, 32, 30, cls.OPERATION_XOR)),
+        ("fillCircle", lambda d, i: d.fillCircle(64, 32, 30, cls.OPERATION_OR)),
+        ("fillRoundRectangle", lambda d, i: d.fillRoundRectangle(4, 4, 123, 59, 12, cls.OPERATION_OR)),
+        ("drawRectangle", lambda d, i: d.drawRectangle(2, 2, 125, 61, cls.OPERATION_XOR)),
+        ("ringScroll", lambda d, i: d.ringScroll(1 + i % 11)),
+    )
+    return tuple(case for case in found if case[0] != "ringScroll" or hasattr(cls, "ringScroll"))
+
+
+def wait_flushed(display):
+    # the flush thread is idle once nothing is pending and it sleeps on its wake lock
+    while display._need_update or not display._wake.locked():
+        time.sleep(0.001)
+
+
+def bench(cls, i2c=None):
+    display = cls(i2c or NullI2C(), 0x3C)
+    results = []
+    for name, case in cases(cls):
+        start = time.perf_counter()
+        for i in range(REPEAT):
+            case(display, i)
+        results.append((name, (time.perf_counter() - start) / REPEAT * 1e6))
+        if i2c:
+            wait_flushed(display)
+            assert bytes(i2c.devices[0x3C].ram) == bytes(display._fb), f"panel and framebuffer differ after {name}"
+    return results
+
+
+def main(argv):
+    current = bench(load_driver(DRIVER, "ssd1306_current"), I2C(1, freq=400000))
+    reference = dict(bench(load_driver(argv[1], "ssd1306_reference"))) if len(argv) > 1 else None
+
+    print(f"{'primitive':<20}{'current us':>12}{'reference us':>14}{'speedup':>9}")
+    for name, us in current:
+        if reference and name in reference:
+            ref_us = reference[name]
+            print(f"{name:<20}{us:>12.1f}{ref_us:>14.1f}{ref_us / us:>8.1f}x")
+        else:
+            print(f"{name:<20}{us:>12.1f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,89 @@
+# Host side benchmark of ssd1306.py on the emulated I2C bus and panel.
+#
+#   python3 tools/bench_ssd1306.py [--png DIR]
+#
+# For every primitive reports draw calls per second (with flushes slowed
+# down to 2 per second meanwhile) and the bytes and bus time one call
+# costs once flushed, at the 400 kHz the demo configures. With --png the
+# panel content after each case is written to DIR.
+
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "esp32_i2c"))
+
+import host
+
+host.install()
+
+from machine import I2C
+from ssd1306 import SSD1306
+
+FONT = os.path.join(ROOT, "esp32_i2c", "fonts", "font_7x12.bin")
+REPEAT = 200
+
+CASES = (
+    ("putPixel", lambda d, i: d.putPixel(i & 127, i & 63, SSD1306.OPERATION_XOR)),
+    ("drawLine", lambda d, i: d.drawLine(0, i & 63, 127, 63 - (i & 63), SSD1306.OPERATION_XOR)),
+    ("drawLine horizontal", lambda d, i: d.drawLine(0, i & 63, 127, i & 63, SSD1306.OPERATION_XOR)),
+    ("drawRectangle", lambda d, i: d.drawRectangle(10, 10, 117, 53, SSD1306.OPERATION_XOR)),
+    ("fillRectangle", lambda d, i: d.fillRectangle(10, 10, 117, 53, SSD1306.OPERATION_XOR)),
+    ("drawRoundRectangle", lambda d, i: d.drawRoundRectangle(10, 10, 117, 53, 8, SSD1306.OPERATION_XOR)),
+    ("fillRoundRectangle", lambda d, i: d.fillRoundRectangle(10, 10, 117, 53, 8, SSD1306.OPERATION_XOR)),
+    ("drawCircle", lambda d, i: d.drawCircle(64, 32, 20, SSD1306.OPERATION_XOR)),
+    ("fillCircle", lambda d, i: d.fillCircle(64, 32, 20, SSD1306.OPERATION_XOR)),
+    ("putChar", lambda d, i: d.putChar("A", 60, 27, SSD1306.OPERATION_XOR)),
+    ("putString", lambda d, i: d.putString("Hello from ESP!", 5, 10, SSD1306.OPERATION_XOR)),
+    ("clear", lambda d, i: d.clear()),
+)
+
+
+def wait_flushed(display):
+    # the flush thread is idle once nothing is pending and it sleeps on its wake lock
+    while display._need_update or not display._wake.locked():
+        time.sleep(0.001)
+
+
+def main(argv):
+    png_dir = argv[argv.index("--png") + 1] if "--png" in argv else None
+
+    i2c = I2C(1, freq=400000)
+    panel = i2c.devices[0x3C]
+    display = SSD1306(i2c, 0x3C)
+    display.fontSet(FONT)
+    wait_flushed(display)
+
+    print(f"{'primitive':<22}{'ops/s':>10}{'bus bytes':>11}{'bus ms':>8}")
+    for name, case in CASES:
+        # bytes on the bus for one call, flushed on its own
+        display.clear()
+        wait_flushed(display)
+        i2c.reset_stats()
+        case(display, 1)
+        wait_flushed(display)
+        bus_bytes, bus_us = i2c.bytes, i2c.bus_us
+        if png_dir:
+            panel.save_png(os.path.join(png_dir, name.replace(" ", "_") + ".png"))
+
+        # drawing rate, the flush thread mostly stays out of the way
+        display.setFrameRate(2)
+        start = time.perf_counter()
+        for i in range(REPEAT):
+            case(display, i)
+        rate = REPEAT / (time.perf_counter() - start)
+        display.setFrameRate(SSD1306.DEFAULT_FPS)
+        wait_flushed(display)
+
+        print(f"{name:<22}{rate:>10.0f}{bus_bytes:>11}{bus_us / 1000:>8.2f}")
+
+    assert bytes(panel.ram) == bytes(display._fb), "panel and framebuffer differ"
+    stats = display.stats()
+    print(f"\nflushes {stats['flushes']}, bytes sent {stats['bytes_sent']}, "
+          f"bytes saved {stats['bytes_saved']}, flush avg {stats['flush_us_avg']} us")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
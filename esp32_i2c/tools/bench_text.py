@@ -0,0 +1,53 @@
+# Host side benchmark of text drawing, in characters per second.
+#
+#   python3 tools/bench_text.py [reference_ssd1306.py]
+#
+# The reference driver (e.g. from `git show <rev>:esp32_i2c/ssd1306.py`)
+# must understand the fonts in ../fonts that are benchmarked here.
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_raster import DRIVER, NullI2C, load_driver
+
+FONTS_DIR = os.path.join(os.path.dirname(DRIVER), "fonts")
+REPEAT = 200
+CASES = (
+    ("font_7x12.bin", "Hello from ESP!", 0, 10),
+    ("font_7x12.bin", "Hello from ESP!", 0, 13),
+    ("font_lcd_13x21.bin", "12:25", 10, 30),
+    ("font_lcd_13x21.bin", "12:25", 10, 27),
+)
+
+
+def bench(cls):
+    display = cls(NullI2C(), 0x3C)
+    results = []
+    for font, text, x0, y0 in CASES:
+        display.fontSet(os.path.join(FONTS_DIR, font))
+        display.putString(text, x0, y0, cls.OPERATION_XOR)
+        start = time.perf_counter()
+        for i in range(REPEAT):
+            display.putString(text, x0, y0, cls.OPERATION_XOR)
+        results.append((f"{font} y={y0}", REPEAT * len(text) / (time.perf_counter() - start)))
+    return results
+
+
+def main(argv):
+    current = bench(load_driver(DRIVER, "ssd1306_current"))
+    reference = bench(load_driver(argv[1], "ssd1306_reference")) if len(argv) > 1 else None
+
+    print(f"{'font':<26}{'current chars/s':>16}{'reference chars/s':>19}{'speedup':>9}")
+    for idx, (name, rate) in enumerate(current):
+        if reference:
+            ref_rate = reference[idx][1]
+            print(f"{name:<26}{rate:>16.0f}{ref_rate:>19.0f}{rate / ref_rate:>8.1f}x")
+        else:
+            print(f"{name:<26}{rate:>16.0f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,43 @@
+# Converts the JSON fonts into the binary format read lazily by font.Font.
+#
+#   python3 tools/font_conv.py fonts/font_7x12.json [fonts/font_7x12.bin]
+
+import json
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from font import FONT_HEADER, FONT_MAGIC, FONT_VERSION, parse_hex_row
+
+
+def convert(json_file, bin_file):
+    with open(json_file, "r") as font_fd:
+        font = json.loads(font_fd.read())
+
+    width = font.get("width")
+    hight = font.get("hight")
+    bytes_per_line = (width + 7) >> 3
+    stride = bytes_per_line * hight
+    chars = sorted(font.get("chars").items())
+
+    with open(bin_file, "wb") as out:
+        out.write(struct.pack(FONT_HEADER, FONT_MAGIC, FONT_VERSION, width, hight,
+                              bytes_per_line, len(chars), stride))
+        out.write(struct.pack(f"<{len(chars)}H", *(ord(char) for char, _ in chars)))
+        for char, values in chars:
+            row = parse_hex_row(values)
+            if len(row) != stride:
+                print(f"'{char}': {len(row)} bytes instead of {stride}, padded")
+            out.write(bytes((row + [0] * stride)[:stride]))
+
+    print(f"{json_file} -> {bin_file}: {len(chars)} chars {width}x{hight}, "
+          f"{os.path.getsize(json_file)} -> {os.path.getsize(bin_file)} bytes")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(f"usage: {sys.argv[0]} font.json [font.bin]")
+        sys.exit(1)
+    convert(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(sys.argv[1])[0] + ".bin")
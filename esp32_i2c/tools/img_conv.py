@@ -0,0 +1,215 @@
+# Converts PBM/PNG images into the page ordered format drawn by
+# SSD1306.drawImage, several input files become the frames of one image.
+#
+#   python3 tools/img_conv.py [--raw] [--invert] [--threshold N] out.bin in.png [in2.png ...]
+#
+# Lit pixels are the 1 bits of a PBM and the bright ones of a PNG (as the
+# panel shows them, transparent is unlit). Rows are PackBits compressed
+# unless that makes the image larger or --raw is given.
+
+import os
+import struct
+import sys
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from image import IMAGE_HEADER, IMAGE_HEADER_SIZE, IMAGE_MAGIC, IMAGE_RLE, IMAGE_VERSION, pack_bits
+
+
+def _pbm_tokens(data, pos, count):
+    # whitespace separated header fields, skipping comments
+    tokens = []
+    while len(tokens) < count:
+        while data[pos:pos + 1].isspace():
+            pos += 1
+        if data[pos:pos + 1] == b"#":
+            pos = data.index(b"\n", pos)
+            continue
+        start = pos
+        while pos < len(data) and not data[pos:pos + 1].isspace():
+            pos += 1
+        tokens.append(data[start:pos])
+    return tokens, pos
+
+
+def read_pbm(path):
+    with open(path, "rb") as image_fd:
+        data = image_fd.read()
+
+    (magic, width, hight), pos = _pbm_tokens(data, 0, 3)
+    width, hight = int(width), int(hight)
+    if magic == b"P1":
+        bits = [int(char) for char in data[pos:].decode() if char in "01"]
+        return width, hight, [bits[y * width:(y + 1) * width] for y in range(hight)]
+    if magic != b"P4":
+        raise ValueError(f"{path}: only P1/P4 PBM is supported")
+
+    pos += 1
+    stride = (width + 7) >> 3
+    rows = []
+    for y in range(hight):
+        line = data[pos + y * stride:pos + (y + 1) * stride]
+        rows.append([(line[x >> 3] >> (7 - (x & 0x07))) & 1 for x in range(width)])
+    return width, hight, rows
+
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def read_png(path, threshold):
+    with open(path, "rb") as image_fd:
+        data = image_fd.read()
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError(f"{path} is not a PNG file")
+
+    pos = 8
+    idat = b""
+    palette = None
+    alpha = None
+    while pos < len(data):
+        size, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + size]
+        pos += size + 12
+        if kind == b"IHDR":
+            width, hight, depth, color, _, _, interlace = struct.unpack(">IIBBBBB", body)
+        elif kind == b"PLTE":
+            palette = [body[idx:idx + 3] for idx in range(0, len(body), 3)]
+        elif kind == b"tRNS":
+            alpha = body
+        elif kind == b"IDAT":
+            idat += body
+        elif kind == b"IEND":
+            break
+
+    if interlace:
+        raise ValueError(f"{path}: interlaced PNG is not supported")
+    channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}[color]
+    bits = depth * channels
+    stride = (width * bits + 7) >> 3
+    step = max(1, bits >> 3)
+    raw = zlib.decompress(idat)
+
+    rows = []
+    prev = bytearray(stride)
+    for y in range(hight):
+        kind = raw[y * (stride + 1)]
+        line = bytearray(raw[y * (stride + 1) + 1:(y + 1) * (stride + 1)])
+        for x in range(stride):
+            left = line[x - step] if x >= step else 0
+            up = prev[x]
+            corner = prev[x - step] if x >= step else 0
+            if kind == 1:
+                line[x] = (line[x] + left) & 0xFF
+            elif kind == 2:
+                line[x] = (line[x] + up) & 0xFF
+            elif kind == 3:
+                line[x] = (line[x] + ((left + up) >> 1)) & 0xFF
+            elif kind == 4:
+                line[x] = (line[x] + _paeth(left, up, corner)) & 0xFF
+        prev = line
+
+        row = []
+        for x in range(width):
+            if depth < 8:
+                bit = x * depth
+                sample = (line[bit >> 3] >> (8 - depth - (bit & 0x07))) & ((1 << depth) - 1)
+                values = [sample * 255 // ((1 << depth) - 1)] if color == 0 else [sample]
+            else:
+                # 16 bit samples keep their high byte
+                size = depth >> 3
+                values = [line[(x * channels + c) * size] for c in range(channels)]
+
+            opaque = True
+            if color == 3:
+                index = values[0]
+                if alpha is not None and index < len(alpha):
+                    opaque = alpha[index] >= 128
+                values = list(palette[index])
+            elif color in (4, 6):
+                opaque = values[-1] >= 128
+                values = values[:-1]
+            level = values[0] if len(values) == 1 else (values[0] * 299 + values[1] * 587 + values[2] * 114) // 1000
+            row.append(1 if opaque and level >= threshold else 0)
+        rows.append(row)
+    return width, hight, rows
+
+
+def to_pages(width, hight, rows):
+    pages = bytearray(((hight + 7) >> 3) * width)
+    for y, row in enumerate(rows):
+        bit = 1 << (y & 0x07)
+        base = (y >> 3) * width
+        for x, value in enumerate(row):
+            if value:
+                pages[base + x] |= bit
+    return pages
+
+
+def convert(out_file, in_files, rle=True, invert=False, threshold=128):
+    frames = []
+    size = None
+    for path in in_files:
+        if path.lower().endswith(".png"):
+            width, hight, rows = read_png(path, threshold)
+        else:
+            width, hight, rows = read_pbm(path)
+        if size and size != (width, hight):
+            raise ValueError(f"{path}: {width}x{hight} differs from the first frame {size[0]}x{size[1]}")
+        size = (width, hight)
+        if invert:
+            rows = [[1 - value for value in row] for row in rows]
+        frames.append(to_pages(width, hight, rows))
+
+    width, hight = size
+    raw = [bytes(frame) for frame in frames]
+    packed = []
+    for frame in frames:
+        data = b""
+        for page in range(0, len(frame), width):
+            row = pack_bits(frame[page:page + width])
+            data += struct.pack("<H", len(row)) + row
+        packed.append(data)
+    flags = 0
+    if rle and sum(len(data) for data in packed) < sum(len(data) for data in raw):
+        flags = IMAGE_RLE
+    bodies = packed if flags else raw
+
+    offset = IMAGE_HEADER_SIZE + len(bodies) * 4
+    offsets = []
+    for body in bodies:
+        offsets.append(offset)
+        offset += len(body)
+
+    with open(out_file, "wb") as out:
+        out.write(struct.pack(IMAGE_HEADER, IMAGE_MAGIC, IMAGE_VERSION, flags, width, hight, len(bodies)))
+        out.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        for body in bodies:
+            out.write(body)
+
+    print(f"{', '.join(in_files)} -> {out_file}: {len(bodies)} frame(s) {width}x{hight}, "
+          f"{'rle' if flags else 'raw'}, {sum(len(data) for data in raw)} -> {os.path.getsize(out_file)} bytes")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {"rle": True, "invert": False, "threshold": 128}
+    while args and args[0].startswith("--"):
+        option = args.pop(0)
+        if option == "--raw":
+            options["rle"] = False
+        elif option == "--invert":
+            options["invert"] = True
+        elif option == "--threshold":
+            options["threshold"] = int(args.pop(0))
+        else:
+            args = []
+    if len(args) < 2:
+        print(f"usage: {sys.argv[0]} [--raw] [--invert] [--threshold N] out.bin in.png [in2.png ...]")
+        sys.exit(1)
+    convert(args[0], args[1:], **options)
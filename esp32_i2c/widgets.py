@@ -0,0 +1,238 @@
+from ssd1306 import SSD1306
+from text import ALIGN_LEFT, align_x
+
+# Retained-mode widgets: every widget knows its bounding box and tells its
+# scene which part of it changed. Scene.update() clears only the damaged
+# rectangles and re-renders the widgets crossing them, the driver then
+# flushes only the page spans that changed.
+#
+# Widgets render with OPERATION_OR (text with OPERATION_ALL) so rendering
+# a widget again over its own pixels is harmless.
+
+def _intersects(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+class Widget:
+
+    def __init__(self, x0, y0, x1, y1):
+        self.x0 = x0
+        self.y0 = y0
+        self.x1 = x1
+        self.y1 = y1
+        self.visible = True
+        self._scene = None
+
+    def bounds(self):
+        return self.x0, self.y0, self.x1, self.y1
+
+    def damage(self, rect=None):
+        if self._scene:
+            self._scene.damage(rect or self.bounds())
+
+    def move(self, x0, y0, x1, y1):
+        self.damage()
+        self.x0, self.y0, self.x1, self.y1 = x0, y0, x1, y1
+        self.damage()
+
+    def show(self, visible):
+        if visible != self.visible:
+            self.visible = visible
+            self.damage()
+
+    def render(self, display):
+        pass
+
+class Label(Widget):
+
+    def __init__(self, x0, y0, text, font, x1=None, align=ALIGN_LEFT):
+        self._font = font
+        self._align = align
+        self._fixed = x1 is not None
+        self.text = text
+        super().__init__(x0, y0, x1 if self._fixed else x0 + self._width(text) - 1, y0 + font.hight - 1)
+
+    def _width(self, text):
+        return max(1, len(text) * (self._font.width + SSD1306.CHAR_SPACE) - SSD1306.CHAR_SPACE)
+
+    def set(self, text):
+        if text == self.text:
+            return
+        self.text = text
+        if self._fixed:
+            self.damage()
+        else:
+            self.move(self.x0, self.y0, self.x0 + self._width(text) - 1, self.y1)
+
+    def render(self, display):
+        x = align_x(display, self.text, self.x0, self.x1, self._align, self._font)
+        display.putString(self.text, x, self.y0, SSD1306.OPERATION_ALL, self._font)
+
+class ValueBox(Widget):
+
+    # A framed value, only the inside is damaged when the value changes.
+
+    def __init__(self, x0, y0, x1, y1, font, fmt="{}", value=None, radius=3):
+        super().__init__(x0, y0, x1, y1)
+        self._font = font
+        self._fmt = fmt
+        self._radius = radius
+        self._text = ""
+        self.set(value)
+
+    def set(self, value):
+        text = "" if value is None else self._fmt.format(value)
+        if text != self._text:
+            self._text = text
+            self.damage((self.x0 + 1, self.y0 + 1, self.x1 - 1, self.y1 - 1))
+
+    def render(self, display):
+        display.drawRoundRectangle(self.x0, self.y0, self.x1, self.y1, self._radius, SSD1306.OPERATION_OR)
+        width, hight = display.measureString(self._text, self._font)
+        x = self.x0 + ((self.x1 - self.x0 + 1 - width) >> 1)
+        y = self.y0 + ((self.y1 - self.y0 + 1 - hight) >> 1)
+        display.putString(self._text, x, y, SSD1306.OPERATION_OR, self._font)
+
+class BarGauge(Widget):
+
+    # A framed bar, a new value only damages the band between the old and
+    # the new fill level.
+
+    def __init__(self, x0, y0, x1, y1, vmin, vmax, value=None, vertical=False):
+        super().__init__(x0, y0, x1, y1)
+        self._vmin = vmin
+        self._vmax = vmax
+        self._vertical = vertical
+        self._level = self._to_level(vmin if value is None else value)
+
+    def _to_level(self, value):
+        value = min(max(value, self._vmin), self._vmax)
+        span = (self.y1 - self.y0 - 3) if self._vertical else (self.x1 - self.x0 - 3)
+        return int((value - self._vmin) * (span + 1) / (self._vmax - self._vmin) + 0.5)
+
+    def set(self, value):
+        level = self._to_level(value)
+        if level == self._level:
+            return
+        lo = min(level, self._level)
+        hi = max(level, self._level)
+        self._level = level
+        if self._vertical:
+            self.damage((self.x0 + 2, self.y1 - 1 - hi, self.x1 - 2, self.y1 - 2 - lo))
+        else:
+            self.damage((self.x0 + 2 + lo, self.y0 + 2, self.x0 + 1 + hi, self.y1 - 2))
+
+    def render(self, display):
+        display.drawRectangle(self.x0, self.y0, self.x1, self.y1, SSD1306.OPERATION_OR)
+        if not self._level:
+            return
+        if self._vertical:
+            display.fillRectangle(self.x0 + 2, self.y1 - 1 - self._level, self.x1 - 2, self.y1 - 2, SSD1306.OPERATION_OR)
+        else:
+            display.fillRectangle(self.x0 + 2, self.y0 + 2, self.x0 + 1 + self._level, self.y1 - 2, SSD1306.OPERATION_OR)
+
+class Icon(Widget):
+
+    def __init__(self, x0, y0, bitmap, w, h):
+        super().__init__(x0, y0, x0 + w - 1, y0 + h - 1)
+        self._bitmap = bitmap
+
+    def set(self, bitmap):
+        if bitmap is not self._bitmap:
+            self._bitmap = bitmap
+            self.damage()
+
+    def render(self, display):
+        display.drawBitmap(self._bitmap, self.x0, self.y0, self.x1 - self.x0 + 1,
+                           self.y1 - self.y0 + 1, SSD1306.OPERATION_OR)
+
+class Sparkline(Widget):
+
+    # The last x1 - x0 + 1 samples as a line, scaled to vmin..vmax or to the
+    # range of the samples shown.
+
+    def __init__(self, x0, y0, x1, y1, vmin=None, vmax=None):
+        super().__init__(x0, y0, x1, y1)
+        self._vmin = vmin
+        self._vmax = vmax
+        self._samples = []
+
+    def push(self, value):
+        self._samples.append(value)
+        if len(self._samples) > self.x1 - self.x0 + 1:
+            self._samples.pop(0)
+        self.damage()
+
+    def render(self, display):
+        if not self._samples:
+            return
+        vmin = min(self._samples) if self._vmin is None else self._vmin
+        vmax = max(self._samples) if self._vmax is None else self._vmax
+        scale = (self.y1 - self.y0) / ((vmax - vmin) or 1)
+        prev = None
+        for idx, value in enumerate(self._samples):
+            value = min(max(value, vmin), vmax)
+            point = (self.x0 + idx, self.y1 - int((value - vmin) * scale + 0.5))
+            if prev:
+                display.drawLine(prev[0], prev[1], point[0], point[1], SSD1306.OPERATION_OR)
+            else:
+                display.putPixel(point[0], point[1], SSD1306.OPERATION_OR)
+            prev = point
+
+class Scene:
+
+    MAX_RECTS = 8
+
+    def __init__(self, display):
+        self._display = display
+        self._widgets = []
+        self._damage = []
+        self.renders = 0
+
+    def add(self, widget):
+        widget._scene = self
+        self._widgets.append(widget)
+        widget.damage()
+        return widget
+
+    def remove(self, widget):
+        widget.damage()
+        self._widgets.remove(widget)
+        widget._scene = None
+
+    def damage(self, rect):
+        for idx, other in enumerate(self._damage):
+            if _intersects(rect, other):
+                self._damage[idx] = (min(rect[0], other[0]), min(rect[1], other[1]),
+                                     max(rect[2], other[2]), max(rect[3], other[3]))
+                return
+        self._damage.append(rect)
+        if len(self._damage) > self.MAX_RECTS:
+            rects = self._damage
+            self._damage = [(min(r[0] for r in rects), min(r[1] for r in rects),
+                             max(r[2] for r in rects), max(r[3] for r in rects))]
+
+    def invalidate(self):
+        self.damage((0, 0, SSD1306.LCD_WIDTH - 1, SSD1306.LCD_HEIGHT - 1))
+
+    def update(self):
+        # returns the number of widgets rendered
+        if not self._damage:
+            return 0
+
+        rects = self._damage
+        self._damage = []
+        rendered = 0
+        with self._display.frame():
+            for rect in rects:
+                self._display.fillRectangle(rect[0], rect[1], rect[2], rect[3], SSD1306.OPERATION_NOT)
+            for widget in self._widgets:
+                if not widget.visible:
+                    continue
+                bounds = widget.bounds()
+                for rect in rects:
+                    if _intersects(bounds, rect):
+                        widget.render(self._display)
+                        rendered += 1
+                        break
+        self.renders += rendered
+        return rendered
@@ -0,0 +1,208 @@
+import random
+import ssl
+import time
+
+from umqtt.simple import MQTTClient
+
+BACKOFF_MIN_MS = 1000
+BACKOFF_MAX_MS = 60000
+KEEPALIVE_S = 60
+
+class _Watch:
+
+    # socket wrapper noting when anything was last received, a PINGRESP included
+
+    def __init__(self, sock):
+        self._sock = sock
+        self.rx_ms = time.ticks_ms()
+
+    def read(self, size):
+        data = self._sock.read(size)
+        if data:
+            self.rx_ms = time.ticks_ms()
+        return data
+
+    def write(self, data, size=None):
+        if size is None:
+            return self._sock.write(data)
+        return self._sock.write(data, size)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+class Connection:
+
+    # Keeps one MQTT connection up:
+    #   - key and certificate are read once, with an ssl.SSLContext (newer
+    #     MicroPython) they are parsed once too and the context is reused by
+    #     every reconnect; MicroPython doesn't expose TLS session resumption,
+    #     so a reconnect is still a full handshake
+    #   - failed connects are retried after a jittered exponential backoff,
+    #     so a fleet coming back at once doesn't hit the broker in lockstep
+    #   - a ping goes out every keepalive / 2 and the link counts as dead once
+    #     nothing at all came back for a keepalive
+    #   - subscriptions are remembered and restored on every connect
+    #
+    #   mqtt = Connection("node", host, 8883, CERT_FILE, KEY_FILE, callback=sub_cb)
+    #   mqtt.subscribe("iot/inTopic")
+    #   if not mqtt.connect():
+    #       await asyncio.sleep_ms(mqtt.backoff_ms())
+
+    def __init__(self, client_id, host, port, cert_file, key_file, keepalive=KEEPALIVE_S, callback=None):
+        self._client_id = client_id
+        self._host = host
+        self._port = port
+        self._cert_file = cert_file
+        self._key_file = key_file
+        self.keepalive = keepalive
+        self._callback = callback
+        self._topics = []
+        self._creds = None
+        self._context = None
+        self.client = None
+        self._watch = None
+        self._ping_ms = 0
+        self._attempt = 0
+        self._down_ms = time.ticks_ms()
+        self.connects = 0
+        self.reconnects = 0
+        self.failures = 0
+        self.downtime_ms = 0
+        self.handshake_ms = 0
+        self.handshake_ms_max = 0
+        self.handshake_ms_total = 0
+
+    def _credentials(self):
+        # the PEM data as bytes, MicroPython takes a str as a file path
+        if self._creds is None:
+            with open(self._key_file, "rb") as f:
+                key = f.read()
+            with open(self._cert_file, "rb") as f:
+                cert = f.read()
+            self._creds = (cert, key)
+            print("Got Key and Cert")
+        return self._creds
+
+    def _ssl(self):
+        # TLS arguments of MQTTClient, umqtt.simple 1.4 takes an SSLContext
+        # as ssl, older ones ssl=True and ssl_params
+        cert, key = self._credentials()
+        if not hasattr(ssl, "SSLContext"):
+            return {"ssl": True, "ssl_params": {"cert": cert, "key": key, "server_side": False}}
+        if self._context is None:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            context.verify_mode = ssl.CERT_NONE
+            context.load_cert_chain(cert, key)
+            self._context = context
+        return {"ssl": self._context}
+
+    def connected(self):
+        return self.client is not None
+
+    def subscribe(self, topic):
+        if topic not in self._topics:
+            self._topics.append(topic)
+        if self.client:
+            self.client.subscribe(topic)
+
+    def connect(self):
+        # one attempt, returns True once connected and subscribed
+        if self.client:
+            return True
+
+        start = time.ticks_ms()
+        client = None
+        try:
+            client = MQTTClient(client_id=self._client_id, server=self._host, port=self._port,
+                                keepalive=self.keepalive, **self._ssl())
+            client.connect()
+            took = time.ticks_diff(time.ticks_ms(), start)
+            client.sock = self._watch = _Watch(client.sock)
+            if self._callback:
+                client.set_callback(self._callback)
+            for topic in self._topics:
+                client.subscribe(topic)
+        except Exception as e:
+            self.failures += 1
+            self._attempt += 1
+            print('Cannot connect MQTT: ' + str(e))
+            if client:
+                self._close(client)
+            return False
+
+        print('MQTT Connected')
+        self.client = client
+        self._ping_ms = time.ticks_ms()
+        self._attempt = 0
+        if self.connects:
+            self.reconnects += 1
+            self.downtime_ms += time.ticks_diff(time.ticks_ms(), self._down_ms)
+        self.connects += 1
+        self.handshake_ms = took
+        self.handshake_ms_total += took
+        if took > self.handshake_ms_max:
+            self.handshake_ms_max = took
+        return True
+
+    def _close(self, client):
+        try:
+            client.sock.close()
+        except Exception:
+            pass
+
+    def down(self):
+        # drops a connection found dead, the next connect() makes a new one
+        if self.client:
+            self._close(self.client)
+            self.client = None
+            self._down_ms = time.ticks_ms()
+
+    def disconnect(self):
+        if self.client:
+            try:
+                self.client.disconnect()
+            except OSError:
+                pass
+            self.client = None
+            self._down_ms = time.ticks_ms()
+
+    def backoff_ms(self):
+        # equal jitter: half the exponential delay fixed, half random
+        delay = min(BACKOFF_MAX_MS, BACKOFF_MIN_MS << min(self._attempt, 16))
+        return (delay >> 1) + random.randint(0, delay >> 1)
+
+    def alive(self):
+        # pings when due, False once the broker has been silent for a keepalive
+        if not self.client:
+            return False
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self._watch.rx_ms) > self.keepalive * 1000:
+            print("MQTT broker not responding")
+            return False
+        if time.ticks_diff(now, self._ping_ms) >= self.keepalive * 500:
+            self._ping_ms = now
+            self.client.ping()
+        return True
+
+    def _client(self):
+        if not self.client:
+            raise OSError("MQTT not connected")
+        return self.client
+
+    def check_msg(self):
+        self._client().check_msg()
+
+    def publish(self, topic, msg):
+        self._client().publish(topic, msg)
+
+    def stats(self):
+        return {
+            "connected": self.client is not None,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "failures": self.failures,
+            "downtime_ms": self.downtime_ms,
+            "handshake_ms": self.handshake_ms,
+            "handshake_ms_max": self.handshake_ms_max,
+            "handshake_ms_avg": self.handshake_ms_total // max(1, self.connects),
+        }
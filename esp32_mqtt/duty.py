@@ -0,0 +1,204 @@
+import binascii
+import struct
+import time
+
+import machine
+
+from telemetry import Telemetry, ENCODING_COMPACT
+
+RTC_MAGIC = b"SSDR"
+RTC_VERSION = 1
+RTC_MEMORY = 2048
+# magic, version, flags, probes, wakes since the radio was last up, samples
+# buffered, first probe at the last publish, wakes, radio ups, wake to sample
+# ms total, ms awake, ms awake and asleep, ms with the radio on
+RTC_HEADER = "<4sBBBHHhIIIQQQ"
+MAX_PROBES = 4
+# a sample: time, then each probe in fixed point
+RECORD = "<I" + "h" * MAX_PROBES
+SCALE = 100
+MISSING = -0x8000
+MIN_SLEEP_MS = 100
+
+FLAG_RESCAN = 1
+
+class DutyCycle:
+
+    # Deep-sleep operation: every wake samples the probes once into a buffer
+    # in RTC memory, which survives deep sleep but not a power loss, and the
+    # board goes back to sleep. Wi-Fi and MQTT only come up every `every`
+    # wakes, once the first probe moved by `threshold` since the last publish
+    # or when the buffer is full. A wake is a fresh boot, so what has to last
+    # lives in the RTC state: the samples, the probe ROMs (no bus scan per
+    # wake) and the counters behind stats().
+    #
+    #   duty = DutyCycle(Sensors(15), every=12, threshold=1.0)
+    #   duty.sample()
+    #   if duty.radio_due():
+    #       duty.radio_on()
+    #       ...connect, duty.flush(publish)...
+    #       duty.radio_off()
+    #   duty.sleep(300000)
+
+    def __init__(self, sensors, every=12, threshold=1.0):
+        self.sensors = sensors
+        self.every = every
+        self.threshold = threshold
+        self._rtc = machine.RTC()
+        self._record = struct.calcsize(RECORD)
+        self.capacity = (RTC_MEMORY - struct.calcsize(RTC_HEADER) - 8 * MAX_PROBES) // self._record
+        self._radio_start = None
+        self.sample_ms = 0
+        self.cold = not self._load()
+        if self.roms and not self.flags & FLAG_RESCAN:
+            sensors.use_roms(self.roms)
+
+    def _reset(self):
+        self.flags = 0
+        self.roms = []
+        self.wakes = 0
+        self.count = 0
+        self.last_sent = MISSING
+        self.total_wakes = 0
+        self.radios = 0
+        self.sample_ms_total = 0
+        self.awake_ms = 0
+        self.elapsed_ms = 0
+        self.radio_ms = 0
+        self._buffer = bytearray(self.capacity * self._record)
+
+    def _load(self):
+        # the state of the previous wake, False on a cold boot
+        self._reset()
+        if machine.reset_cause() != machine.DEEPSLEEP_RESET:
+            return False
+        state = self._rtc.memory()
+        size = struct.calcsize(RTC_HEADER)
+        if len(state) < size:
+            return False
+        (magic, version, self.flags, probes, self.wakes, count, self.last_sent, self.total_wakes, self.radios,
+         self.sample_ms_total, self.awake_ms, self.elapsed_ms, self.radio_ms) = struct.unpack_from(RTC_HEADER, state)
+        if magic != RTC_MAGIC or version != RTC_VERSION or count > self.capacity:
+            self._reset()
+            return False
+        self.roms = [bytes(state[size + 8 * idx:size + 8 * idx + 8]) for idx in range(probes)]
+        size += 8 * MAX_PROBES
+        self.count = count
+        self._buffer[:count * self._record] = state[size:size + count * self._record]
+        return True
+
+    def _save(self):
+        roms = b"".join(self.roms) + bytes(8 * (MAX_PROBES - len(self.roms)))
+        self._rtc.memory(struct.pack(RTC_HEADER, RTC_MAGIC, RTC_VERSION, self.flags, len(self.roms), self.wakes,
+                                     self.count, self.last_sent, self.total_wakes, self.radios, self.sample_ms_total,
+                                     self.awake_ms, self.elapsed_ms, self.radio_ms)
+                         + roms + self._buffer[:self.count * self._record])
+
+    def names(self):
+        return [binascii.hexlify(rom).decode() for rom in self.roms]
+
+    def sample(self):
+        # one conversion, waited for in light sleep, appended to the buffer
+        sensors = self.sensors
+        readings = {}
+        if sensors.start():
+            wait = sensors.wait_ms()
+            if wait:
+                machine.lightsleep(wait)
+            readings = sensors.collect()
+        self.sample_ms = time.ticks_ms()
+        self.sample_ms_total += self.sample_ms
+        self.wakes += 1
+        self.total_wakes += 1
+
+        roms = sensors.roms[:MAX_PROBES]
+        if roms and roms != self.roms:
+            if self.count:
+                print(f"Probes changed, {self.count} buffered samples dropped")
+                self.count = 0
+            self.roms = roms
+        # a probe that failed is looked for again on the next wake
+        self.flags = FLAG_RESCAN if len(readings) < len(self.roms) else 0
+
+        if self.count == self.capacity:
+            self._buffer[:-self._record] = self._buffer[self._record:]
+            self.count -= 1
+        values = [readings.get(name) for name in self.names()]
+        fixed = [MISSING if value is None else int(round(value * SCALE)) for value in values]
+        struct.pack_into(RECORD, self._buffer, self.count * self._record, time.time(),
+                         *(fixed + [MISSING] * (MAX_PROBES - len(fixed))))
+        self.count += 1
+        return readings
+
+    def _first(self, idx):
+        # fixed point of the first probe with a value in sample idx
+        for value in struct.unpack_from(RECORD, self._buffer, idx * self._record)[1:]:
+            if value != MISSING:
+                return value
+        return None
+
+    def radio_due(self):
+        if not self.radios or self.wakes >= self.every or self.count >= self.capacity:
+            return True
+        value = self._first(self.count - 1) if self.count else None
+        if value is None or self.last_sent == MISSING:
+            return False
+        return abs(value - self.last_sent) >= self.threshold * SCALE
+
+    def radio_on(self):
+        # a failed publish waits for the next due wake too, no retry per wake
+        self._radio_start = time.ticks_ms()
+        self.radios += 1
+        self.wakes = 0
+
+    def radio_off(self):
+        if self._radio_start is not None:
+            self.radio_ms += time.ticks_diff(time.ticks_ms(), self._radio_start)
+            self._radio_start = None
+
+    def retime(self, delta):
+        # the clock was set by delta seconds, e.g. by NTP after a cold boot
+        for idx in range(self.count):
+            offset = idx * self._record
+            struct.pack_into("<I", self._buffer, offset, struct.unpack_from("<I", self._buffer, offset)[0] + delta)
+
+    def flush(self, publish, encoding=ENCODING_COMPACT):
+        # all buffered samples as one Telemetry message, kept if publish raises
+        count = self.count
+        if not count:
+            return 0
+        probes = len(self.roms)
+        telemetry = Telemetry(self.names(), scales=(SCALE,) * probes, capacity=count, batch=count, encoding=encoding)
+        for idx in range(count):
+            sample = struct.unpack_from(RECORD, self._buffer, idx * self._record)
+            telemetry.add([None if value == MISSING else value / SCALE for value in sample[1:1 + probes]], sample[0])
+        telemetry.flush(publish)
+        value = self._first(count - 1)
+        if value is not None:
+            self.last_sent = value
+        self.count = 0
+        return count
+
+    def sleep(self, period_ms):
+        # deep sleep for what is left of the period, the wake is a reset
+        self.radio_off()
+        awake = time.ticks_ms()
+        sleep_ms = max(MIN_SLEEP_MS, period_ms - awake)
+        self.awake_ms += awake
+        self.elapsed_ms += awake + sleep_ms
+        self._save()
+        machine.deepsleep(sleep_ms)
+
+    def stats(self):
+        # ms since the wake for the sample, radio and awake time per hour
+        elapsed = max(1, self.elapsed_ms + time.ticks_ms())
+        return {
+            "wakes": self.total_wakes,
+            "radios": self.radios,
+            "buffered": self.count,
+            "sample_ms": self.sample_ms,
+            "sample_ms_avg": self.sample_ms_total // max(1, self.total_wakes),
+            "radio_ms": self.radio_ms,
+            "radio_ms_per_hour": self.radio_ms * 3600000 // elapsed,
+            "awake_ms_per_hour": (self.awake_ms + time.ticks_ms()) * 3600000 // elapsed,
+        }
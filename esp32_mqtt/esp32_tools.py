@@ -1,87 +1,139 @@
+import binascii
 import network
-import ntptime
 import time
 import json
+import uasyncio as asyncio
 
-def network_scan():
-    print(f"\nScan WIFI network")
-    wlan = network.WLAN(network.STA_IF)
-    wlan.active(True)
-    apn_list = wlan.scan()
-    ssid_list = []
-    for apnssid, bssi, channel, rssi, authmode, hidden in apn_list:
+from time_service import TimeService, DST_EU
+
+NETWORK_TIMEOUT_MS = 10000
+NETWORK_FAST_TIMEOUT_MS = 5000 #a cached AP that doesn't answer by then is left for a scan
+NETWORK_POLL_MS = 50
+NETWORK_MAX_TRIES = 3
+NETWORK_CACHE = "/wifi_cache.json"
+
+# join time metrics, fast counts joins on the cached AP without a scan
+JOIN_STATS = {"joins": 0, "fast": 0, "scans": 0, "failures": 0, "last_ms": 0, "max_ms": 0, "total_ms": 0}
+
+# statuses ending a join attempt before its timeout, where the port has them
+_JOIN_FAILED = tuple(getattr(network, name) for name in ("STAT_WRONG_PASSWORD", "STAT_NO_AP_FOUND", "STAT_CONNECT_FAIL")
+                     if hasattr(network, name))
+
+def _network_load(path):
+    try:
+        with open(path, "r") as json_file:
+            return json.loads(json_file.read())
+    except (OSError, ValueError):
+        return None
+
+def _network_save(ssid, password, bssid, channel):
+    try:
+        with open(NETWORK_CACHE, "w") as cache_file:
+            cache_file.write(json.dumps({"ssid": ssid, "password": password,
+                                         "bssid": binascii.hexlify(bssid).decode(), "channel": channel}))
+    except OSError as e:
+        print(f"Couldn't cache the AP: {e}")
+
+def _network_candidates(wlan, ssid, password, wifi_list):
+    # APs in range that can be joined, known network priority first, then RSSI
+    known = {}
+    if ssid:
+        known[ssid] = (password, 0)
+    elif wifi_list:
+        apns = _network_load(wifi_list) or {}
+        for apn in apns.get("access_points", []):
+            known[apn.get("ssid")] = (apn.get("password"), apn.get("priority", 0))
+
+    JOIN_STATS["scans"] += 1
+    candidates = []
+    for apnssid, bssid, channel, rssi, authmode, hidden in wlan.scan():
         apnssid = apnssid.decode("utf-8")
-        ssid_list.append(apnssid)
-        print(f"SSID: \"{apnssid}\", \tRSSI = {rssi}, \tHidden: {hidden}")
-    return ssid_list
+        if apnssid in known:
+            password, priority = known[apnssid]
+            candidates.append((priority, rssi, apnssid, password, bssid, channel))
+    candidates.sort(key=lambda apn: (apn[0], apn[1]), reverse=True)
+    if not candidates:
+        print(f"SSID \"{ssid}\" not accessible" if ssid else "There are no known SSIDs")
+    return candidates[:NETWORK_MAX_TRIES]
+
+def _network_try(wlan, ssid, password, bssid, channel):
+    try:
+        # drops an attempt still going on, a direct connect goes straight to the channel
+        wlan.disconnect()
+        if channel:
+            wlan.config(channel=channel)
+    except (OSError, ValueError, TypeError):
+        pass
+    wlan.connect(ssid, password, bssid=bssid)
 
+async def _network_wait(wlan, timeout_ms):
+    start = time.ticks_ms()
+    while not wlan.isconnected() and time.ticks_diff(time.ticks_ms(), start) < timeout_ms:
+        if wlan.status() in _JOIN_FAILED:
+            break
+        await asyncio.sleep_ms(NETWORK_POLL_MS)
+    return wlan.isconnected()
+
+def _network_joined(wlan, start, fast):
+    took = time.ticks_diff(time.ticks_ms(), start)
+    JOIN_STATS["joins"] += 1
+    JOIN_STATS["fast"] += fast
+    JOIN_STATS["last_ms"] = took
+    JOIN_STATS["total_ms"] += took
+    JOIN_STATS["max_ms"] = max(JOIN_STATS["max_ms"], took)
+    print(f"joined {'cached AP' if fast else 'after scan'} in {took} ms, network config:", wlan.ifconfig())
+    return True
 
-def network_connect(ssid='', password='', wifi_list=None):
+async def network_connect_async(ssid='', password='', wifi_list=None, timeout_ms=NETWORK_TIMEOUT_MS, fast=True):
+    # joins the AP of the last successful join directly, scans only if that fails;
+    # other tasks keep running while the join is waited for
     wlan = network.WLAN(network.STA_IF)
     if wlan.isconnected() and ssid == wlan.config('essid'):
         return True
 
-    exist_ssid = network_scan()
-    if ssid and ssid not in exist_ssid:
-        print(f"SSID \"{ssid}\" not accessible")
-        return False
+    wlan.active(True)
+    start = time.ticks_ms()
+    cache = _network_load(NETWORK_CACHE) if fast else None
+    if cache and (not ssid or ssid == cache.get("ssid")):
+        print(f'connecting to \"{cache["ssid"]}\" on its last AP...')
+        _network_try(wlan, cache["ssid"], password or cache["password"],
+                     binascii.unhexlify(cache["bssid"]), cache.get("channel"))
+        if await _network_wait(wlan, min(timeout_ms, NETWORK_FAST_TIMEOUT_MS)):
+            return _network_joined(wlan, start, True)
+        print("Last AP didn't answer, scanning")
 
-    if wifi_list:
-        with open(wifi_list, "r") as apn_file:
-            apns = json.loads(apn_file.read())
-            apn_list = apns.get("access_points")
+    for priority, rssi, apnssid, apnpassword, bssid, channel in _network_candidates(wlan, ssid, password, wifi_list):
+        print(f'connecting to \"{apnssid}\" ({rssi} dBm)...')
+        _network_try(wlan, apnssid, apnpassword, bssid, channel)
+        if await _network_wait(wlan, timeout_ms):
+            _network_save(apnssid, apnpassword, bssid, channel)
+            return _network_joined(wlan, start, False)
 
-        for apn in apn_list:
-            if apn.get("ssid") in exist_ssid:
-                ssid = apn.get("ssid")
-                password = apn.get("password")
-                break
+    JOIN_STATS["failures"] += 1
+    print("Network connection is timed out")
+    return False
 
-    if not ssid:
-        print("There are no known SSIDs")
-        return False
+def network_connect(ssid='', password='', wifi_list=None, timeout_ms=NETWORK_TIMEOUT_MS, fast=True):
+    return asyncio.run(network_connect_async(ssid, password, wifi_list, timeout_ms, fast))
 
-    print(f'connecting to \"{ssid}\"...')
-    wlan.active(True)
-    start = time.ticks_ms()
-    wlan.connect(ssid, password)
-    while not wlan.isconnected() and time.ticks_diff(time.ticks_ms(), start) < 10000:
-        pass
-    if not wlan.isconnected():
-        print("Network connection is timed out")
-        return False
-    print('network config:', wlan.ifconfig())
-    return True
+def network_isconnected():
+    return network.WLAN(network.STA_IF).isconnected()
+
+def network_off():
+    # radio off, e.g. before a deep sleep
+    wlan = network.WLAN(network.STA_IF)
+    wlan.disconnect()
+    wlan.active(False)
 
-def daylight_correct(timestamp):
-    if timestamp.get("month") > 3 and timestamp.get("month") < 10:
-        summer = True
-    elif timestamp.get("month") == 3 and timestamp.get("day") + 6 - timestamp.get("weekday") > 31:
-        summer = True
-    elif timestamp.get("month") == 9 and timestamp.get("day") + 6 - timestamp.get("weekday") <= 31:
-        summer = True
-    else:
-        summer = False
-
-    if summer:
-        timestamp.update({"hour": timestamp.get("hour") + 1})
-        if timestamp.get("hour") > 23:
-            timestamp.update({"hour": 0})
-            timestamp.update({"day": timestamp.get("day") + 1})
-
-            if timestamp.get("day") > 31:
-                timestamp.update({"day": 1})
-                timestamp.update({"month": timestamp.get("month") + 1})
-
-            timestamp.update({"weekday": timestamp.get("weekday") + 1})
-            if timestamp.get("weekday") > 6:
-                timestamp.update({"weekday": 0})
+_clock = None
 
 def get_lockal_time(timezone=0, day_light_save=False):
+    # one TimeService for all calls, it keeps the DST transitions of the year;
+    # the time is read from the RTC each call, NTP may have set it meanwhile
+    global _clock
+    dst = DST_EU if day_light_save else None
+    if _clock is None or _clock.utc_offset != timezone * 3600 or _clock.dst != dst:
+        _clock = TimeService(timezone * 3600, dst)
 
     keys = ["year", "month", "day", "hour", "minute", "second", "weekday", "yearday"]
-    timestamp = {key:value for key, value in zip(keys, time.localtime())}
-    timestamp.update({"hour": timestamp.get("hour") + timezone})
-    if (day_light_save):
-        daylight_correct(timestamp)
-    return timestamp
+    return {key:value for key, value in zip(keys, _clock.localtime(time.time()))}
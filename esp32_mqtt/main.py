@@ -1,120 +1,350 @@
-from umqtt.robust import MQTTClient
 import time
 import random
 import machine
 import json
-import ntptime
-import onewire, ds18x20
+import uasyncio as asyncio
 
-from esp32_tools import network_connect, get_lockal_time
+from connection import Connection
+from duty import DutyCycle
+from esp32_tools import network_connect, network_connect_async, network_isconnected, network_off
+from router import Router
+from runtime import Runtime
+from sensors import Sensors
+from store import Queue
+from telemetry import Telemetry, ENCODING_COMPACT, max_batch
+from time_service import TimeService, DST_EU
 
-pin = machine.Pin(2)  #blinking is optional, check your LED pin
+pin = machine.Pin(2, machine.Pin.OUT)  #blinking is optional, check your LED pin
+led = machine.PWM(pin, freq=1000, duty_u16=0)  #PWM for the brightness
 
 #Place these two certs at same folder level as your MicroPython program
 
 CERT_FILE = "/certs/certificate.pem.crt"  #the ".crt" may be hidden that’s ok
 KEY_FILE = "/certs/private.pem.key"
 MQTT_HOST_FILE = "/certs/mqtt_host.txt"
+NODE_CONFIG_FILE = "/node.json" #optional, overrides SETTINGS, e.g. {"duty_cycle": 1}; remote config writes it
 
 MQTT_CLIENT_ID = "myESP32"
 MQTT_PORT = 8883 #MQTT secured
+MQTT_KEEPALIVE = 60 #seconds, a dead link is noticed within one keepalive
+TIMEZONE_OFFSET = 7200 #seconds ahead of UTC, standard time
+DST_RULES = DST_EU #or None
+NTP_PERIOD_MS = 6 * 3600 * 1000 #resyncs, ticks drift is corrected in between
+
+SENSOR_PIN = 15
+SENSOR_RESOLUTION = 12 #9..12 bits, 94..750 ms per conversion
+PUBLISH_PERIOD_MS = 5000
+RECEIVE_MS = 20 #MQTT check period, bounds the command round trip
+WIFI_CHECK_MS = 2000
+WIFI_RETRY_MS = 5000
+LED_MS = 200
+LED_BRIGHTNESS = 100 #percent
+TELEMETRY_BATCH = 12 #samples per message, one message a minute
+TELEMETRY_MAX_AGE_MS = 60000
+TELEMETRY_CAPACITY = 120 #samples kept while offline
+TELEMETRY_ENCODING = ENCODING_COMPACT
+QUEUE_PATH = "/queue" #messages wait here until they are published
+QUEUE_SEGMENTS = 16 #16 segments of 16 512 byte records, 128 KB of flash
+QUEUE_RECORD_SIZE = 512 #a message and its 2 byte length, bounds the batch
+DRAIN_BATCH = 4 #catch-up after an outage: 4 messages a second at most
+DRAIN_INTERVAL_MS = 1000
+
+try:
+    with open(NODE_CONFIG_FILE, "r") as config_fd:
+        NODE_CONFIG = json.loads(config_fd.read())
+except (OSError, ValueError):
+    NODE_CONFIG = {}
+DUTY_CYCLE = NODE_CONFIG.get("duty_cycle", False) #deep sleep between samples instead of staying up
+DUTY_PERIOD_MS = NODE_CONFIG.get("duty_period_ms", 300000) #one sample per wake
+DUTY_RADIO_EVERY = NODE_CONFIG.get("duty_radio_every", 12) #wakes per publish, hourly at 5 minutes
+DUTY_THRESHOLD = NODE_CONFIG.get("duty_threshold", 1.0) #C since the last publish that publishes right away
+DUTY_RECEIVE_MS = 300 #listening per publish in duty cycle, picks up retained config
+
+# settings changeable by remote config and their limits, a change is kept in NODE_CONFIG_FILE
+SETTINGS = {
+    "sample_ms": NODE_CONFIG.get("sample_ms", PUBLISH_PERIOD_MS),
+    "batch": NODE_CONFIG.get("batch", TELEMETRY_BATCH),
+    "max_age_ms": NODE_CONFIG.get("max_age_ms", TELEMETRY_MAX_AGE_MS),
+    "brightness": NODE_CONFIG.get("brightness", LED_BRIGHTNESS),
+    "duty_cycle": int(DUTY_CYCLE), #a change restarts the node in that mode, the other duty_ ones take effect with it
+    "duty_period_ms": DUTY_PERIOD_MS,
+    "duty_radio_every": DUTY_RADIO_EVERY,
+    "duty_threshold": DUTY_THRESHOLD,
+}
+SETTINGS_LIMITS = {
+    "sample_ms": (1000, 3600000),
+    "batch": (1, TELEMETRY_CAPACITY), #lowered to what fits a queue record, see batch_limit
+    "max_age_ms": (1000, 3600000),
+    "brightness": (0, 100),
+    "duty_cycle": (0, 1),
+    "duty_period_ms": (10000, 86400000),
+    "duty_radio_every": (1, 1000),
+    "duty_threshold": (0.0, 100.0),
+}
+
+def telemetry_scales(probes):
+    return (100,) * probes + (1,)
+
+def batch_limit(channels):
+    # most samples a queued message takes, the probes swinging across their
+    # -55..125 C and the humidity more than its range, samples an hour apart
+    probes = len(channels) - 1
+    rows = ((-55.0,) * probes + (-100,), (125.0,) * probes + (100,))
+    return max_batch(channels, telemetry_scales(probes), rows, SETTINGS_LIMITS["sample_ms"][1] // 1000,
+                     QUEUE_RECORD_SIZE - 2, TELEMETRY_ENCODING, TELEMETRY_CAPACITY)
+
+# until the probes are known, one with a 16 digit ROM name
+SETTINGS_LIMITS["batch"] = (1, batch_limit(("0" * 16, "humidity")))
 
 PUB_TOPIC = "iot/outTopic" #coming out of device
 SUB_TOPIC = "iot/inTopic"  #coming into device
+CONFIG_TOPIC = SUB_TOPIC + "/config" #{"sample_ms": 10000, ...}, answered on PUB_TOPIC/config
+STATUS_TOPIC = SUB_TOPIC + "/status" #any payload, answered on PUB_TOPIC/status
 
 #Change the following three settings to match your environment
 #IoT Core-->Settings or > aws iot describe-endpoint --endpoint-type iot:Data-ATS
 # MQTT_HOST = "ag70ix3de6ld7-ats.iot.eu-central-1.amazonaws.com"  #Your AWS IoT endpoint
 with open(MQTT_HOST_FILE, "r") as mqtt_host_fd:
-    MQTT_HOST = mqtt_host_fd.read()
+    MQTT_HOST = mqtt_host_fd.read().strip()
 # WIFI_SSID = "Dobro.."
 # WIFI_PW = "dobrodobro"
 
-MQTT_CLIENT = None
-
 print("starting program")
 
-def device_connect():    
-    global MQTT_CLIENT
-
-    try:  #all this below runs once, equivalent to Arduino's "setup" function)
-        with open(KEY_FILE, "r") as f: 
-            key = f.read()
-        print("Got Key")
-       
-        with open(CERT_FILE, "r") as f: 
-            cert = f.read()
-        print("Got Cert")
-
-        MQTT_CLIENT = MQTTClient(client_id=MQTT_CLIENT_ID, server=MQTT_HOST, port=MQTT_PORT, keepalive=5000, ssl=True, ssl_params={"cert":cert, "key":key, "server_side":False})
-        MQTT_CLIENT.connect()
-        print('MQTT Connected')
-        MQTT_CLIENT.set_callback(sub_cb)
-        MQTT_CLIENT.subscribe(SUB_TOPIC)
-        MQTT_CLIENT.subscribe(PUB_TOPIC)
-        print('Subscribed to %s as the incoming topic' % (SUB_TOPIC))
-        return MQTT_CLIENT
-    except Exception as e:
-        print('Cannot connect MQTT: ' + str(e))
-        raise
-
 def pub_msg(msg):  #publish is synchronous so we poll and publish
-    global MQTT_CLIENT
     try:    
-        MQTT_CLIENT.publish(PUB_TOPIC, msg)
-        print("Sent: " + msg)
+        MQTT.publish(PUB_TOPIC, msg)
+        print(f"Sent: {len(msg)} bytes")
     except Exception as e:
         print("Exception publish: " + str(e))
+        MQTT.down()
         raise
 
-def sub_cb(topic, msg):
+def sub_cb(topic, payload):
     print('Device received a Message: ')
-    payload = json.loads(msg.decode("utf-8"))
     print(topic.decode("utf-8") + ":")
     print(json.dumps(payload))
-    # print((topic, msg))  #print incoming message, waits for loop below
-    pin.value(0)         #blink if incoming message by toggle off
+    led.duty_u16(0)         #blink if incoming message by toggle off
 
-def ds_init(pin):
-    ow = onewire.OneWire(machine.Pin(15)) # create a OneWire bus on GPIO12
-    ds = ds18x20.DS18X20(ow)
-    return ds
+def config_cb(topic, config):
+    # known settings within their limits are taken, the rest is reported back
+    changed = {}
+    rejected = []
+    for key, value in config.items():
+        limits = SETTINGS_LIMITS.get(key)
+        if (limits is None or not isinstance(value, (int, float))
+                or (isinstance(limits[0], int) and not isinstance(value, int))
+                or not limits[0] <= value <= limits[1]):
+            rejected.append(key)
+        else:
+            changed[key] = value
+    if changed:
+        SETTINGS.update(changed)
+        NODE_CONFIG.update(changed)
+        try:
+            with open(NODE_CONFIG_FILE, "w") as config_fd:
+                config_fd.write(json.dumps(NODE_CONFIG))
+        except OSError as e:
+            print("Couldn't keep the config: " + str(e))
+    print(f"Config {changed}, rejected {rejected}")
+    MQTT.publish(PUB_TOPIC + "/config", json.dumps({"settings": SETTINGS, "rejected": rejected}))
+    if changed.get("duty_cycle", int(DUTY_CYCLE)) != int(DUTY_CYCLE):
+        # the mode is picked at boot, main() resets once the tasks are stopped
+        RT.stop()
 
-def get_temperature(ds):    
-    roms = ds.scan()
-    ds.convert_temp()
-    time.sleep_ms(750)
-    rom = roms[0]
-    return ds.read_temp(rom)
+def status_cb(topic, msg):
+    MQTT.publish(PUB_TOPIC + "/status", json.dumps({"router": ROUTER.stats(), "mqtt": MQTT.stats(),
+                                                         "clock": CLOCK.stats(), "time": CLOCK.iso()}))
 
-try:
-    print("Connecting WIFI")
-    if not network_connect(wifi_list="known_wifi.json"):
-        exit 
-    print("Connecting MQTT")
-    device_connect()
-    print("Getting time from Internet")
-    ntptime.settime()
-    print("Local time is " + str(time.localtime()))
-    get_lockal_time(timezone=2)
-
-    th_sensor = ds_init(15)
-
-    while True: #loop forever
-            pin.value(1)
-            pending_message = MQTT_CLIENT.check_msg()  # check for new subscription payload incoming
-            if pending_message != 'None':  #check if we have a message 
-                payload = {}
-                temp =  random.randint(0, 130)
-                humid = random.randint(0, 100)
-                timestamp = get_lockal_time(timezone=2, day_light_save=True)
-                payload.update({"temperature": round(get_temperature(th_sensor), 1)})
-                payload.update({"humidity": humid})
-                payload.update({"time": str(timestamp.get("hour")) + ":" + str(timestamp.get("minute")) + ":" + str(timestamp.get("second"))})
-                print("Publishing")
-                pub_msg(json.dumps(payload)) 
-                print("published payload")
-                time.sleep(5)  #A 5 second delay between publishing, adjust as you like
-
-except Exception as e:
-    print(str(e))
+CLOCK = TimeService(TIMEZONE_OFFSET, DST_RULES, sync_period_ms=NTP_PERIOD_MS)
+RT = Runtime()
+
+ROUTER = Router()
+ROUTER.ignore(PUB_TOPIC)  #our own publishes coming back
+ROUTER.ignore(PUB_TOPIC + "/#")
+ROUTER.route(SUB_TOPIC, sub_cb)
+ROUTER.route(CONFIG_TOPIC, config_cb)
+ROUTER.route(STATUS_TOPIC, status_cb, decode=False)
+
+MQTT = Connection(MQTT_CLIENT_ID, MQTT_HOST, MQTT_PORT, CERT_FILE, KEY_FILE,
+                  keepalive=MQTT_KEEPALIVE, callback=ROUTER.dispatch)
+MQTT.subscribe(SUB_TOPIC + "/#")  #SUB_TOPIC itself included, a second filter for it would deliver it twice
+MQTT.subscribe(PUB_TOPIC)
+
+async def wifi_task(rt):
+    # keeps Wi-Fi and MQTT up and the clock synced, the other tasks wait on rt.online
+    check = rt.deadline(0)
+    while True:
+        if rt.online.is_set():
+            if network_isconnected() and MQTT.alive():
+                if CLOCK.sync_due() and CLOCK.sync():
+                    print(f"Clock {CLOCK.stats()}")
+                check = rt.every(check, WIFI_CHECK_MS)
+                await rt.sleep_until(check)
+                continue
+            print("Connection lost")
+            MQTT.down()
+            rt.online.clear()
+
+        if not network_isconnected():
+            print("Connecting WIFI")
+            if not await network_connect_async(wifi_list="known_wifi.json"):
+                await asyncio.sleep_ms(WIFI_RETRY_MS)
+                continue
+
+        print("Connecting MQTT")
+        if not MQTT.connect():
+            await asyncio.sleep_ms(MQTT.backoff_ms())
+            continue
+        print(f"MQTT {MQTT.stats()}")
+
+        if CLOCK.sync_due():
+            print("Getting time from Internet")
+            if CLOCK.sync():
+                print("Local time is " + CLOCK.iso())
+        rt.online.set()
+
+async def receive_task(rt):
+    deadline = rt.deadline(0)
+    while True:
+        await rt.online.wait()
+        try:
+            MQTT.check_msg()  # check for new subscription payload incoming
+        except OSError as e:
+            print("MQTT receive failed: " + str(e))
+            MQTT.down()
+            rt.online.clear()
+        except Exception as e:
+            print("Bad message: " + str(e))
+        deadline = rt.every(deadline, RECEIVE_MS)
+        await rt.sleep_until(deadline)
+
+async def sample_task(rt, sensors, samples):
+    # conversions run in the background, poll() collects them once done
+    while True:
+        sensors.period_ms = SETTINGS["sample_ms"]
+        if sensors.poll():
+            samples.set()
+        await rt.sleep_until(sensors.due())
+
+def sample_values(sensors):
+    # temperature of every probe, then humidity
+    humid = random.randint(0, 100)
+    return [sensors.readings.get(name) for name in sensors.names] + [humid]
+
+async def publish_task(rt, sensors, samples, queue, queued):
+    # samples are batched, one message per SETTINGS["batch"] of them, and queued
+    # on flash, drain_task publishes them
+    telemetry = None
+    try:
+        while True:
+            await samples.wait()
+            samples.clear()
+            channels = tuple(sensors.names) + ("humidity",)
+            if telemetry is None or telemetry.channels != channels:
+                # probes changed, what is buffered goes out with the old channel list
+                if telemetry and len(telemetry):
+                    telemetry.flush(queue.push, queue.max_payload)
+                telemetry = Telemetry(channels, scales=telemetry_scales(len(sensors.names)),
+                                      capacity=TELEMETRY_CAPACITY, encoding=TELEMETRY_ENCODING)
+                SETTINGS_LIMITS["batch"] = (1, batch_limit(channels))
+
+            # a batch set before the probes changed may no longer fit
+            telemetry.batch = min(SETTINGS["batch"], SETTINGS_LIMITS["batch"][1])
+            telemetry.max_age_ms = SETTINGS["max_age_ms"]
+            if telemetry.add(sample_values(sensors), CLOCK.now()):
+                telemetry.flush(queue.push, queue.max_payload)
+                queued.set()
+    except asyncio.CancelledError:
+        # stopped, what is buffered waits on flash for the next boot
+        if telemetry and len(telemetry):
+            telemetry.flush(queue.push, queue.max_payload)
+        raise
+
+async def drain_task(rt, queue, queued):
+    deadline = rt.deadline(0)
+    while True:
+        await rt.online.wait()
+        if not len(queue):
+            await queued.wait()
+            queued.clear()
+            continue
+        try:
+            print("Publishing")
+            sent = queue.drain(pub_msg, DRAIN_BATCH)
+            print(f"published {sent} payloads, {len(queue)} queued")
+        except OSError:
+            rt.online.clear()
+        deadline = rt.every(deadline, DRAIN_INTERVAL_MS)
+        await rt.sleep_until(deadline)
+
+async def led_task(rt):
+    # steady when online (a received message blinks it off), blinking when not
+    lit = False
+    deadline = rt.deadline(0)
+    while True:
+        lit = rt.online.is_set() or not lit
+        led.duty_u16(SETTINGS["brightness"] * 65535 // 100 if lit else 0)
+        deadline = rt.every(deadline, LED_MS)
+        await rt.sleep_until(deadline)
+
+async def main():
+    rt = RT
+    sensors = Sensors(SENSOR_PIN, resolution=SENSOR_RESOLUTION, period_ms=SETTINGS["sample_ms"])
+    samples = asyncio.Event()
+    queue = Queue(QUEUE_PATH, record_size=QUEUE_RECORD_SIZE, max_segments=QUEUE_SEGMENTS)
+    queued = asyncio.Event()
+
+    rt.spawn("wifi", wifi_task, rt)
+    rt.spawn("receive", receive_task, rt)
+    rt.spawn("router", ROUTER.serve)
+    rt.spawn("sample", sample_task, rt, sensors, samples)
+    rt.spawn("publish", publish_task, rt, sensors, samples, queue, queued)
+    rt.spawn("drain", drain_task, rt, queue, queued)
+    rt.spawn("led", led_task, rt)
+    await rt.run()
+    # stopped for a mode change, it takes a boot
+    MQTT.disconnect()
+    network_off()
+    machine.reset()
+
+def duty_cycle():
+    # one wake of the duty-cycled mode: sample, publish if due, deep sleep
+    duty = None
+    try:
+        duty = DutyCycle(Sensors(SENSOR_PIN, resolution=SENSOR_RESOLUTION),
+                         every=SETTINGS["duty_radio_every"], threshold=SETTINGS["duty_threshold"])
+        duty.sample()
+        print(f"Sampled {duty.sample_ms} ms after the wake, {duty.count} buffered")
+        if duty.radio_due():
+            duty.radio_on()
+            try:
+                if network_connect(wifi_list="known_wifi.json") and MQTT.connect():
+                    if CLOCK.sync():
+                        duty.retime(CLOCK.step_s)
+                    duty.flush(pub_msg, TELEMETRY_ENCODING)
+                    MQTT.publish(PUB_TOPIC + "/duty", json.dumps(duty.stats()))
+                    listen = time.ticks_ms()
+                    while time.ticks_diff(time.ticks_ms(), listen) < DUTY_RECEIVE_MS:
+                        MQTT.check_msg()
+                        ROUTER.run()
+                        time.sleep_ms(RECEIVE_MS)
+                    MQTT.disconnect()
+            except Exception as e:
+                print("Publishing failed: " + str(e))
+            network_off()
+            duty.radio_off()
+        print(f"Duty cycle {duty.stats()}")
+    except Exception as e:
+        print(str(e))
+    if duty:
+        duty.sleep(SETTINGS["duty_period_ms"])
+    machine.deepsleep(SETTINGS["duty_period_ms"])
+
+if DUTY_CYCLE:
+    duty_cycle()
+else:
+    try:
+        asyncio.run(main())
+    except Exception as e:
+        print(str(e))
@@ -0,0 +1,187 @@
+import json
+import time
+import uasyncio as asyncio
+
+QUEUE_SIZE = 8
+MATCH_CACHE = 16
+
+# per route stats
+_MESSAGES = 0
+_ERRORS = 1
+_TOTAL_US = 2
+_MAX_US = 3
+
+class Router:
+
+    # Incoming MQTT messages to handlers by topic filter:
+    #   - filters, + and # included, are compiled into a trie of topic levels
+    #     once when routed, a topic is matched by walking it and the result
+    #     is cached per topic
+    #   - dispatch() is the MQTT callback and only queues, a bounded queue
+    #     whose oldest message goes when full, so check_msg() returns right
+    #     away however slow a handler is; serve() or run() call the handlers
+    #   - ignored filters, e.g. the node's own publish topics, drop a message
+    #     in dispatch() before anything is decoded
+    #   - the payload is decoded from JSON once, for every handler routed
+    #     with decode=True, the others get the bytes
+    #
+    #   router = Router()
+    #   router.ignore("iot/outTopic/#")
+    #   router.route("iot/inTopic/config", config_cb)
+    #   mqtt = Connection(..., callback=router.dispatch)
+    #   rt.spawn("router", router.serve)
+
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self._root = ({}, [])
+        self._cache = {}
+        self._queue = [None] * queue_size
+        self._head = 0
+        self._count = 0
+        self._stats = {}
+        self.ready = asyncio.Event()
+        self.received = 0
+        self.echo = 0
+        self.unrouted = 0
+        self.dropped = 0
+        self.bad = 0
+        self.wait_us_max = 0
+
+    def route(self, topic_filter, handler, decode=True):
+        # handler(topic, payload), payload decoded JSON or with decode=False the bytes
+        node = self._root
+        for level in topic_filter.encode().split(b"/"):
+            node = node[0].setdefault(level, ({}, []))
+        node[1].append((topic_filter, handler, decode))
+        self._stats.setdefault(topic_filter, [0, 0, 0, 0])
+        self._cache.clear()
+
+    def ignore(self, topic_filter):
+        self.route(topic_filter, None, False)
+
+    def _walk(self, node, levels, depth, routes):
+        children = node[0]
+        rest = children.get(b"#")
+        if rest:
+            # also matches the parent level, "a/#" takes "a"
+            routes.extend(rest[1])
+        if depth == len(levels):
+            routes.extend(node[1])
+            return
+        child = children.get(levels[depth])
+        if child:
+            self._walk(child, levels, depth + 1, routes)
+        child = children.get(b"+")
+        if child:
+            self._walk(child, levels, depth + 1, routes)
+
+    def match(self, topic):
+        routes = self._cache.get(topic)
+        if routes is None:
+            routes = []
+            self._walk(self._root, topic.split(b"/"), 0, routes)
+            if len(self._cache) >= MATCH_CACHE:
+                self._cache.clear()
+            routes = self._cache[topic] = tuple(routes)
+        return routes
+
+    def dispatch(self, topic, msg):
+        self.received += 1
+        routes = self.match(topic)
+        if not routes:
+            self.unrouted += 1
+            return
+        for name, handler, decode in routes:
+            if handler is None:
+                self.echo += 1
+                self._stats[name][_MESSAGES] += 1
+                return
+
+        size = len(self._queue)
+        if self._count == size:
+            # full, the oldest message makes room
+            self._head = (self._head + 1) % size
+            self._count -= 1
+            self.dropped += 1
+        self._queue[(self._head + self._count) % size] = (topic, msg, routes, time.ticks_us())
+        self._count += 1
+        self.ready.set()
+
+    def __len__(self):
+        return self._count
+
+    def _handle(self):
+        topic, msg, routes, queued_us = self._queue[self._head]
+        self._queue[self._head] = None
+        self._head = (self._head + 1) % len(self._queue)
+        self._count -= 1
+        wait = time.ticks_diff(time.ticks_us(), queued_us)
+        if wait > self.wait_us_max:
+            self.wait_us_max = wait
+
+        # decoded once, for all the handlers that want JSON
+        payload = None
+        decoded = True
+        for name, handler, decode in routes:
+            if decode:
+                try:
+                    payload = json.loads(msg)
+                except ValueError as e:
+                    self.bad += 1
+                    decoded = False
+                    print(f"Bad message on {topic.decode()}: {e}")
+                break
+
+        for name, handler, decode in routes:
+            stats = self._stats[name]
+            if decode and not decoded:
+                stats[_ERRORS] += 1
+                continue
+            start = time.ticks_us()
+            try:
+                handler(topic, payload if decode else msg)
+            except Exception as e:
+                stats[_ERRORS] += 1
+                print(f"Handler of {name} failed: {e}")
+                continue
+            took = time.ticks_diff(time.ticks_us(), start)
+            stats[_MESSAGES] += 1
+            stats[_TOTAL_US] += took
+            if took > stats[_MAX_US]:
+                stats[_MAX_US] = took
+
+    def run(self, limit=QUEUE_SIZE):
+        # handles up to limit queued messages now, returns how many
+        done = 0
+        while self._count and done < limit:
+            self._handle()
+            done += 1
+        return done
+
+    async def serve(self):
+        # handles queued messages one at a time, other tasks run in between
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            while self._count:
+                self._handle()
+                await asyncio.sleep_ms(0)
+
+    def stats(self):
+        routes = {}
+        for name, stats in self._stats.items():
+            routes[name] = {
+                "messages": stats[_MESSAGES],
+                "errors": stats[_ERRORS],
+                "avg_us": stats[_TOTAL_US] // max(1, stats[_MESSAGES]),
+                "max_us": stats[_MAX_US],
+            }
+        return {
+            "received": self.received,
+            "echo": self.echo,
+            "unrouted": self.unrouted,
+            "dropped": self.dropped,
+            "bad": self.bad,
+            "queued": self._count,
+            "wait_us_max": self.wait_us_max,
+            "routes": routes,
+        }
@@ -0,0 +1,77 @@
+import time
+import uasyncio as asyncio
+
+RESTART_MS = 1000
+
+class Runtime:
+
+    # The node's tasks on one uasyncio loop:
+    #   - one clock, ms since start, so tasks schedule on shared deadlines
+    #     instead of each sleeping its own period and drifting; every() steps
+    #     a deadline on by a period, skipping the ones a late task missed
+    #   - spawn() restarts a task that fails, a stop() cancels all of them
+    #     and run() returns once they are gone
+    #
+    #   rt = Runtime()
+    #   rt.spawn("led", led_task, rt)
+    #
+    #   async def led_task(rt):
+    #       deadline = rt.deadline(0)
+    #       while True:
+    #           ...
+    #           deadline = rt.every(deadline, LED_MS)
+    #           await rt.sleep_until(deadline)
+    #   asyncio.run(rt.run())
+
+    def __init__(self):
+        self.start_ms = time.ticks_ms()
+        self.online = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._tasks = {}
+        self.restarts = 0
+
+    def now(self):
+        return time.ticks_diff(time.ticks_ms(), self.start_ms)
+
+    def deadline(self, after_ms, since=None):
+        return time.ticks_add(self.start_ms if since is None else since, after_ms)
+
+    def every(self, deadline, period_ms):
+        deadline = time.ticks_add(deadline, period_ms)
+        late = time.ticks_diff(time.ticks_ms(), deadline)
+        if late > 0:
+            deadline = time.ticks_add(deadline, (late // period_ms + 1) * period_ms)
+        return deadline
+
+    async def sleep_until(self, deadline):
+        wait = time.ticks_diff(deadline, time.ticks_ms())
+        await asyncio.sleep_ms(wait if wait > 0 else 0)
+
+    async def _guard(self, name, task, args):
+        while True:
+            try:
+                await task(*args)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.restarts += 1
+                print(f"Task {name} failed: {e}, restarting")
+                await asyncio.sleep_ms(RESTART_MS)
+
+    def spawn(self, name, task, *args):
+        self._tasks[name] = asyncio.create_task(self._guard(name, task, args))
+
+    def stop(self):
+        self._stop.set()
+
+    async def run(self):
+        await self._stop.wait()
+        for task in self._tasks.values():
+            task.cancel()
+        for name, task in self._tasks.items():
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = {}
@@ -0,0 +1,146 @@
+import binascii
+import time
+
+import machine
+import onewire
+import ds18x20
+
+# conversion time of a DS18B20 by resolution in bits
+CONVERSION_MS = {9: 94, 10: 188, 11: 375, 12: 750}
+
+DS18S20_FAMILY = 0x10
+
+class Sensors:
+
+    # DS18x20 probes on one OneWire bus, sampled at a fixed period without
+    # blocking: one conversion is started on all probes at once and read back
+    # once its deadline has passed, the caller does its MQTT I/O meanwhile.
+    #
+    #   sensors = Sensors(15, resolution=11, period_ms=5000)
+    #   while True:
+    #       if sensors.poll():
+    #           publish(sensors.readings)
+    #       client.check_msg()
+    #       time.sleep_ms(min(sensors.wait_ms(), 100))
+    #
+    # The ROM list is scanned once and only again after a read error.
+
+    def __init__(self, pin, resolution=12, period_ms=5000):
+        self._ds = ds18x20.DS18X20(onewire.OneWire(machine.Pin(pin)))
+        self.roms = []
+        self.names = []
+        self.readings = {}
+        self.resolution = resolution
+        self.period_ms = period_ms
+        self._rescan = True
+        self._deadline = None
+        self._next_start = time.ticks_ms()
+        self.samples = 0
+        self.errors = 0
+        self.scans = 0
+
+    def scan(self):
+        self.roms = self._ds.scan()
+        self.names = [binascii.hexlify(rom).decode() for rom in self.roms]
+        self.scans += 1
+        self._rescan = False
+        for rom in self.roms:
+            self._write_resolution(rom)
+        if not self.roms:
+            print("No DS18x20 probes found")
+        return self.roms
+
+    def use_roms(self, roms):
+        # probes known from before, e.g. kept over deep sleep, no scan needed;
+        # their resolution is still set from that scan
+        self.roms = [bytes(rom) for rom in roms]
+        self.names = [binascii.hexlify(rom).decode() for rom in self.roms]
+        self._rescan = not self.roms
+
+    def _write_resolution(self, rom):
+        # config register is the 5th scratchpad byte, the DS18S20 has a fixed resolution
+        if rom[0] == DS18S20_FAMILY:
+            return
+        try:
+            scratch = self._ds.read_scratch(rom)
+            config = ((self.resolution - 9) << 5) | 0x1F
+            if scratch[4] != config:
+                self._ds.write_scratch(rom, bytes((scratch[2], scratch[3], config)))
+        except Exception as e:
+            self.errors += 1
+            print(f"Couldn't set resolution of {binascii.hexlify(rom).decode()}: {e}")
+
+    def set_resolution(self, bits):
+        # fewer bits convert faster: 9 bits 0.5 C in 94 ms ... 12 bits 0.0625 C in 750 ms
+        self.resolution = min(max(bits, 9), 12)
+        for rom in self.roms:
+            self._write_resolution(rom)
+
+    def conversion_ms(self):
+        return CONVERSION_MS[self.resolution]
+
+    def start(self):
+        # one Skip ROM convert command for every probe on the bus
+        try:
+            if self._rescan:
+                self.scan()
+            if not self.roms:
+                return False
+            self._ds.convert_temp()
+        except Exception as e:
+            self.errors += 1
+            self._rescan = True
+            print(f"DS18x20 convert failed: {e}")
+            return False
+        self._deadline = time.ticks_add(time.ticks_ms(), self.conversion_ms())
+        return True
+
+    def busy(self):
+        return self._deadline is not None
+
+    def ready(self):
+        return self._deadline is not None and time.ticks_diff(time.ticks_ms(), self._deadline) >= 0
+
+    def collect(self):
+        # reads every probe of a finished conversion, probes that fail are left
+        # out of readings and trigger a rescan before the next conversion
+        self._deadline = None
+        readings = {}
+        for name, rom in zip(self.names, self.roms):
+            try:
+                readings[name] = self._ds.read_temp(rom)
+            except Exception as e:
+                self.errors += 1
+                self._rescan = True
+                print(f"DS18x20 {name} read failed: {e}")
+        self.readings = readings
+        self.samples += 1
+        return readings
+
+    def poll(self):
+        # returns True when a new set of readings is there
+        now = time.ticks_ms()
+        if self._deadline is None:
+            if time.ticks_diff(now, self._next_start) >= 0:
+                # fixed rate, a late start doesn't push the following ones back
+                self._next_start = time.ticks_add(self._next_start, self.period_ms)
+                if time.ticks_diff(now, self._next_start) >= 0:
+                    self._next_start = time.ticks_add(now, self.period_ms)
+                self.start()
+            return False
+        if not self.ready():
+            return False
+        return bool(self.collect())
+
+    def due(self):
+        # ticks_ms when poll() has something to do
+        return self._deadline if self._deadline is not None else self._next_start
+
+    def wait_ms(self):
+        return max(0, time.ticks_diff(self.due(), time.ticks_ms()))
+
+    def first(self):
+        for name in self.names:
+            if name in self.readings:
+                return self.readings[name]
+        return None
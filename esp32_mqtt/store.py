@@ -0,0 +1,189 @@
+import os
+import struct
+
+INDEX_FORMAT = "<4sIII"
+INDEX_MAGIC = b"SSDQ"
+RECORD_HEADER = "<H"
+
+class Queue:
+
+    # Append-only message queue on flash, for publishes made while offline.
+    #
+    # Messages go into fixed size records (u16 length, payload, padding) of
+    # numbered segment files; a segment is only ever appended to, never
+    # rewritten, and deleted as a whole once drained or evicted, so writes
+    # are spread over fresh files instead of wearing one spot. The index
+    # only holds where reading starts and is rewritten per drained batch, not
+    # per message. Storage is bounded by max_segments, a new segment past it
+    # evicts the oldest one with its messages.
+    #
+    #   queue = Queue("/queue")
+    #   queue.push(payload)
+    #   queue.drain(publish, 10)    # once online, 10 at most per call
+
+    def __init__(self, path="/queue", record_size=512, segment_records=16, max_segments=16):
+        self._path = path
+        self.record_size = record_size
+        # longest payload a record holds
+        self.max_payload = record_size - struct.calcsize(RECORD_HEADER)
+        self.segment_records = segment_records
+        self.max_segments = max_segments
+        self._record = bytearray(record_size)
+        self.pushed = 0
+        self.drained = 0
+        self.evicted = 0
+        self.oversize = 0
+        self.index_writes = 0
+        self.bytes_written = 0
+        try:
+            os.mkdir(path)
+        except OSError:
+            pass
+        self._load()
+
+    def _segment(self, seq):
+        return f"{self._path}/{seq:08d}.seg"
+
+    def _records(self, seq):
+        # a record cut short by a reset while it was written doesn't count
+        try:
+            return min(self.segment_records, os.stat(self._segment(seq))[6] // self.record_size)
+        except OSError:
+            return 0
+
+    def _load(self):
+        segments = sorted(int(name[:-4]) for name in os.listdir(self._path) if name.endswith(".seg"))
+        self._head_seq = segments[0] if segments else 0
+        self._head_rec = 0
+        self._tail_seq = segments[-1] if segments else 0
+        try:
+            with open(f"{self._path}/index", "rb") as index_fd:
+                magic, head_seq, head_rec, _ = struct.unpack(INDEX_FORMAT, index_fd.read(struct.calcsize(INDEX_FORMAT)))
+            if magic == INDEX_MAGIC and head_seq >= self._head_seq:
+                self._head_seq = head_seq
+                self._head_rec = head_rec
+        except (OSError, ValueError):
+            pass
+        if self._tail_seq < self._head_seq:
+            self._tail_seq = self._head_seq
+        self._tail_rec = self._records(self._tail_seq)
+        self._count = sum(self._records(seq) for seq in range(self._head_seq, self._tail_seq + 1)) - self._head_rec
+        if self._count < 0:
+            self._count = 0
+
+    def _save_index(self):
+        tmp = f"{self._path}/index.tmp"
+        with open(tmp, "wb") as index_fd:
+            index_fd.write(struct.pack(INDEX_FORMAT, INDEX_MAGIC, self._head_seq, self._head_rec, self._tail_seq))
+        try:
+            os.rename(tmp, f"{self._path}/index")
+        except OSError:
+            # FAT doesn't rename over an existing file
+            os.remove(f"{self._path}/index")
+            os.rename(tmp, f"{self._path}/index")
+        self.index_writes += 1
+
+    def _drop_head(self):
+        try:
+            os.remove(self._segment(self._head_seq))
+        except OSError:
+            pass
+        self._head_seq += 1
+        self._head_rec = 0
+
+    def __len__(self):
+        return self._count
+
+    def push(self, payload):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        if len(payload) > self.max_payload:
+            self.oversize += 1
+            print(f"Message of {len(payload)} bytes doesn't fit a {self.record_size} byte record")
+            return False
+
+        if self._tail_rec >= self.segment_records:
+            self._tail_seq += 1
+            self._tail_rec = 0
+            if self._tail_seq - self._head_seq >= self.max_segments:
+                # full, the oldest segment goes with whatever is left in it
+                lost = self._records(self._head_seq) - self._head_rec
+                self._drop_head()
+                self._count -= lost
+                self.evicted += lost
+                self._save_index()
+
+        record = self._record
+        struct.pack_into(RECORD_HEADER, record, 0, len(payload))
+        record[2:2 + len(payload)] = payload
+        for idx in range(2 + len(payload), self.record_size):
+            record[idx] = 0
+        with open(self._segment(self._tail_seq), "ab") as segment_fd:
+            segment_fd.write(record)
+        self._tail_rec += 1
+        self._count += 1
+        self.pushed += 1
+        self.bytes_written += self.record_size
+        return True
+
+    def peek(self, count):
+        # the oldest count messages, without removing them
+        messages = []
+        seq = self._head_seq
+        rec = self._head_rec
+        while len(messages) < min(count, self._count):
+            if rec >= self.segment_records:
+                seq += 1
+                rec = 0
+                continue
+            with open(self._segment(seq), "rb") as segment_fd:
+                segment_fd.seek(rec * self.record_size)
+                while rec < self.segment_records and len(messages) < min(count, self._count):
+                    segment_fd.readinto(self._record)
+                    size = struct.unpack_from(RECORD_HEADER, self._record)[0]
+                    messages.append(bytes(self._record[2:2 + size]))
+                    rec += 1
+        return messages
+
+    def ack(self, count):
+        # removes the oldest count messages, segments read to the end are deleted
+        count = min(count, self._count)
+        if not count:
+            return
+        self._count -= count
+        self._head_rec += count
+        while self._head_rec >= self.segment_records and self._head_seq < self._tail_seq:
+            rest = self._head_rec - self.segment_records
+            self._drop_head()
+            self._head_rec = rest
+        if not self._count and self._head_seq == self._tail_seq and self._tail_rec >= self.segment_records:
+            # the tail is drained and full, the next push starts a new one
+            self._drop_head()
+            self._tail_seq = self._head_seq
+            self._tail_rec = 0
+        self.drained += count
+        self._save_index()
+
+    def drain(self, publish, limit):
+        # publishes up to limit messages oldest first, stops at the first failing
+        # publish; returns the number sent
+        sent = 0
+        try:
+            for message in self.peek(limit):
+                publish(message)
+                sent += 1
+        finally:
+            self.ack(sent)
+        return sent
+
+    def stats(self):
+        return {
+            "queued": self._count,
+            "segments": self._tail_seq - self._head_seq + 1,
+            "pushed": self.pushed,
+            "drained": self.drained,
+            "evicted": self.evicted,
+            "oversize": self.oversize,
+            "index_writes": self.index_writes,
+            "bytes_written": self.bytes_written,
+        }
@@ -0,0 +1,212 @@
+import json
+import struct
+import time
+from array import array
+
+ENCODING_JSON = 0
+ENCODING_COMPACT = 1
+ENCODING_BINARY = 2
+
+BINARY_VERSION = 1
+# fixed point value of a sample a channel has no reading for
+MISSING = -0x80000000
+# seconds from the device epoch to the Unix one, MicroPython ports count from 2000
+EPOCH_OFFSET = 946684800 if time.gmtime(0)[0] == 2000 else 0
+
+def _varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _zigzag(value):
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+def max_batch(channels, scales, rows, step_s, max_bytes, encoding=ENCODING_COMPACT, limit=255):
+    # most samples per message that fit max_bytes, the samples taking turns at
+    # the value rows and step_s seconds apart; rows at the extremes of the
+    # channels give a batch size that fits whatever is sampled. The count
+    # doubles until a message doesn't fit, then the last step is bisected.
+    telemetry = Telemetry(channels, scales=scales, capacity=limit, batch=limit, encoding=encoding)
+    for idx in range(limit):
+        telemetry.add(rows[idx % len(rows)], idx * step_s)
+    if len(telemetry.encode(1)) > max_bytes:
+        print(f"A sample takes more than {max_bytes} bytes, batches of 1 won't fit either")
+        return 1
+    fits = 1
+    # limit + 1 stands for past the samples there are, it is never encoded
+    over = limit + 1
+    count = 2
+    while count <= limit:
+        if len(telemetry.encode(count)) > max_bytes:
+            over = count
+            break
+        fits = count
+        count <<= 1
+    while over - fits > 1:
+        count = (fits + over) // 2
+        if len(telemetry.encode(count)) > max_bytes:
+            over = count
+        else:
+            fits = count
+    return fits
+
+class Telemetry:
+
+    # Buffers samples in preallocated arrays and hands them out as one
+    # message per `batch` samples or once the oldest is max_age_ms old.
+    # Values are kept in fixed point, value * scale of their channel.
+    #
+    # Encodings of a batch:
+    #   ENCODING_JSON      {"samples": [{"time": unix, channel: value, ...}, ...]}
+    #   ENCODING_COMPACT   {"t0": unix, "dt": [s, ...], "ch": [...], "scale": [...],
+    #                       "v": [[fixed point per sample] per channel]}
+    #   ENCODING_BINARY    version, channel count, sample count, t0 (u32), then
+    #                      per sample a zigzag varint time delta, a bitmask of the
+    #                      channels present and their zigzag varint deltas to
+    #                      the channel's previous value
+
+    def __init__(self, channels, scales=None, capacity=64, batch=12, max_age_ms=60000, encoding=ENCODING_COMPACT):
+        self.channels = tuple(channels)
+        self.scales = tuple(scales) if scales else (10,) * len(self.channels)
+        self.encoding = encoding
+        self.batch = batch
+        self.max_age_ms = max_age_ms
+        self._capacity = capacity
+        self._times = array("I", (0 for _ in range(capacity)))
+        self._values = array("i", (0 for _ in range(capacity * len(self.channels))))
+        self._head = 0
+        self._count = 0
+        self._oldest_ms = None
+        self._start_ms = time.ticks_ms()
+        self.samples = 0
+        self.dropped = 0
+        self.messages = 0
+        self.bytes = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, values, timestamp=None):
+        # values in channel order, None where there is no reading; returns
+        # True when a batch is due
+        idx = (self._head + self._count) % self._capacity
+        if self._count == self._capacity:
+            # full, the oldest sample makes room
+            self._head = (self._head + 1) % self._capacity
+            self.dropped += 1
+        else:
+            self._count += 1
+        self._times[idx] = (time.time() if timestamp is None else timestamp) + EPOCH_OFFSET
+        base = idx * len(self.channels)
+        for channel, value in enumerate(values):
+            self._values[base + channel] = MISSING if value is None else int(round(value * self.scales[channel]))
+        if self._oldest_ms is None:
+            self._oldest_ms = time.ticks_ms()
+        self.samples += 1
+        return self.due()
+
+    def due(self):
+        if not self._count:
+            return False
+        return self._count >= self.batch or time.ticks_diff(time.ticks_ms(), self._oldest_ms) >= self.max_age_ms
+
+    def _rows(self, count):
+        channels = len(self.channels)
+        for pos in range(count):
+            idx = (self._head + pos) % self._capacity
+            yield self._times[idx], self._values[idx * channels:(idx + 1) * channels]
+
+    def _encode_json(self, count):
+        samples = []
+        for timestamp, values in self._rows(count):
+            sample = {"time": timestamp}
+            for channel, value in enumerate(values):
+                if value != MISSING:
+                    sample[self.channels[channel]] = value / self.scales[channel]
+            samples.append(sample)
+        return json.dumps({"samples": samples})
+
+    def _encode_compact(self, count):
+        t0 = None
+        last = 0
+        deltas = []
+        columns = [[] for _ in self.channels]
+        for timestamp, values in self._rows(count):
+            if t0 is None:
+                t0 = last = timestamp
+            deltas.append(timestamp - last)
+            last = timestamp
+            for channel, value in enumerate(values):
+                columns[channel].append(None if value == MISSING else value)
+        return json.dumps({"t0": t0, "dt": deltas, "ch": self.channels, "scale": self.scales, "v": columns})
+
+    def _encode_binary(self, count):
+        out = bytearray(struct.pack("<BBHI", BINARY_VERSION, len(self.channels), count, self._times[self._head]))
+        last_time = self._times[self._head]
+        last = [0] * len(self.channels)
+        for timestamp, values in self._rows(count):
+            _varint(out, _zigzag(timestamp - last_time))
+            last_time = timestamp
+            mask = 0
+            for channel, value in enumerate(values):
+                if value != MISSING:
+                    mask |= 1 << channel
+            _varint(out, mask)
+            for channel, value in enumerate(values):
+                if value != MISSING:
+                    _varint(out, _zigzag(value - last[channel]))
+                    last[channel] = value
+        return bytes(out)
+
+    def encode(self, count=None):
+        count = self._count if count is None else min(count, self._count)
+        if self.encoding == ENCODING_BINARY:
+            return self._encode_binary(count)
+        if self.encoding == ENCODING_JSON:
+            return self._encode_json(count)
+        return self._encode_compact(count)
+
+    def _drop(self, count):
+        self._head = (self._head + count) % self._capacity
+        self._count -= count
+        self._oldest_ms = time.ticks_ms() if self._count else None
+
+    def flush(self, publish, max_bytes=None):
+        # publish(payload) sends one message, samples are only dropped once it
+        # returned, an exception or False leaves them for the next flush; with
+        # max_bytes the samples go out as messages of at most that many bytes
+        sent = 0
+        while self._count:
+            count = self._count
+            payload = self.encode(count)
+            while max_bytes and len(payload) > max_bytes and count > 1:
+                # samples encode to about the same size, the estimate is close
+                count = max(1, min(count - 1, count * max_bytes // len(payload)))
+                payload = self.encode(count)
+            if max_bytes and len(payload) > max_bytes:
+                # a sample that doesn't fit on its own would block the rest
+                print(f"Sample of {len(payload)} bytes doesn't fit a {max_bytes} byte message")
+                self._drop(1)
+                self.dropped += 1
+                continue
+            if publish(payload) is False:
+                break
+            self._drop(count)
+            self.messages += 1
+            self.bytes += len(payload)
+            sent += count
+        return sent
+
+    def stats(self):
+        uptime_ms = max(1, time.ticks_diff(time.ticks_ms(), self._start_ms))
+        sent = self.samples - self.dropped - self._count
+        return {
+            "samples": self.samples,
+            "dropped": self.dropped,
+            "buffered": self._count,
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "bytes_per_sample": self.bytes / sent if sent > 0 else 0,
+            "messages_per_hour": self.messages * 3600000 // uptime_ms,
+        }
@@ -0,0 +1,224 @@
+import time
+import ntptime
+
+# days from 1970-01-01 to the device epoch, MicroPython ports count from 2000
+EPOCH_DAYS = 10957 if time.gmtime(0)[0] == 2000 else 0
+EPOCH_OFFSET = EPOCH_DAYS * 86400
+
+SYNC_PERIOD_MS = 6 * 3600 * 1000
+SYNC_RETRY_MS = 60000
+# drift is estimated once the synced span is this long, NTP gives whole seconds
+DRIFT_MIN_MS = 3600 * 1000
+# ticks wrap after 2**29 ms on some ports, the base moves on well before
+REBASE_MS = 24 * 3600 * 1000
+
+# DST rules: start month, its nth Sunday (-1 the last), seconds into that day,
+# end month, Sunday, seconds, True when the seconds are UTC, else local standard time
+DST_EU = (3, -1, 3600, 10, -1, 3600, True)
+DST_US = (3, 2, 7200, 11, 1, 3600, False)
+
+def days_from_civil(year, month, day):
+    # days since 1970-01-01 of a Gregorian date
+    if month <= 2:
+        year -= 1
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month - 3 if month > 2 else month + 9) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+def civil_from_days(days):
+    # (year, month, day) of days since 1970-01-01
+    days += 719468
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = mp + 3 if mp < 10 else mp - 9
+    year = yoe + era * 400
+    return (year + 1 if month <= 2 else year), month, day
+
+def sunday(year, month, nth):
+    # days since 1970-01-01 of the nth Sunday of month, nth -1 the last one
+    if nth < 0:
+        last = days_from_civil(year + 1, 1, 1) - 1 if month == 12 else days_from_civil(year, month + 1, 1) - 1
+        return last - (last + 4) % 7
+    first = days_from_civil(year, month, 1)
+    return first + (3 - first) % 7 + 7 * (nth - 1)
+
+class TimeService:
+
+    # Wall clock for timestamps, kept off the RTC between NTP syncs:
+    #   - time is the synced second plus the ticks_ms since, corrected by the
+    #     drift measured over all syncs so far, so a timestamp is a ticks
+    #     read and integer adds; seconds count from the device epoch and
+    #     stay small ints on a 2000 epoch port
+    #   - the DST transitions of the current year are worked out once, when
+    #     a timestamp leaves the year, local time is a compare and an add
+    #   - iso() keeps its date and zone parts until they change
+    #
+    #   clock = TimeService(3600, DST_EU)     # CET/CEST
+    #   if clock.sync_due():
+    #       clock.sync()
+    #   telemetry.add(values, clock.now())
+    #   print(clock.iso())                   # 2026-10-18T12:14:29+02:00
+
+    def __init__(self, utc_offset=0, dst=None, sync_period_ms=SYNC_PERIOD_MS):
+        self.utc_offset = utc_offset
+        self.dst = dst
+        self.sync_period_ms = sync_period_ms
+        self.synced = False
+        self.syncs = 0
+        self.failures = 0
+        self.step_s = 0
+        self.drift_ppm = 0
+        self._skew = 0
+        self._base_s = time.time()
+        self._base_ms = 0
+        self._ticks = time.ticks_ms()
+        self._ref_s = 0
+        self._ref_ms = 0
+        self._sync_ms = None
+        self._retry_ms = 0
+        self._year_start = 0
+        self._year_end = -1
+        self._dst_start = 0
+        self._dst_end = 0
+        self._iso_day = None
+        self._iso_date = ""
+        self._iso_offset = None
+        self._iso_zone = ""
+
+    def _elapsed(self, ticks):
+        # ms since the base, raw and drift corrected
+        raw = time.ticks_diff(ticks, self._ticks)
+        return raw, raw + raw // self._skew if self._skew else raw
+
+    def _rebase(self, ticks):
+        raw, corrected = self._elapsed(ticks)
+        total = self._base_ms + corrected
+        self._base_s += total // 1000
+        self._base_ms = total % 1000
+        self._ref_ms += raw
+        self._ticks = ticks
+
+    def now(self):
+        # seconds since the device epoch, UTC, like time.time()
+        ticks = time.ticks_ms()
+        raw, corrected = self._elapsed(ticks)
+        if raw >= REBASE_MS:
+            self._rebase(ticks)
+            return self._base_s
+        return self._base_s + (self._base_ms + corrected) // 1000
+
+    def unix(self):
+        return self.now() + EPOCH_OFFSET
+
+    def _set(self, seconds):
+        ticks = time.ticks_ms()
+        if self.synced:
+            self.step_s = seconds - self.now()
+            self._rebase(ticks)
+            if self._ref_ms >= DRIFT_MIN_MS:
+                # ms the ticks ran fast (-) or slow (+) over the whole synced span
+                error = (seconds - self._ref_s) * 1000 - self._ref_ms
+                self.drift_ppm = error * 1000000 // self._ref_ms
+                self._skew = self._ref_ms // error if error else 0
+        else:
+            self.step_s = seconds - self.now()
+            self._ref_s = seconds
+            self._ref_ms = 0
+        self._base_s = seconds
+        self._base_ms = 0
+        self._ticks = ticks
+        self.synced = True
+
+    def sync(self):
+        # sets the RTC and the clock from NTP, True on success
+        self._retry_ms = time.ticks_ms()
+        try:
+            ntptime.settime()
+        except OSError as e:
+            self.failures += 1
+            print("NTP failed: " + str(e))
+            return False
+        self._set(time.time())
+        self._sync_ms = time.ticks_ms()
+        self.syncs += 1
+        return True
+
+    def sync_due(self):
+        now = time.ticks_ms()
+        if self._sync_ms is None or time.ticks_diff(now, self._sync_ms) >= self.sync_period_ms:
+            return self.failures == 0 or time.ticks_diff(now, self._retry_ms) >= SYNC_RETRY_MS
+        return False
+
+    def _year(self, t):
+        # the year around t and its DST transitions
+        year = civil_from_days(t // 86400 + EPOCH_DAYS)[0]
+        self._year_start = (days_from_civil(year, 1, 1) - EPOCH_DAYS) * 86400
+        self._year_end = (days_from_civil(year + 1, 1, 1) - EPOCH_DAYS) * 86400
+        if self.dst:
+            start_month, start_nth, start_s, end_month, end_nth, end_s, utc = self.dst
+            local = 0 if utc else self.utc_offset
+            self._dst_start = (sunday(year, start_month, start_nth) - EPOCH_DAYS) * 86400 + start_s - local
+            self._dst_end = (sunday(year, end_month, end_nth) - EPOCH_DAYS) * 86400 + end_s - local
+
+    def offset(self, t=None):
+        # seconds local time is ahead of UTC at t
+        if t is None:
+            t = self.now()
+        if t < self._year_start or t >= self._year_end:
+            self._year(t)
+        if not self.dst:
+            return self.utc_offset
+        if self._dst_start < self._dst_end:
+            summer = self._dst_start <= t < self._dst_end
+        else:
+            # southern hemisphere, summer spans the new year
+            summer = t >= self._dst_start or t < self._dst_end
+        return self.utc_offset + 3600 if summer else self.utc_offset
+
+    def local(self, t=None):
+        if t is None:
+            t = self.now()
+        return t + self.offset(t)
+
+    def localtime(self, t=None):
+        # (year, month, mday, hour, minute, second, weekday, yearday) as time.localtime()
+        t = self.local(t)
+        days = t // 86400 + EPOCH_DAYS
+        secs = t % 86400
+        year, month, day = civil_from_days(days)
+        return (year, month, day, secs // 3600, secs // 60 % 60, secs % 60,
+                (days + 3) % 7, days - days_from_civil(year, 1, 1) + 1)
+
+    def iso(self, t=None, local=True):
+        # "2026-10-18T12:14:29+02:00", UTC "2026-10-18T10:14:29Z"
+        if t is None:
+            t = self.now()
+        offset = self.offset(t) if local else 0
+        t += offset
+        days = t // 86400
+        if days != self._iso_day:
+            year, month, day = civil_from_days(days + EPOCH_DAYS)
+            self._iso_date = f"{year:04d}-{month:02d}-{day:02d}T"
+            self._iso_day = days
+        if offset != self._iso_offset:
+            minutes = abs(offset) // 60
+            self._iso_zone = f"{'-' if offset < 0 else '+'}{minutes // 60:02d}:{minutes % 60:02d}" if offset else "Z"
+            self._iso_offset = offset
+        secs = t % 86400
+        return f"{self._iso_date}{secs // 3600:02d}:{secs // 60 % 60:02d}:{secs % 60:02d}{self._iso_zone}"
+
+    def stats(self):
+        return {
+            "synced": self.synced,
+            "syncs": self.syncs,
+            "failures": self.failures,
+            "step_s": self.step_s,
+            "drift_ppm": self.drift_ppm,
+            "since_sync_ms": time.ticks_diff(time.ticks_ms(), self._sync_ms) if self._sync_ms is not None else None,
+        }
@@ -0,0 +1,223 @@
+# Host checks of time_service.py: NTP steps, drift correction and resync
+# timing, DST transitions, month and year ends and the local time of
+# esp32_tools.get_lockal_time around them.
+#
+#   python3 -m pytest esp32_mqtt/tools/test_time_service.py
+
+import calendar
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "esp32_mqtt"))
+
+import host
+
+host.install()
+
+import esp32_tools
+import ntptime
+from time_service import DST_EU, DST_US, EPOCH_OFFSET, SYNC_RETRY_MS, TimeService
+
+
+def utc(year, month, day, hour=0, minute=0, second=0):
+    # device epoch seconds of a UTC time
+    return calendar.timegm((year, month, day, hour, minute, second, 0, 0, 0)) - EPOCH_OFFSET
+
+
+def local(clock, t):
+    return clock.localtime(t)[:6]
+
+
+class Clock:
+
+    # ticks_ms and the RTC under test control, the ticks run 100 ppm slow:
+    # 3599640 of them per real hour
+
+    SLOW_PPM = 100
+
+    def __init__(self, monkeypatch, rtc):
+        self.ticks = 0
+        self.rtc = rtc
+        self.ntp = rtc
+        self.ntp_up = True
+        monkeypatch.setattr(time, "ticks_ms", lambda: self.ticks & host.TICKS_MAX)
+        monkeypatch.setattr(time, "time", lambda: self.rtc)
+        monkeypatch.setattr(ntptime, "settime", self.settime)
+
+    def settime(self):
+        if not self.ntp_up:
+            raise OSError("ETIMEDOUT")
+        self.rtc = self.ntp
+
+    def run(self, ms):
+        # ms of real time pass, the RTC is left alone like the clock under test
+        self.ticks += ms - ms * self.SLOW_PPM // 1000000
+        self.ntp += ms // 1000
+
+
+def test_sync_steps_to_ntp(monkeypatch):
+    clock = Clock(monkeypatch, utc(2026, 6, 1))
+    service = TimeService()
+    clock.ntp += 5
+    assert service.sync_due()
+    assert service.sync()
+    assert service.step_s == 5
+    assert service.now() == clock.ntp
+    assert not service.sync_due()
+
+
+def test_drift_is_corrected(monkeypatch):
+    clock = Clock(monkeypatch, utc(2026, 6, 1))
+    service = TimeService(sync_period_ms=2 * 3600 * 1000)
+    service.sync()
+    # the period counts in ticks, a slow minute more makes up for the slow ticks
+    clock.run(2 * 3600 * 1000)
+    assert not service.sync_due()
+    clock.run(60 * 1000)
+    # 726 ms behind after two slow hours
+    assert service.now() == clock.ntp - 1
+    assert service.sync_due()
+    assert service.sync()
+    assert service.step_s == 1
+    assert service.drift_ppm == clock.SLOW_PPM
+    # corrected, five more hours end up within a second instead of 1.8 s behind
+    clock.run(5 * 3600 * 1000)
+    assert clock.ntp - service.now() <= 1
+    assert service.sync()
+    assert service.step_s <= 1
+
+
+def test_rebase_across_ticks_wrap(monkeypatch):
+    clock = Clock(monkeypatch, utc(2026, 6, 1))
+    service = TimeService(sync_period_ms=3600 * 1000)
+    service.sync()
+    # drift is measured once the synced span is an hour of ticks
+    clock.run(2 * 3600 * 1000)
+    service.sync()
+    assert service.drift_ppm == clock.SLOW_PPM
+    # 20 days, past the 2**30 ms the ticks wrap after, read every 6 hours
+    for _ in range(80):
+        clock.run(6 * 3600 * 1000)
+        assert abs(service.now() - clock.ntp) <= 1
+    assert clock.ticks > host.TICKS_PERIOD
+
+
+def test_sync_retry(monkeypatch):
+    clock = Clock(monkeypatch, utc(2026, 6, 1))
+    service = TimeService(sync_period_ms=3600 * 1000)
+    service.sync()
+    clock.run(3601 * 1000)
+    clock.ntp_up = False
+    assert service.sync_due()
+    assert not service.sync()
+    assert service.failures == 1
+    # the failed attempt holds off the next one for SYNC_RETRY_MS
+    clock.run(SYNC_RETRY_MS - 1000)
+    assert not service.sync_due()
+    clock.run(2000)
+    assert service.sync_due()
+    clock.ntp_up = True
+    assert service.sync()
+    assert not service.sync_due()
+    assert service.stats()["syncs"] == 2
+
+
+def test_eu_transitions():
+    clock = TimeService(3600, DST_EU)
+    # 2026-03-29 01:00 UTC, 02:00 CET becomes 03:00 CEST
+    start = utc(2026, 3, 29, 1)
+    assert clock.offset(start - 1) == 3600
+    assert clock.offset(start) == 7200
+    assert local(clock, start - 1) == (2026, 3, 29, 1, 59, 59)
+    assert local(clock, start) == (2026, 3, 29, 3, 0, 0)
+    assert local(clock, start + 1) == (2026, 3, 29, 3, 0, 1)
+    # 2026-10-25 01:00 UTC, 03:00 CEST becomes 02:00 CET
+    end = utc(2026, 10, 25, 1)
+    assert clock.offset(end - 1) == 7200
+    assert clock.offset(end) == 3600
+    assert local(clock, end - 1) == (2026, 10, 25, 2, 59, 59)
+    assert local(clock, end) == (2026, 10, 25, 2, 0, 0)
+    assert clock.iso(end - 1) == "2026-10-25T02:59:59+02:00"
+    assert clock.iso(end + 1) == "2026-10-25T02:00:01+01:00"
+
+
+def test_eu_transitions_are_utc():
+    # the whole EU switches at 01:00 UTC, London included
+    clock = TimeService(0, DST_EU)
+    start = utc(2027, 3, 28, 1)
+    assert local(clock, start - 1) == (2027, 3, 28, 0, 59, 59)
+    assert local(clock, start) == (2027, 3, 28, 2, 0, 0)
+    end = utc(2027, 10, 31, 1)
+    assert local(clock, end - 1) == (2027, 10, 31, 1, 59, 59)
+    assert local(clock, end) == (2027, 10, 31, 1, 0, 0)
+
+
+def test_us_transitions():
+    clock = TimeService(-5 * 3600, DST_US)
+    # 2026-03-08 02:00 EST, the second Sunday of March
+    start = utc(2026, 3, 8, 7)
+    assert clock.offset(start - 1) == -5 * 3600
+    assert clock.offset(start) == -4 * 3600
+    assert local(clock, start - 1) == (2026, 3, 8, 1, 59, 59)
+    assert local(clock, start) == (2026, 3, 8, 3, 0, 0)
+    # 2026-11-01 02:00 EDT, the first Sunday of November
+    end = utc(2026, 11, 1, 6)
+    assert clock.offset(end - 1) == -4 * 3600
+    assert clock.offset(end) == -5 * 3600
+    assert local(clock, end - 1) == (2026, 11, 1, 1, 59, 59)
+    assert local(clock, end) == (2026, 11, 1, 1, 0, 0)
+    assert clock.iso(end + 1) == "2026-11-01T01:00:01-05:00"
+
+
+def test_month_ends():
+    clock = TimeService(3600, DST_EU)
+    # 30 days, in summer time
+    t = utc(2026, 4, 30, 21, 59, 59)
+    assert local(clock, t) == (2026, 4, 30, 23, 59, 59)
+    assert local(clock, t + 1) == (2026, 5, 1, 0, 0, 0)
+    # 31 days, in standard time
+    t = utc(2026, 1, 31, 22, 59, 59)
+    assert local(clock, t) == (2026, 1, 31, 23, 59, 59)
+    assert local(clock, t + 1) == (2026, 2, 1, 0, 0, 0)
+    t = utc(2026, 12, 31, 22, 59, 59)
+    assert clock.localtime(t)[7] == 365
+    assert clock.localtime(t + 1) == (2027, 1, 1, 0, 0, 0, 4, 1)
+
+
+def test_february():
+    clock = TimeService()
+    for year, leap in ((2026, False), (2028, True), (2000, True), (2100, False)):
+        t = utc(year, 2, 28, 23, 59, 59)
+        assert local(clock, t) == (year, 2, 28, 23, 59, 59)
+        assert local(clock, t + 1) == ((year, 2, 29, 0, 0, 0) if leap else (year, 3, 1, 0, 0, 0))
+        if leap:
+            assert local(clock, t + 86400) == (year, 2, 29, 23, 59, 59)
+            assert local(clock, t + 86401) == (year, 3, 1, 0, 0, 0)
+        march = clock.localtime(t + 86401 if leap else t + 1)
+        assert march[1:3] == (3, 1) and march[7] == (61 if leap else 60)
+
+
+def test_get_lockal_time_rollover(monkeypatch):
+    now = [0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    # new year in CET, one call before and one after
+    now[0] = utc(2026, 12, 31, 22, 59, 59)
+    before = esp32_tools.get_lockal_time(1, True)
+    now[0] += 1
+    after = esp32_tools.get_lockal_time(1, True)
+    assert (before["year"], before["month"], before["day"], before["hour"], before["second"]) == (2026, 12, 31, 23, 59)
+    assert (after["year"], after["month"], after["day"], after["hour"], after["second"]) == (2027, 1, 1, 0, 0)
+    assert after["yearday"] == 1
+    # the clock is reused, the transitions of the new year are worked out for it
+    clock = esp32_tools._clock
+    now[0] = utc(2027, 3, 28, 1) - 1
+    assert esp32_tools.get_lockal_time(1, True)["hour"] == 1
+    now[0] += 1
+    assert esp32_tools.get_lockal_time(1, True)["hour"] == 3
+    assert esp32_tools._clock is clock
+    # other settings get their own clock
+    assert esp32_tools.get_lockal_time(0, False)["hour"] == 1
+    assert esp32_tools._clock is not clock
@@ -0,0 +1,188 @@
+# CPython stand-ins for the MicroPython modules the projects use, so drivers
+# and node logic can be run and measured off-device.
+#
+#   import host
+#   host.install()
+#   import machine          # host.machine
+#   from ssd1306 import SSD1306
+#
+# A node program runs wake after wake, deep sleep included, with its absolute
+# paths ("/certs/...", "/queue") kept in a directory standing in for flash:
+#
+#   host.run("esp32_mqtt/main.py", "/tmp/flash", wakes=24)
+
+import builtins
+import os
+import runpy
+import sys
+import time
+
+_start = time.monotonic_ns()
+# time spent in simulated deep sleep, the wall clock runs ahead by it
+_slept_ns = 0
+_time = time.time
+_gmtime = time.gmtime
+_localtime = time.localtime
+
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+
+
+def _ticks(div):
+    return ((time.monotonic_ns() - _start) // div) & TICKS_MAX
+
+
+def ticks_ms():
+    return _ticks(1000000)
+
+
+def ticks_us():
+    return _ticks(1000)
+
+
+def ticks_cpu():
+    return _ticks(1)
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & TICKS_MAX
+
+
+def ticks_diff(ticks1, ticks2):
+    diff = (ticks1 - ticks2) & TICKS_MAX
+    return diff - TICKS_PERIOD if diff >= TICKS_PERIOD >> 1 else diff
+
+
+def sleep_ms(ms):
+    if ms > 0:
+        time.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    if us > 0:
+        time.sleep(us / 1000000)
+
+
+# stand-ins with state a reset clears, e.g. the radio
+RESET_HOOKS = []
+
+
+def advance(ms):
+    # deep sleep of ms: the clock jumps, ticks restart as after a reset
+    global _start, _slept_ns
+    _slept_ns += ms * 1000000
+    _start = time.monotonic_ns()
+    for hook in RESET_HOOKS:
+        hook()
+
+
+def time_():
+    # seconds as an int, like MicroPython
+    return int(_time() + _slept_ns / 1000000000)
+
+
+def gmtime(secs=None):
+    return _gmtime(time_() if secs is None else secs)
+
+
+def localtime(secs=None):
+    return _localtime(time_() if secs is None else secs)
+
+
+_TIME_EXTRAS = {
+    "ticks_ms": ticks_ms,
+    "ticks_us": ticks_us,
+    "ticks_cpu": ticks_cpu,
+    "ticks_add": ticks_add,
+    "ticks_diff": ticks_diff,
+    "sleep_ms": sleep_ms,
+    "sleep_us": sleep_us,
+}
+
+_TIME_PATCHED = {
+    "time": time_,
+    "gmtime": gmtime,
+    "localtime": localtime,
+}
+
+MODULES = ("machine", "network", "onewire", "ds18x20", "ntptime", "uasyncio", "umqtt", "umqtt.simple")
+# CPython has these too, the MicroPython flavour replaces them
+REPLACED = ("ssl",)
+
+_flash = None
+
+
+def install():
+    for name, func in _TIME_EXTRAS.items():
+        if not hasattr(time, name):
+            setattr(time, name, func)
+    for name, func in _TIME_PATCHED.items():
+        setattr(time, name, func)
+
+    # asyncio picks up CPython's ssl before the stand-in replaces it
+    import asyncio
+
+    for name in MODULES + REPLACED:
+        if name in REPLACED or name not in sys.modules:
+            module = __import__(f"host.{name}", fromlist=[name])
+            sys.modules[name] = module
+
+
+def _device_path(path):
+    # "/certs/x" -> <flash>/certs/x for top level names the host root doesn't have
+    if _flash and isinstance(path, str) and path.startswith("/") and not path.startswith(_flash):
+        top = "/" + path[1:].split("/", 1)[0]
+        if not _exists(top):
+            return os.path.join(_flash, path[1:])
+    return path
+
+
+def _exists(path):
+    try:
+        _os_calls["stat"](path)
+        return True
+    except OSError:
+        return False
+
+
+_os_calls = {name: getattr(os, name) for name in ("stat", "listdir", "mkdir", "remove", "rename")}
+_open = builtins.open
+
+
+def _wrap(func, paths):
+    def call(*args, **kwargs):
+        args = [_device_path(arg) if pos < paths else arg for pos, arg in enumerate(args)]
+        return func(*args, **kwargs)
+    return call
+
+
+def mount(flash):
+    # the device filesystem is the directory flash, relative paths included
+    global _flash
+    _flash = os.path.abspath(flash)
+    os.makedirs(_flash, exist_ok=True)
+    os.chdir(_flash)
+    builtins.open = _wrap(_open, 1)
+    for name, func in _os_calls.items():
+        setattr(os, name, _wrap(func, 2 if name == "rename" else 1))
+
+
+def run(script, flash, wakes=1):
+    # runs script once per wake, a deepsleep() ends a wake, anything else the run;
+    # modules the script imported are dropped between wakes as the reset would
+    script = os.path.abspath(script)
+    install()
+    mount(flash)
+    sys.path.insert(0, os.path.dirname(script))
+    loaded = set(sys.modules)
+    done = 0
+    while done < wakes:
+        done += 1
+        try:
+            runpy.run_path(script, run_name="__main__")
+        except sys.modules["machine"].DeepSleep:
+            for name in set(sys.modules) - loaded:
+                del sys.modules[name]
+            continue
+        break
+    return done
@@ -0,0 +1,191 @@
+# Host stand-in for the parts of MicroPython's machine module the projects use.
+
+import time
+
+import host
+from host.ssd1306_panel import SSD1306Panel
+
+PWRON_RESET = 1
+HARD_RESET = 2
+WDT_RESET = 3
+DEEPSLEEP_RESET = 4
+SOFT_RESET = 5
+
+RTC_MEMORY_MAX = 2048
+
+_freq = 160000000
+_reset_cause = PWRON_RESET
+_rtc_memory = b""
+
+
+class DeepSleep(BaseException):
+
+    # Raised by deepsleep(), ends the run of main.py like the reset would;
+    # host.run() catches it and starts the next wake. A BaseException so the
+    # program's own `except Exception` doesn't swallow it.
+
+    def __init__(self, ms):
+        super().__init__(ms)
+        self.ms = ms
+
+
+class Reset(DeepSleep):
+
+    # Raised by reset(), the next wake is a boot with HARD_RESET as its cause.
+
+    def __init__(self):
+        super().__init__(0)
+
+
+def freq(hz=None):
+    global _freq
+    if hz is None:
+        return _freq
+    _freq = hz
+
+
+def reset_cause():
+    return _reset_cause
+
+
+def deepsleep(ms=0):
+    # the clock moves on by ms without waiting for it, ticks restart from 0
+    global _reset_cause
+    host.advance(ms)
+    _reset_cause = DEEPSLEEP_RESET
+    raise DeepSleep(ms)
+
+
+def reset():
+    # ticks restart from 0 as after a boot
+    global _reset_cause
+    host.advance(0)
+    _reset_cause = HARD_RESET
+    raise Reset()
+
+
+def lightsleep(ms=0):
+    time.sleep_ms(ms)
+
+
+def power_on():
+    # as if the board lost power: RTC memory is gone, the next wake is a cold boot
+    global _reset_cause, _rtc_memory
+    _reset_cause = PWRON_RESET
+    _rtc_memory = b""
+
+
+class PWM:
+
+    def __init__(self, dest, freq=5000, duty_u16=0):
+        self.pin = dest
+        self._freq = freq
+        self._duty = duty_u16
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self._duty
+        self._duty = value
+
+    def deinit(self):
+        self._duty = 0
+
+
+class RTC:
+
+    # user memory survives deep sleep but not a power loss
+
+    def memory(self, data=None):
+        global _rtc_memory
+        if data is None:
+            return _rtc_memory
+        if len(data) > RTC_MEMORY_MAX:
+            raise ValueError("buffer too long")
+        _rtc_memory = bytes(data)
+
+
+class Pin:
+
+    IN = 1
+    OUT = 3
+    PULL_UP = 2
+    PULL_DOWN = 1
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self._value = value or 0
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = 1 if value else 0
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+
+class I2C:
+
+    # Byte level bus model: every transaction costs a start, the address byte,
+    # 9 clocks per byte (8 data bits and the ack) and a stop. With realtime=True
+    # writes also take that long in wall time.
+
+    # devices attached to every new bus unless given explicitly
+    default_devices = {0x3C: SSD1306Panel}
+
+    def __init__(self, id=0, scl=None, sda=None, freq=400000, devices=None, realtime=False):
+        self.id = id
+        self.freq = freq
+        self.realtime = realtime
+        if devices is None:
+            devices = {addr: factory() for addr, factory in self.default_devices.items()}
+        self.devices = devices
+        self.transactions = 0
+        self.bytes = 0
+        self.bus_us = 0
+
+    def attach(self, addr, device):
+        self.devices[addr] = device
+        return device
+
+    def _transfer(self, addr, len):
+        if addr not in self.devices:
+            raise OSError(19, "ENODEV")
+        us = ((len + 1) * 9 + 2) * 1000000 // self.freq
+        self.transactions += 1
+        self.bytes += len + 1
+        self.bus_us += us
+        if self.realtime:
+            time.sleep(us / 1000000)
+
+    def scan(self):
+        return sorted(self.devices)
+
+    def writeto(self, addr, buf, stop=True):
+        buf = bytes(buf)
+        self._transfer(addr, len(buf))
+        self.devices[addr].write(buf)
+        return len(buf)
+
+    def writevto(self, addr, vector, stop=True):
+        buf = b"".join(bytes(part) for part in vector)
+        self._transfer(addr, len(buf))
+        self.devices[addr].write(buf)
+        return len(buf)
+
+    def readfrom(self, addr, nbytes, stop=True):
+        self._transfer(addr, nbytes)
+        return bytes(nbytes)
+
+    def reset_stats(self):
+        self.transactions = 0
+        self.bytes = 0
+        self.bus_us = 0
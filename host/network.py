@@ -0,0 +1,149 @@
+# Host stand-in for MicroPython's network module, one station interface and
+# the APs in range of it. A join takes join_ms, a scan scan_ms, both in wall
+# time; radio_ms counts how long the interface was active.
+#
+#   import network
+#   network.access_points.append(network.AccessPoint("home", "secret"))
+
+import time
+
+import host
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 1000
+STAT_CONNECTING = 1001
+STAT_GOT_IP = 1010
+STAT_BEACON_TIMEOUT = 200
+STAT_NO_AP_FOUND = 201
+STAT_WRONG_PASSWORD = 202
+STAT_ASSOC_FAIL = 203
+STAT_HANDSHAKE_TIMEOUT = 204
+
+join_ms = 300
+scan_ms = 1500
+
+access_points = []
+
+
+class AccessPoint:
+
+    def __init__(self, ssid, password, bssid=b"\x02\x00\x00\x00\x00\x01", channel=1, rssi=-60):
+        self.ssid = ssid
+        self.password = password
+        self.bssid = bssid
+        self.channel = channel
+        self.rssi = rssi
+
+
+class _Radio:
+
+    def __init__(self):
+        self.reset()
+        self.radio_ms = 0
+        self.joins = 0
+        self.scans = 0
+
+    def reset(self):
+        self.active = False
+        self.active_ms = 0
+        self.status = STAT_IDLE
+        self.ap = None
+        self.join_ms = 0
+
+    def on_ms(self):
+        # time active so far, current activation included
+        if not self.active:
+            return self.radio_ms
+        return self.radio_ms + time.ticks_diff(time.ticks_ms(), self.active_ms)
+
+
+_radio = _Radio()
+
+
+def _sleep():
+    # deep sleep powers the radio down
+    if _radio.active:
+        _radio.radio_ms = _radio.on_ms()
+    _radio.reset()
+
+
+host.RESET_HOOKS.append(_sleep)
+
+
+def radio_ms():
+    return _radio.on_ms()
+
+
+def stats():
+    return {"radio_ms": _radio.on_ms(), "joins": _radio.joins, "scans": _radio.scans}
+
+
+class WLAN:
+
+    def __init__(self, interface=STA_IF):
+        self.interface = interface
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return _radio.active
+        if is_active and not _radio.active:
+            _radio.active = True
+            _radio.active_ms = time.ticks_ms()
+        elif not is_active and _radio.active:
+            _radio.radio_ms = _radio.on_ms()
+            _radio.reset()
+        return None
+
+    def _check(self):
+        if not _radio.active:
+            raise OSError("Wifi Not Started")
+
+    def scan(self):
+        self._check()
+        _radio.scans += 1
+        time.sleep_ms(scan_ms)
+        return [(ap.ssid.encode(), ap.bssid, ap.channel, ap.rssi, 3, False) for ap in access_points]
+
+    def connect(self, ssid=None, key=None, *, bssid=None):
+        self._check()
+        _radio.ap = None
+        _radio.status = STAT_NO_AP_FOUND
+        for ap in access_points:
+            if ap.ssid == ssid and (bssid is None or ap.bssid == bssid):
+                _radio.ap = ap
+                _radio.status = STAT_CONNECTING if ap.password == key else STAT_WRONG_PASSWORD
+                _radio.join_ms = time.ticks_add(time.ticks_ms(), join_ms)
+                break
+
+    def disconnect(self):
+        _radio.ap = None
+        _radio.status = STAT_IDLE
+
+    def status(self, param=None):
+        if param == "rssi":
+            return _radio.ap.rssi if self.isconnected() else 0
+        if _radio.status == STAT_CONNECTING and time.ticks_diff(time.ticks_ms(), _radio.join_ms) >= 0:
+            _radio.status = STAT_GOT_IP
+            _radio.joins += 1
+        return _radio.status
+
+    def isconnected(self):
+        return self.status() == STAT_GOT_IP
+
+    def ifconfig(self, config=None):
+        if self.isconnected():
+            return ("192.168.1.50", "255.255.255.0", "192.168.1.1", "192.168.1.1")
+        return ("0.0.0.0", "0.0.0.0", "0.0.0.0", "0.0.0.0")
+
+    def config(self, *args, **kwargs):
+        if kwargs:
+            return None
+        if args[0] == "essid":
+            return _radio.ap.ssid if self.isconnected() else ""
+        if args[0] == "channel":
+            return _radio.ap.channel if _radio.ap else 1
+        if args[0] == "mac":
+            return b"\x24\x0a\xc4\x00\x00\x01"
+        raise ValueError("unknown config param")
@@ -0,0 +1,17 @@
+# Host stand-in for MicroPython's ntptime, the host clock is taken as synced.
+
+import time as _time
+
+host = "pool.ntp.org"
+timeout = 1
+
+syncs = 0
+
+
+def time():
+    return _time.time()
+
+
+def settime():
+    global syncs
+    syncs += 1
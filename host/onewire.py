@@ -0,0 +1,15 @@
+# Host stand-in for MicroPython's onewire module, the bus only carries the
+# probes of host.ds18x20.
+
+
+class OneWireError(Exception):
+    pass
+
+
+class OneWire:
+
+    def __init__(self, pin):
+        self.pin = pin
+
+    def reset(self, required=False):
+        return True
@@ -0,0 +1,174 @@
+# Emulated SSD1306 128x64 panel fed with the I2C byte stream the driver sends.
+#
+# Decodes the control byte (Co/DC bits), the command set with its parameters
+# (kept across transactions, as the chip does), horizontal/vertical/page
+# addressing, the start line, display offset, remap, invert and on/off state,
+# and can dump what the panel shows as PBM or PNG.
+
+import struct
+import zlib
+
+WIDTH = 128
+HEIGHT = 64
+PAGES = HEIGHT >> 3
+
+# parameter bytes following each multi-byte command
+PARAMS = {
+    0x20: 1, 0x21: 2, 0x22: 2, 0x81: 1, 0x8D: 1, 0xA3: 2, 0xA8: 1, 0xD3: 1,
+    0xD5: 1, 0xD9: 1, 0xDA: 1, 0xDB: 1, 0x26: 6, 0x27: 6, 0x29: 5, 0x2A: 5,
+}
+
+
+class SSD1306Panel:
+
+    def __init__(self):
+        self.ram = bytearray(WIDTH * PAGES)
+        self.memory_mode = 2
+        self.col_start, self.col_end = 0, WIDTH - 1
+        self.page_start, self.page_end = 0, PAGES - 1
+        self.col = 0
+        self.page = 0
+        self.start_line = 0
+        self.offset = 0
+        self.seg_remap = False
+        self.com_reverse = False
+        self.inverted = False
+        self.on = False
+        self.all_on = False
+        self.contrast = 0x7F
+        self.scrolling = False
+        self._cmd = []
+        self.commands = 0
+        self.data_bytes = 0
+        self.ram_writes_while_scrolling = 0
+
+    def write(self, buf):
+        idx = 0
+        while idx < len(buf):
+            control = buf[idx]
+            idx += 1
+            continuation = control & 0x80
+            if control & 0x40:
+                data = buf[idx:idx + 1] if continuation else buf[idx:]
+                for byte in data:
+                    self._data(byte)
+                idx += len(data)
+            else:
+                cmds = buf[idx:idx + 1] if continuation else buf[idx:]
+                for byte in cmds:
+                    self._command_byte(byte)
+                idx += len(cmds)
+            if not continuation:
+                break
+
+    def _data(self, byte):
+        if self.scrolling:
+            self.ram_writes_while_scrolling += 1
+        self.ram[self.page * WIDTH + self.col] = byte
+        self.data_bytes += 1
+
+        if self.memory_mode == 0:
+            self.col += 1
+            if self.col > self.col_end:
+                self.col = self.col_start
+                self.page = self.page + 1 if self.page < self.page_end else self.page_start
+        elif self.memory_mode == 1:
+            self.page += 1
+            if self.page > self.page_end:
+                self.page = self.page_start
+                self.col = self.col + 1 if self.col < self.col_end else self.col_start
+        else:
+            if self.col < WIDTH - 1:
+                self.col += 1
+
+    def _command_byte(self, byte):
+        self._cmd.append(byte)
+        if len(self._cmd) - 1 < PARAMS.get(self._cmd[0], 0):
+            return
+        cmd = self._cmd
+        self._cmd = []
+        self.commands += 1
+        self._command(cmd[0], cmd[1:])
+
+    def _command(self, op, args):
+        if op == 0x20:
+            self.memory_mode = args[0] & 0x03
+        elif op == 0x21:
+            self.col_start, self.col_end = args[0] & 0x7F, args[1] & 0x7F
+            self.col = self.col_start
+        elif op == 0x22:
+            self.page_start, self.page_end = args[0] & 0x07, args[1] & 0x07
+            self.page = self.page_start
+        elif op <= 0x0F:
+            self.col = (self.col & 0xF0) | op
+        elif op <= 0x1F:
+            self.col = (self.col & 0x0F) | ((op & 0x07) << 4)
+        elif 0x40 <= op <= 0x7F:
+            self.start_line = op & 0x3F
+        elif 0xB0 <= op <= 0xB7:
+            self.page = op & 0x07
+        elif op == 0x81:
+            self.contrast = args[0]
+        elif op in (0xA0, 0xA1):
+            self.seg_remap = op == 0xA1
+        elif op in (0xA4, 0xA5):
+            self.all_on = op == 0xA5
+        elif op in (0xA6, 0xA7):
+            self.inverted = op == 0xA7
+        elif op in (0xAE, 0xAF):
+            self.on = op == 0xAF
+        elif op in (0xC0, 0xC8):
+            self.com_reverse = op == 0xC8
+        elif op == 0xD3:
+            self.offset = args[0] & 0x3F
+        elif op == 0x2E:
+            self.scrolling = False
+        elif op == 0x2F:
+            self.scrolling = True
+
+    def pixel(self, x, y):
+        # what the panel shows at (x, y), with the driver's orientation
+        # (segment remap and reversed COM scan) being the upright one
+        if not self.on:
+            return 0
+        if self.all_on:
+            return 1
+        if not self.seg_remap:
+            x = WIDTH - 1 - x
+        if not self.com_reverse:
+            y = HEIGHT - 1 - y
+        row = (y + self.start_line + self.offset) % HEIGHT
+        bit = (self.ram[(row >> 3) * WIDTH + x] >> (row & 0x07)) & 1
+        return bit ^ self.inverted
+
+    def rows(self):
+        return [[self.pixel(x, y) for x in range(WIDTH)] for y in range(HEIGHT)]
+
+    def text(self, on="#", off="."):
+        return "\n".join("".join(on if bit else off for bit in row) for row in self.rows())
+
+    def save_pbm(self, path):
+        with open(path, "w") as out:
+            out.write(f"P1\n{WIDTH} {HEIGHT}\n")
+            for row in self.rows():
+                out.write(" ".join(str(bit) for bit in row) + "\n")
+
+    def save_png(self, path, scale=4):
+        # 1-bit grayscale, lit pixels white like on the panel
+        lines = b""
+        for row in self.rows():
+            bits = [bit for bit in row for _ in range(scale)]
+            packed = bytes(
+                sum(bits[idx + b] << (7 - b) for b in range(8))
+                for idx in range(0, len(bits), 8)
+            )
+            lines += (b"\x00" + packed) * scale
+
+        def chunk(kind, data):
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+        with open(path, "wb") as out:
+            out.write(b"\x89PNG\r\n\x1a\n")
+            out.write(chunk(b"IHDR", struct.pack(">IIBBBBB", WIDTH * scale, HEIGHT * scale, 1, 0, 0, 0, 0)))
+            out.write(chunk(b"IDAT", zlib.compress(lines)))
+            out.write(chunk(b"IEND", b""))
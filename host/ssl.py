@@ -0,0 +1,32 @@
+# Host stand-in for MicroPython's ssl, TLS is left out: wrap_socket hands the
+# socket back as it is and contexts only hold their settings.
+
+PROTOCOL_TLS_CLIENT = 0
+PROTOCOL_TLS_SERVER = 1
+CERT_NONE = 0
+CERT_OPTIONAL = 1
+CERT_REQUIRED = 2
+
+
+class SSLContext:
+
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.verify_mode = CERT_NONE
+        self.cert = None
+        self.key = None
+
+    def load_cert_chain(self, certfile, keyfile):
+        # bytes are the key and cert themselves, a str is the path of a file
+        self.cert = certfile if isinstance(certfile, bytes) else open(certfile, "rb").read()
+        self.key = keyfile if isinstance(keyfile, bytes) else open(keyfile, "rb").read()
+
+    def load_verify_locations(self, cafile=None, cadata=None):
+        pass
+
+    def wrap_socket(self, sock, server_side=False, do_handshake_on_connect=True, server_hostname=None):
+        return sock
+
+
+def wrap_socket(sock, server_side=False, key=None, cert=None, **kwargs):
+    return sock
@@ -0,0 +1,11 @@
+# Host stand-in for uasyncio: asyncio plus the MicroPython extras.
+
+from asyncio import *
+
+
+async def sleep_ms(ms):
+    await sleep(ms / 1000)
+
+
+async def wait_for_ms(aw, timeout):
+    return await wait_for(aw, timeout / 1000)
@@ -0,0 +1,150 @@
+# Host stand-in for umqtt.simple talking to an in-process broker. What goes
+# out is in broker.published, broker.send() delivers a message from outside
+# to every subscribed client, the node's own publishes come back to it too.
+# With broker.up False connects fail and a live connection stops answering.
+#
+#   from umqtt.simple import broker
+#   broker.send(b"iot/inTopic", b'{"period_ms": 10000}')
+
+import struct
+import time
+
+import host
+
+
+class MQTTException(Exception):
+    pass
+
+
+def _matches(topic_filter, topic):
+    levels = topic.split("/")
+    for pos, level in enumerate(topic_filter.split("/")):
+        if level == "#":
+            return True
+        if pos >= len(levels) or (level != "+" and level != levels[pos]):
+            return False
+    return len(topic_filter.split("/")) == len(levels)
+
+
+class Broker:
+
+    def __init__(self):
+        self.up = True
+        self.connect_ms = 200
+        self.published = []
+        self.clients = []
+        self.connects = 0
+
+    def send(self, topic, msg):
+        topic = topic if isinstance(topic, bytes) else topic.encode()
+        msg = msg if isinstance(msg, bytes) else msg.encode()
+        for client in self.clients:
+            if any(_matches(sub, topic.decode()) for sub in client.topics):
+                client.sock.feed(b"\x30" + struct.pack("<H", len(topic)) + topic + struct.pack("<I", len(msg)) + msg)
+
+    def drop(self):
+        # connections go as they do in a reset, without a DISCONNECT
+        for client in self.clients:
+            client.sock.close()
+        self.clients = []
+
+
+broker = Broker()
+host.RESET_HOOKS.append(broker.drop)
+
+
+class _Socket:
+
+    def __init__(self):
+        self._rx = bytearray()
+        self.closed = False
+
+    def feed(self, data):
+        if not self.closed:
+            self._rx += data
+
+    def setblocking(self, flag):
+        pass
+
+    def read(self, size):
+        if self.closed:
+            raise OSError(104, "ECONNRESET")
+        if not self._rx:
+            return None
+        data = bytes(self._rx[:size])
+        self._rx = self._rx[size:]
+        return data
+
+    def write(self, data, size=None):
+        if self.closed or not broker.up:
+            raise OSError(104, "ECONNRESET")
+        return len(data) if size is None else size
+
+    def close(self):
+        self.closed = True
+
+
+class MQTTClient:
+
+    def __init__(self, client_id, server, port=0, user=None, password=None, keepalive=0, ssl=None, ssl_params={}):
+        self.client_id = client_id
+        self.server = server
+        self.port = port
+        self.keepalive = keepalive
+        self.ssl = ssl
+        self.sock = None
+        self.cb = None
+        self.topics = []
+
+    def set_callback(self, f):
+        self.cb = f
+
+    def connect(self, clean_session=True):
+        if not broker.up:
+            raise OSError(113, "EHOSTUNREACH")
+        time.sleep_ms(broker.connect_ms)
+        self.sock = _Socket()
+        broker.clients.append(self)
+        broker.connects += 1
+        return False
+
+    def disconnect(self):
+        self.sock.write(b"\xe0\0")
+        self.sock.close()
+        if self in broker.clients:
+            broker.clients.remove(self)
+
+    def ping(self):
+        self.sock.write(b"\xc0\0")
+        self.sock.feed(b"\xd0\0")
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        topic = topic if isinstance(topic, bytes) else topic.encode()
+        msg = msg if isinstance(msg, bytes) else msg.encode()
+        self.sock.write(msg)
+        broker.published.append((topic, msg))
+        broker.send(topic, msg)
+
+    def subscribe(self, topic, qos=0):
+        topic = topic.decode() if isinstance(topic, bytes) else topic
+        self.sock.write(topic.encode())
+        if topic not in self.topics:
+            self.topics.append(topic)
+
+    def wait_msg(self):
+        res = self.sock.read(1)
+        if not res:
+            return None
+        if res == b"\xd0":
+            self.sock.read(1)
+            return None
+        size = struct.unpack("<H", self.sock.read(2))[0]
+        topic = self.sock.read(size)
+        size = struct.unpack("<I", self.sock.read(4))[0]
+        msg = self.sock.read(size)
+        self.cb(topic, msg)
+        return 0x30
+
+    def check_msg(self):
+        self.sock.setblocking(False)
+        return self.wait_msg()